@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Fragment:
+    html: str
+    version: Optional[str]  # backend ETag the fragment was rendered from
+    checked_at: float
+
+
+class FragmentCache:
+    """
+    Rendered HTML fragments keyed by page and login-state variant.
+
+    A fragment is served as-is for `ttl` seconds after it was last checked. After
+    that it is stale but kept: the caller revalidates it with the backend using
+    its version (an ETag), and on a 304 calls refresh() instead of re-rendering.
+    """
+
+    def __init__(self, ttl: float = 2.0, max_entries: int = 256, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fragments = OrderedDict()
+        self.counters = {"hits": 0, "revalidated": 0, "renders": 0}
+
+    @staticmethod
+    def key(page: str, variant: str, cursor: Optional[str] = None) -> str:
+        return f"{page}|{variant}|{cursor or ''}"
+
+    def get(self, key: str) -> Optional[Fragment]:
+        """The fragment for `key`, fresh or stale; check is_fresh() before using it unchecked."""
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+            return fragment
+
+    def is_fresh(self, fragment: Fragment) -> bool:
+        fresh = self._clock() - fragment.checked_at < self.ttl
+        if fresh:
+            self.counters["hits"] += 1
+        return fresh
+
+    def set(self, key: str, html: str, version: Optional[str] = None) -> Fragment:
+        fragment = Fragment(html, version, self._clock())
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_entries:
+                self._fragments.popitem(last=False)
+        self.counters["renders"] += 1
+        return fragment
+
+    def refresh(self, fragment: Fragment):
+        """The backend confirmed this version is still current."""
+        fragment.checked_at = self._clock()
+        self.counters["revalidated"] += 1
+
+    def clear(self):
+        """Drop everything, e.g. after this frontend wrote a post or comment."""
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._fragments), **self.counters}
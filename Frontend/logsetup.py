@@ -0,0 +1,230 @@
+"""
+Logging for the services: JSON lines written by a background thread.
+
+Request code only appends the LogRecord to a bounded queue; formatting the
+message (%-style arguments are applied lazily), redaction, JSON encoding and
+the file and console writes all happen on the listener thread. Records below
+LOG_SAMPLE_LEVEL can be sampled, and the log file rotates by size.
+
+Every service is built from its own directory, so this file is copied into
+Server/, Frontend/ and image_resizer/; test_logsetup.py checks the copies match.
+"""
+import atexit
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+REDACTED = "[redacted]"
+SENSITIVE_KEYS = {"password", "passwd", "secret", "token", "access_token", "authorization", "cookie", "session"}
+# key=value, key: value and "key": "value" forms, e.g. a pydantic repr or a JSON body
+_SENSITIVE_TEXT = re.compile(
+    r"""(?i)\b(password|passwd|secret|access_token|token|authorization|cookie)(['"]?\s*[=:]\s*)(['"]?)(?:Bearer\s+)?[^'"\s,)}]+"""
+)
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def redact_text(text: str) -> str:
+    return _SENSITIVE_TEXT.sub(lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}{REDACTED}", text)
+
+
+def redact(value, depth: int = 0):
+    """Copy of `value` with sensitive dict keys masked, for `extra` fields."""
+    if depth > 5:
+        return value
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item, depth + 1)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item, depth + 1) for item in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, service, logger, msg, any `extra` fields and exc."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": redact_text(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = REDACTED if key.lower() in SENSITIVE_KEYS else redact(value)
+        if record.exc_info:
+            entry["exc"] = redact_text(self.formatException(record.exc_info))
+        elif record.exc_text:
+            entry["exc"] = redact_text(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The previous human-readable format, redacted; for LOG_FORMAT=text."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact_text(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps 1 in round(1 / rate) records from each call site at or below `level`;
+    `logger_rates` sets a rate per logger (e.g. uvicorn.access) at any level, and
+    a record can carry its own with extra={"sample_rate": 0.01}. Warnings and
+    errors are never sampled unless their logger is listed.
+    """
+
+    def __init__(self, rate: float = 1.0, level: int = logging.DEBUG, logger_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.rate = rate
+        self.level = level
+        self.logger_rates = logger_rates or {}
+        self._lock = threading.Lock()
+        self._seen = {}  # (logger, line) -> records so far
+        self.dropped = 0
+
+    def _rate(self, record: logging.LogRecord) -> float:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.logger_rates.get(record.name)
+        if rate is None:
+            rate = self.rate if record.levelno <= self.level else 1.0
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self._rate(record)
+        if rate >= 1:
+            return True
+        every = max(1, round(1 / rate)) if rate > 0 else 0
+        with self._lock:
+            seen = self._seen.get((record.name, record.lineno), 0)
+            self._seen[(record.name, record.lineno)] = seen + 1
+        if every and seen % every == 0:
+            record.sample_rate = rate  # lets readers weight the kept records
+            return True
+        self.dropped += 1
+        return False
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Hands records to the listener unformatted (the stock QueueHandler formats in
+    the calling thread), and drops them rather than block when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def stop(self):
+        """Flush and stop; safe to call again (atexit does)."""
+        if self._thread is not None:
+            super().stop()
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    """"uvicorn.access=0.1,pika=0.5" -> {"uvicorn.access": 0.1, "pika": 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, rate = item.split("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(service: str, log_file: Optional[str] = None) -> QueueListener:
+    """
+    Route every logger (uvicorn's included) through one queue to a rotating file
+    and the console. Settings come from the environment:
+
+    LOG_LEVEL (INFO), LOG_FORMAT (json or text), LOG_FILE (app.log, "" for console
+    only), LOG_MAX_BYTES (10 MiB), LOG_BACKUPS (5), LOG_QUEUE_SIZE (10000),
+    LOG_SAMPLE_RATE (1.0) for records at or below LOG_SAMPLE_LEVEL (DEBUG), and
+    LOG_SAMPLE_LOGGERS ("uvicorn.access=0.1").
+    """
+    log_file = os.getenv("LOG_FILE", "app.log") if log_file is None else log_file
+    formatter = TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter(service)
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(
+        rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+        level=logging.getLevelName(os.getenv("LOG_SAMPLE_LEVEL", "DEBUG").upper()),
+        logger_rates=_parse_rates(os.getenv("LOG_SAMPLE_LOGGERS", "")),
+    ))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # uvicorn installs its own console handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
+
+
+def worker_log_queue(listener: QueueListener) -> multiprocessing.Queue:
+    """
+    A queue for records from worker processes (see forward_logs), written by the
+    same handlers as `listener`, so one process owns the log file and its rotation.
+    """
+    log_queue = multiprocessing.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    forwarder = _Listener(log_queue, *listener.handlers, respect_handler_level=True)
+    forwarder.start()
+    atexit.register(forwarder.stop)
+    return log_queue
+
+
+def forward_logs(log_queue: multiprocessing.Queue):
+    """ProcessPoolExecutor initializer: send the worker's records to the parent process."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    # The stock handler formats before enqueueing, so records pickle cleanly
+    root.addHandler(QueueHandler(log_queue))
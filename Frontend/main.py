@@ -1,108 +1,301 @@
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Response, Form, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from starlette.responses import RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi import File, UploadFile
 from fastapi.staticfiles import StaticFiles
-import requests
+from contextlib import asynccontextmanager
+from typing import Optional
+from fragment_cache import FragmentCache
+from logsetup import setup_logging
+from tracing import TRACER, TracingMiddleware, inject, setup_tracing
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS, Counter, Gauge, Histogram, MetricsMiddleware
 import logging
+import time
 import httpx
 import os
-import shutil
-
-logging.basicConfig(
-    level=logging.INFO,  # Log level
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),  # Log to file
-        logging.StreamHandler(),        # Log to console
-    ]
-)
+import hashlib
+import secrets
+from urllib.parse import quote
+
+# JSON lines via a background thread; see logsetup.py for the LOG_* settings
+setup_logging("frontend")
 logger = logging.getLogger(__name__)
+# Traces start here and continue in the API and the resizer; see tracing.py for the TRACE_* settings
+setup_tracing("frontend")
+
+# Backend API as seen from this container, and as seen from the user's browser
+BACKEND_URL = os.getenv("BACKEND_URL", "http://fastapi-app:8080")
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "http://localhost:8080")
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))  # seconds
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "60"))  # seconds, for relaying images
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the app's lifetime: keep-alive connections to the
+    # backend are reused across requests instead of reconnecting every call
+    app.state.backend = httpx.AsyncClient(
+        base_url=BACKEND_URL,
+        limits=httpx.Limits(max_connections=BACKEND_MAX_CONNECTIONS, max_keepalive_connections=BACKEND_MAX_CONNECTIONS // 2),
+        timeout=httpx.Timeout(BACKEND_TIMEOUT, connect=2.0),
+        event_hooks={"request": [start_backend_call], "response": [record_backend_call]},
+    )
+    # Compile templates up front instead of on the first request to each page
+    for name in TEMPLATES:
+        templates.get_template(name)
+    yield
+    await app.state.backend.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+
+http_requests = Counter("http_requests", "HTTP requests by route and status.", ["method", "route", "status"])
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"])
+backend_request_seconds = Histogram(
+    "backend_request_duration_seconds", "Time until the API's response headers, by API path.", ["method", "path", "status"]
+)
+fragment_cache_entries = Gauge("fragment_cache_entries", "Rendered feed fragments held in memory.")
+fragment_cache_events = Counter("fragment_cache_events", "Fragment cache hits, revalidations and renders.", ["event"])
+app.add_middleware(MetricsMiddleware, requests=http_requests, latency=http_request_seconds)
+
+
+async def start_backend_call(request: httpx.Request):
+    request.extensions["started_at"] = time.perf_counter()
+    # A child of the current request's span; the API continues the trace from the header
+    span = TRACER.start_span(f"{request.method} {request.url.path}", kind="client")
+    request.extensions["span"] = span
+    inject(request.headers, span)
+
+
+async def record_backend_call(response: httpx.Response):
+    request = response.request
+    # Paths the frontend calls carry no ids, so they are safe as label values
+    backend_request_seconds.labels(request.method, request.url.path, response.status_code).observe(
+        time.perf_counter() - request.extensions["started_at"]
+    )
+    span = request.extensions["span"]
+    span.set_attribute("http.status_code", response.status_code)
+    span.end()
+
+
+@METRICS.on_collect
+def collect_gauges():
+    stats = fragment_cache.stats()
+    fragment_cache_entries.set(stats.pop("entries"))
+    for event, count in stats.items():
+        fragment_cache_events.labels(event).set_total(count)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(METRICS.exposition(), media_type=METRICS_CONTENT_TYPE)
 
-app = FastAPI()
+
+def backend(request: Request) -> httpx.AsyncClient:
+    return request.app.state.backend
+
+
+def auth_headers(request: Request) -> dict:
+    """Identify the logged-in user to the backend with the token it issued at login."""
+    token = request.session.get("access_token")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+async def fetch_token(request: Request, username: str, password: str) -> httpx.Response:
+    # The API rate limits logins per client, so name the browser rather than this service
+    headers = {"X-Forwarded-For": request.client.host} if request.client else {}
+    response = await backend(request).post(
+        '/api/v1/authenticate', json={"username": username, "password": password}, headers=headers,
+    )
+    if response.status_code == 201 and response.json().get("valid"):
+        request.session["username"] = username
+        request.session["access_token"] = response.json().get("access_token")
+    return response
+
+
+def session_expired(request: Request):
+    logger.info("Access token of %s rejected, asking to log in again", request.session.get('username'))
+    request.session.clear()
+    if wants_json(request):
+        return JSONResponse({"detail": "Session expired", "login": "/login"}, status_code=401)
+    return RedirectResponse("/login", status_code=303)
+
+
+def wants_json(request: Request) -> bool:
+    """Forms posted by the page's script instead of a full browser submit."""
+    return "application/json" in request.headers.get("accept", "")
 
 
 UPLOAD_DIR = "uploads"
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
 #os.makedirs(UPLOAD_DIR, exist_ok=True)  # Create the directory if it doesn't exist
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
-app.add_middleware(SessionMiddleware, secret_key="test123", max_age=None)
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    logger.warning("SESSION_SECRET is not set; sessions are signed with a random key and end on restart")
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET or secrets.token_urlsafe(32), max_age=None)
+# Outermost, so the request span covers the other middleware
+app.add_middleware(TracingMiddleware, exclude=("/metrics", "/uploads"))
 
 # Initialize templates
 templates = Jinja2Templates(directory="templates")
+# Without auto reload Jinja skips checking template files for changes on every render
+templates.env.auto_reload = os.getenv("TEMPLATE_AUTO_RELOAD", "0") == "1"
+TEMPLATES = ["index.html", "_feed.html", "login.html", "submit.html"]
+page_template = templates.get_template("index.html")
+feed_template = templates.get_template("_feed.html")
+TEMPLATE_STREAM_BUFFER = 16  # template chunks per streamed write
+
+
+def render(template, **context) -> str:
+    with TRACER.span(f"render {template.name}"):
+        return template.render(**context)
+
+# Rendered feed HTML; FRAGMENT_TTL bounds how long a page may lag the backend
+fragment_cache = FragmentCache(ttl=float(os.getenv("FRAGMENT_TTL", "2")))
+
+# Number of comments shown under each post on the home page
+COMMENTS_PREVIEW = 5
+# Feed images are displayed 200 CSS px wide; request enough pixels for 2x screens
+FEED_IMAGE_WIDTH = 400
+# Shown while the resizer works on an image; the page swaps in the rendition when it is ready
+PLACEHOLDER_IMAGE = "data:image/svg+xml," + quote(
+    '<svg xmlns="http://www.w3.org/2000/svg" width="400" height="300"><rect width="100%" height="100%" fill="#eee"/>'
+    '<text x="50%" y="50%" text-anchor="middle" fill="#999" font-family="Arial" font-size="24">Processing...</text></svg>'
+)
 
 #modified for comments
-@app.get("/", response_class=HTMLResponse)
-def read_root(request: Request):
-    logger.info("Endpoint: GET / (frontend)")
-    try:
-        # Fetch posts and their comments
-        response = requests.get('http://fastapi-app:8080/api/v1/post')
-        if response.status_code == 200:
-            posts = response.json()
-            for post in posts:
-                # Fetch comments for each post
-                comments_response = requests.get(f"http://fastapi-app:8080/api/v1/comment/{post['id']}")
-                logger.info(f"Fetched comments: {comments_response.status_code}")
-                if comments_response.status_code == 200:
-                    post['comments'] = comments_response.json()
-                    logger.info(f"Comments: {comments_response.json()}")
-                else:
-                    post['comments'] = []
-
-                # Construct image URL if image is present
-                image_path = post.get("image")
-                if image_path:
-                    logger.info(f"Image: {image_path}")
-                    post['image_url'] = f"http://localhost:8080/api/v1/image/reduced/{os.path.basename(image_path)}"
-                    post['full_image_url'] = f"http://localhost:8080/api/v1/image/full/{os.path.basename(image_path)}"
-                else:
-                    post['image_url'] = None
-                    post['full_image_url'] = None
-                
+def add_image_urls(posts: list):
+    """Pick each post's image from the status the API reports, so no URL is a guess that may 404."""
+    for post in posts:
+        post['image_size'] = None
+        image_path = post.get("image")
+        if not image_path:
+            post['image_url'] = None
+            post['full_image_url'] = None
+            continue
+        file_name = os.path.basename(image_path)
+        post['image_name'] = file_name
+        post['full_image_url'] = f"{PUBLIC_API_URL}/api/v1/image/full/{file_name}"
+        rendition = post.get("image_rendition")
+        status = post.get("image_status")
+        if rendition:
+            post['image_url'] = f"{PUBLIC_API_URL}/api/v1/image/rendition/{rendition}/{file_name}"
+            size = (post.get("image_renditions") or {}).get(rendition)
+            # Lets the browser reserve the space before the image loads
+            post['image_size'] = (size["width"], size["height"]) if size else None
+        elif status == "pending":
+            post['image_url'] = PLACEHOLDER_IMAGE
+        elif status == "failed":
+            # No renditions are coming; the original is all there is
+            post['image_url'] = post['full_image_url']
         else:
-            logger.error(f"Error code fetching posts: {response.status_code}")
-            posts = []
+            # Uploaded before statuses were tracked: the API renders a thumbnail if there is none
+            post['image_url'] = f"{PUBLIC_API_URL}/api/v1/image/reduced/{file_name}"
+
+
+async def feed_fragment(request: Request, cursor: Optional[str]) -> str:
+    """
+    Rendered post list for logged-in visitors. It doesn't depend on who is logged
+    in, so one cached fragment per page serves everyone; once stale it is
+    revalidated against the feed's ETag and only re-rendered if the feed changed.
+    """
+    key = FragmentCache.key("/", "member", cursor)
+    fragment = fragment_cache.get(key)
+    if fragment is not None and fragment_cache.is_fresh(fragment):
+        return fragment.html
+
+    params = {"comments_limit": COMMENTS_PREVIEW, "image_width": FEED_IMAGE_WIDTH}
+    if cursor:
+        params["cursor"] = cursor
+    headers = {"If-None-Match": fragment.version} if fragment is not None and fragment.version else {}
+    try:
+        # Fetch posts with their latest comments embedded in a single request
+        response = await backend(request).get('/api/v1/feed', params=params, headers=headers)
     except Exception as e:
-        logger.error(f"Error fetching posts: {e}")
-        posts = []
-    
-    # Render the template with posts and comments
-    is_logged_in = False
-    if request.session.get("username"):
-        is_logged_in = True
-    return templates.TemplateResponse("index.html", {"request": request, "posts": posts, "is_logged_in": is_logged_in})
+        logger.error("Error fetching posts: %s", e)
+        response = None
+
+    if response is not None and response.status_code == 304 and fragment is not None:
+        fragment_cache.refresh(fragment)
+        return fragment.html
+    if response is None or response.status_code != 200:
+        if response is not None:
+            logger.error("Error code fetching feed: %s", response.status_code)
+        # Better an older page than an empty one
+        return fragment.html if fragment is not None else render(feed_template, posts=[])
+
+    posts = response.json()
+    add_image_urls(posts)
+    logger.debug("Fetched feed with %s posts", len(posts))
+    html = render(feed_template, posts=posts, next_cursor=response.headers.get("x-next-cursor"))
+    return fragment_cache.set(key, html, response.headers.get("etag")).html
+
+
+@app.get("/", response_class=HTMLResponse)
+async def read_root(request: Request, cursor: Optional[str] = None):
+    logger.debug("Endpoint: GET / (frontend)")
+    if not request.session.get("username"):
+        # Anonymous visitors all get the same static page: no backend call at all
+        key = FragmentCache.key("/", "anonymous")
+        fragment = fragment_cache.get(key) or fragment_cache.set(key, render(page_template, is_logged_in=False))
+        return HTMLResponse(fragment.html)
+
+    feed_html = await feed_fragment(request, cursor)
+    # Stream the page so the browser gets the head (and starts on styles) right away.
+    # From then on new posts and comments are pushed to it instead of reloading:
+    # the first page follows the whole feed, older pages only their own posts
+    stream = page_template.stream(
+        is_logged_in=True, feed_html=feed_html, public_api_url=PUBLIC_API_URL, live_feed=cursor is None,
+        image_width=FEED_IMAGE_WIDTH,
+    )
+    stream.enable_buffering(TEMPLATE_STREAM_BUFFER)
+    return StreamingResponse(stream, media_type="text/html")
 
 
 @app.post("/add-comment")
-def add_comment(request: Request, post_id: int = Form(...), text: str = Form(...)):
+async def add_comment(request: Request, post_id: int = Form(...), text: str = Form(...)):
     user = request.session.get("username")
     if not user:
         logger.error("User is not logged in. Cannot add comment.")
         raise HTTPException(status_code=401, detail="User is not logged in")
 
-    logger.info(f"Adding comment via frontend: post_id={post_id}, user={user}")
+    logger.debug("Adding comment via frontend: post_id=%s, user=%s", post_id, user)
     try:
-        response = requests.post(
-            'http://fastapi-app:8080/api/v1/comment',
-            json={"post_id": post_id, "text": text, "username": user}
+        response = await backend(request).post(
+            '/api/v1/comment',
+            json={"post_id": post_id, "text": text, "username": user},
+            headers=auth_headers(request),
         )
+        if response.status_code == 401:
+            return session_expired(request)
         if response.status_code == 201:
             logger.info("Comment added successfully via frontend")
+            # Show the writer their comment on the redirect instead of a cached page
+            fragment_cache.clear()
+            if wants_json(request):
+                return JSONResponse(response.json(), status_code=201)
         else:
-            logger.error(f"Error adding comment: {response.text}")
+            logger.error("Error adding comment: %s", response.text)
+            if wants_json(request):
+                return JSONResponse({"detail": "Error adding comment"}, status_code=502)
     except Exception as e:
-        logger.error(f"Error adding comment via frontend: {e}")
+        logger.error("Error adding comment via frontend: %s", e)
+        if wants_json(request):
+            return JSONResponse({"detail": "Error adding comment"}, status_code=502)
     
     return RedirectResponse("/", status_code=303)
 
 
 @app.get("/submit", response_class=HTMLResponse)
-def submit_post_form(request: Request):
-    logger.info("Endpoint: GET /submit (frontend)")
+async def submit_post_form(request: Request):
+    logger.debug("Endpoint: GET /submit (frontend)")
     # Render the submit.html form
     return templates.TemplateResponse("submit.html", {"request": request})
 
@@ -119,22 +312,50 @@ async def submit_post(
 
     try:
 
-        # Upload the image directly to the image API
-        files = {
-            "image": (image.filename, image.file, image.content_type),
+        if image.size is not None and image.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large")
+        if not (image.content_type or "").startswith("image/"):
+            raise HTTPException(status_code=415, detail="Only image uploads are supported")
+
+        # Relay the image to the image API as a stream of chunks instead of a buffered form
+        async def image_chunks():
+            while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+
+        # The upload is already spooled here, so hashing it is cheap; the API skips
+        # the transfer entirely if it already stores identical content
+        with TRACER.span("hash upload"):
+            hasher = hashlib.sha256()
+            while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+            await image.seek(0)
+
+        headers = {
+            "Content-Type": image.content_type,
+            # Header values must be ASCII; the API percent-decodes it
+            "X-Filename": quote(image.filename or "", safe=""),
+            "X-Content-SHA256": hasher.hexdigest(),
+            **auth_headers(request),
         }
-
-        async with httpx.AsyncClient() as client:
-            image_response = await client.post(
-                'http://fastapi-app:8080/api/v1/image',
-                files=files,
-            )
+        if image.size is not None:
+            headers["Content-Length"] = str(image.size)
+
+        image_response = await backend(request).post(
+            '/api/v1/image/stream',
+            content=image_chunks(),
+            headers=headers,
+            timeout=httpx.Timeout(UPLOAD_TIMEOUT, connect=2.0),
+        )
 
         # Log the image upload response
-        logger.info(f"Image upload response: {image_response.status_code}, {image_response.text}")
+        logger.debug("Image upload response: %s, %s", image_response.status_code, image_response.text)
 
+        if image_response.status_code == 401:
+            return session_expired(request)
+        if image_response.status_code in (413, 415):
+            raise HTTPException(status_code=image_response.status_code, detail=image_response.json().get("detail"))
         if image_response.status_code != 200:
-            logger.error(f"Error uploading image: {image_response.text}")
+            logger.error("Error uploading image: %s", image_response.text)
             raise HTTPException(status_code=500, detail=f"Error uploading image: {image_response.text}")
 
         # Extract the image path from the response
@@ -152,76 +373,76 @@ async def submit_post(
         }
 
         # Submit the post data to the post API
-        async with httpx.AsyncClient() as client:
-            post_response = await client.post(
-                'http://fastapi-app:8080/api/v1/post',
-                json=post_payload,
-            )
+        post_response = await backend(request).post('/api/v1/post', json=post_payload, headers=auth_headers(request))
+        if post_response.status_code == 401:
+            return session_expired(request)
 
-        logger.info(f"Post submission response: {post_response.status_code}, {post_response.text}")
+        logger.debug("Post submission response: %s, %s", post_response.status_code, post_response.text)
 
         if post_response.status_code != 200:
-            logger.error(f"Error submitting post: {post_response.text}")
+            logger.error("Error submitting post: %s", post_response.text)
             raise HTTPException(status_code=500, detail=f"Error submitting post: {post_response.text}")
+        fragment_cache.clear()
 
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in /submit: {e}")
+        logger.error("Error in /submit: %s", e)
         raise HTTPException(status_code=500, detail=f"Error submitting post: {e}")
 
     return RedirectResponse("/", status_code=303)
 
 @app.get("/login", response_class=HTMLResponse)
-def login_form(request: Request):
-    logger.info("Endpoint: GET /login (frontend)")
+async def login_form(request: Request):
+    logger.debug("Endpoint: GET /login (frontend)")
     # Render the submit.html form
     return templates.TemplateResponse("login.html", {"request": request})
 
 @app.post("/login")
 async def login(request: Request, username: str = Form(...), password: str = Form(...)):
-    logger.info("Endpoint: POST /login (frontend)")
+    logger.debug("Endpoint: POST /login (frontend)")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'http://fastapi-app:8080/api/v1/authenticate',
-                json={"username": username, "password": password}
-            )
+        response = await fetch_token(request, username, password)
 
+        if response.status_code == 429:
+            return templates.TemplateResponse(
+                "login.html", {"request": request, "login_error": "Too many login attempts, please try again later."}, status_code=429
+            )
         if response.status_code != 201:
-            logger.error(f"Error from /user: {response.text}")
+            logger.error("Error from /user: %s", response.text)
             raise HTTPException(status_code=500, detail=f"Backend error: {response.text}")
         
         if (response.json())['valid'] == True:
-            request.session["username"] = username
             return RedirectResponse("/", status_code=303)
         else:
             return templates.TemplateResponse("login.html", {"request": request, "login_error": "Invalid username or password."})
         
     except Exception as e:
-        logger.error(f"Error in /login: {e}")
+        logger.error("Error in /login: %s", e)
         raise HTTPException(status_code=500, detail=f"Error logging in: {e}")
 
 @app.post("/register")
-async def login(request: Request, username: str = Form(...), password: str = Form(...), email: str = Form(...)):
-    logger.info("Endpoint: POST /register (frontend)")
+async def register(request: Request, username: str = Form(...), password: str = Form(...), email: str = Form(...)):
+    logger.debug("Endpoint: POST /register (frontend)")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'http://fastapi-app:8080/api/v1/user',
-                json={"username": username, "email": email, "password": password}
-            )
+        response = await backend(request).post(
+            '/api/v1/user',
+            json={"username": username, "email": email, "password": password}
+        )
 
         if response.status_code != 201:
-            logger.error(f"Error from /user: {response.text}")
+            logger.error("Error from /user: %s", response.text)
             raise HTTPException(status_code=500, detail=f"Backend error: {response.text}")
-        
+
+        # Log the new user in straight away
+        await fetch_token(request, username, password)
     except Exception as e:
-        logger.error(f"Error in /register: {e}")
+        logger.error("Error in /register: %s", e)
         raise HTTPException(status_code=500, detail=f"Error registering: {e}")
 
-    
     request.session["username"] = username
-    logger.info(f"User {username} registered successfully")
+    logger.info("User %s registered successfully", username)
 
     return RedirectResponse("/", status_code=303)
 
@@ -0,0 +1,47 @@
+import os
+import re
+from typing import Optional
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
+BLOB_ID_RE = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp)$")
+
+
+def blob_id_for(sha256: str, content_type: str) -> Optional[str]:
+    """Blob ids are the SHA-256 of the content plus an extension for the content type."""
+    extension = EXTENSIONS.get(content_type)
+    return f"{sha256}.{extension}" if extension else None
+
+
+def is_blob_id(name: str) -> bool:
+    return bool(BLOB_ID_RE.match(name or ""))
+
+
+class BlobStore:
+    """
+    Content-addressed file store. Blobs live under two levels of hash-prefix
+    directories (ab/cd/abcd...jpg) so no directory grows past 65536 entries.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def relative_path(blob_id: str) -> str:
+        return os.path.join(blob_id[:2], blob_id[2:4], blob_id)
+
+    def path(self, blob_id: str) -> str:
+        return os.path.join(self.root, self.relative_path(blob_id))
+
+    def exists(self, blob_id: str) -> bool:
+        return os.path.exists(self.path(blob_id))
+
+    def put(self, tmp_path: str, blob_id: str) -> bool:
+        """Move a finished upload into place; returns False if the blob was already stored."""
+        path = self.path(blob_id)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Identical content, so a concurrent put of the same blob is harmless
+        os.replace(tmp_path, path)
+        return True
@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Event:
+    id: int
+    topic: str
+    type: str
+    data: dict
+
+    def to_sse(self) -> bytes:
+        """Server-Sent Events wire format."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'), default=str)}\n\n".encode()
+
+
+class BrokerBackend:
+    """
+    Carries published events to every process that has subscribers.
+
+    LocalBackend hands them straight back to the one broker in this process. A
+    shared backend (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) would forward
+    them to the other replicas and call broker.deliver() there, from the event
+    loop (use loop.call_soon_threadsafe from a listener thread).
+    """
+
+    def attach(self, broker: "EventBroker"):
+        self.broker = broker
+
+    def publish(self, topic: str, type: str, data: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LocalBackend(BrokerBackend):
+    def publish(self, topic, type, data):
+        self.broker.deliver(topic, type, data)
+
+
+class Subscription:
+    """
+    Events for a set of topics, buffered in a bounded queue. A subscriber that
+    falls `queue_size` events behind is closed instead of growing the buffer; its
+    client reconnects and resumes from the replay buffer or reloads.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, broker: "EventBroker", topics: Set[str], queue_size: int):
+        self.broker = broker
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self.overflowed = False
+
+    def offer(self, event: Event) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.close()
+            return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.broker._unsubscribe(self)
+        # Wake the reader even when the queue is full
+        while True:
+            try:
+                self.queue.put_nowait(self._CLOSED)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """The next event; None on timeout or once the subscription is closed."""
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is self._CLOSED:
+            self.queue.put_nowait(item)  # stay closed for later calls
+            return None
+        return item
+
+
+class EventBroker:
+    """
+    In-process fan-out of events to subscribers by topic, with a replay buffer so a
+    reconnecting client can resume after the last event id it saw. Publish and
+    subscribe from the event loop thread only.
+    """
+
+    def __init__(self, backend: BrokerBackend = None, queue_size: int = 100, replay_size: int = 1000, max_subscribers: int = 10000):
+        self.backend = backend or LocalBackend()
+        self.backend.attach(self)
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._ids = itertools.count(1)
+        self._replay = deque(maxlen=replay_size)
+        self._subscribers = {}  # topic -> set of subscriptions
+        self._count = 0
+        self.counters = {"published": 0, "delivered": 0, "overflows": 0, "rejected": 0}
+
+    def publish(self, topic: str, type: str, data: dict):
+        self.counters["published"] += 1
+        self.backend.publish(topic, type, data)
+
+    def deliver(self, topic: str, type: str, data: dict):
+        """Called by the backend for every event, local or from another process."""
+        event = Event(next(self._ids), topic, type, data)
+        self._replay.append(event)
+        for subscription in list(self._subscribers.get(topic, ())):
+            if subscription.offer(event):
+                self.counters["delivered"] += 1
+            elif subscription.overflowed:
+                self.counters["overflows"] += 1
+                logger.warning("Dropping slow event subscriber on %s", sorted(subscription.topics))
+
+    def subscribe(self, topics: Iterable[str], last_event_id: Optional[int] = None) -> Optional[Subscription]:
+        """
+        Subscribe to `topics`, first replaying buffered events after `last_event_id`.
+        Returns None when max_subscribers are already connected.
+        """
+        if self._count >= self.max_subscribers:
+            self.counters["rejected"] += 1
+            return None
+        subscription = Subscription(self, set(topics), self.queue_size)
+        if last_event_id is not None:
+            for event in self.replay(subscription.topics, last_event_id)[-self.queue_size:]:
+                subscription.offer(event)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def replay(self, topics: Set[str], last_event_id: int) -> List[Event]:
+        return [event for event in self._replay if event.id > last_event_id and event.topic in topics]
+
+    def _unsubscribe(self, subscription: Subscription):
+        removed = False
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self._subscribers[topic]
+        if removed:
+            self._count -= 1
+
+    def close(self):
+        """Close every subscription, ending their streams (used on shutdown)."""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close()
+        self.backend.close()
+
+    def stats(self) -> dict:
+        return {"subscribers": self._count, "topics": len(self._subscribers), **self.counters}
@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Mapping, Optional
+from urllib.parse import urlencode
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class CacheBackend:
+    """
+    Storage interface for ResponseCache.
+
+    Entries carry tags so writes can invalidate every entry that depends on a
+    resource without knowing the exact keys. A shared backend (e.g. Redis) can be
+    plugged in by implementing the methods below.
+
+    Invalidations advance a generation counter. A reader that takes generation()
+    before loading a value and passes it to set() has the value dropped if one
+    of its tags was invalidated in between, so a load that raced a write cannot
+    cache the result from before that write.
+    """
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: CachedResponse, ttl: float, tags: Iterable[str] = (), generation: int = None) -> bool:
+        """Store `value` unless one of `tags` was invalidated after `generation`; returns whether it was stored."""
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying one of `tags`; returns the number of entries removed."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    In-process LRU with a per-entry TTL.
+
+    The generation of the last invalidation is remembered for up to
+    `max_tracked_tags` tags; a set() with a generation older than a forgotten one
+    is not stored, as it cannot be told apart from one that raced a write.
+    """
+
+    def __init__(self, max_entries: int = 1024, clock=time.monotonic, max_tracked_tags: int = 10000):
+        self.max_entries = max_entries
+        self.max_tracked_tags = max_tracked_tags
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags = {}  # tag -> set of keys
+        self._generation = 0
+        self._invalidated = OrderedDict()  # tag -> generation of its last invalidation, oldest first
+        self._forgotten = 0  # newest generation dropped from _invalidated
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=(), generation=None):
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and (
+                generation < self._forgotten or any(self._invalidated.get(tag, 0) > generation for tag in tags)
+            ):
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, self._clock() + ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            while len(self._invalidated) > self.max_tracked_tags:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            # Whatever was loaded before may be stale now
+            self._generation += 1
+            self._invalidated.clear()
+            self._forgotten = self._generation
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    """Read-through cache of serialized endpoint responses with tag invalidation."""
+
+    def __init__(self, backend: CacheBackend, default_ttl: float = 30.0):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.counters = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0, "stale_sets": 0}
+
+    @staticmethod
+    def key(endpoint: str, params: Mapping[str, str] = None) -> str:
+        """Key on the endpoint and its query parameters, independent of parameter order."""
+        if not params:
+            return endpoint
+        return f"{endpoint}?{urlencode(sorted(params.items()))}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        value = self.backend.get(key)
+        self.counters["hits" if value is not None else "misses"] += 1
+        return value
+
+    def generation(self) -> int:
+        """Take before loading a response on a miss, and pass to set()."""
+        return self.backend.generation()
+
+    def set(self, key: str, body: bytes, headers: Dict[str, str] = None, tags: Iterable[str] = (), ttl: float = None,
+            generation: int = None) -> CachedResponse:
+        """Cache a response, unless one of `tags` was invalidated after `generation`; either way it is returned to send."""
+        value = CachedResponse(body=body, etag=make_etag(body), headers=dict(headers or {}))
+        if not self.backend.set(key, value, self.default_ttl if ttl is None else ttl, tags, generation):
+            self.counters["stale_sets"] += 1
+        return value
+
+    def invalidate(self, *tags: str) -> int:
+        removed = self.backend.invalidate_tags(tags)
+        self.counters["invalidations"] += removed
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self.backend),
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+        }
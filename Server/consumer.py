@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (body, headers) of one delivery
+Message = Tuple[bytes, Dict[str, object]]
+
+
+class MessageConsumer:
+    """
+    Long-lived consumer for one queue; the counterpart of MessagePublisher.
+
+    The broker connection is owned by a background thread, which collects
+    deliveries into batches of up to `batch_size`, or whatever arrived within
+    `batch_interval` seconds. `handle` is a coroutine function taking a list of
+    messages; each batch is run on the event loop and acked with a single ack
+    once it returns, or requeued if it raises, so a handler that fails on bad
+    input must skip the message rather than raise. Lost connections are
+    retried with exponential backoff.
+
+    `connect` returns a pika BlockingConnection (or anything with the same interface).
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        queue_name: str,
+        handle: Callable[[List[Message]], Awaitable[None]],
+        batch_size: int = 100,
+        batch_interval: float = 0.2,
+        handle_timeout: float = 30.0,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+    ):
+        self._connect = connect
+        self.queue_name = queue_name
+        self._handle = handle
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.handle_timeout = handle_timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._loop = None
+        self._stopping = threading.Event()
+        self._thread = None
+        self._connection = None
+        self._counters = {"consumed": 0, "batches": 0, "failed_batches": 0, "reconnects": 0}
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start consuming; batches are handled on `loop`."""
+        self._loop = loop
+        self._thread = threading.Thread(target=self._run, name=f"consumer-{self.queue_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Handle what was already received and stop; unacked deliveries go back to the queue."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {"queue": self.queue_name, "connected": self._connection is not None, **self._counters}
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        delay = self.retry_delay
+        while not self._stopping.is_set():
+            try:
+                self._connection = self._connect()
+                channel = self._connection.channel()
+                channel.queue_declare(queue=self.queue_name)
+                # Enough unacked deliveries to fill the next batch while one is handled
+                channel.basic_qos(prefetch_count=self.batch_size * 2)
+                logger.info("Consumer connected for queue %s", self.queue_name)
+                delay = self.retry_delay
+                self._consume(channel)
+            except Exception as e:
+                self._counters["reconnects"] += 1
+                logger.error("Consumer for %s lost the broker, retrying in %.1fs: %s", self.queue_name, delay, e)
+                self._close()
+                self._stopping.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        self._close()
+
+    def _consume(self, channel):
+        batch = []
+        first_at = 0.0
+        # Yields (None, None, None) after batch_interval without deliveries
+        for method, properties, body in channel.consume(self.queue_name, inactivity_timeout=self.batch_interval):
+            if method is not None:
+                if not batch:
+                    first_at = time.monotonic()
+                batch.append((method.delivery_tag, body, dict(properties.headers or {})))
+            if batch and (method is None or len(batch) >= self.batch_size
+                          or time.monotonic() - first_at >= self.batch_interval):
+                self._flush(channel, batch)
+                batch = []
+            if self._stopping.is_set() and not batch:
+                break
+        channel.cancel()
+
+    def _flush(self, channel, batch: List[tuple]):
+        last_tag = batch[-1][0]
+        future = asyncio.run_coroutine_threadsafe(
+            self._handle([(body, headers) for _, body, headers in batch]), self._loop
+        )
+        try:
+            future.result(self.handle_timeout)
+        except Exception as e:
+            future.cancel()
+            self._counters["failed_batches"] += 1
+            logger.error("Handling %s messages from %s failed, requeueing them: %s", len(batch), self.queue_name, e)
+            channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=True)
+            # Give whatever failed (usually the database) a moment before the redelivery
+            self._stopping.wait(self.retry_delay)
+            return
+        channel.basic_ack(delivery_tag=last_tag, multiple=True)
+        self._counters["batches"] += 1
+        self._counters["consumed"] += len(batch)
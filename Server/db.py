@@ -1,64 +1,66 @@
-import psycopg2
-from psycopg2 import sql
+import psycopg
+from psycopg.pq import TransactionStatus
+import config
+from pool import AsyncConnectionPool
+from migrate import migrate
 
+_pool = None
 
-def get_db():
-    conn = psycopg2.connect(
-        dbname="mydb",
-        user="myuser",
-        password="mypassword",
-        host="db",  # This should match the name of the service in docker-compose.yml
-        port=5432
-    )
-    return conn
 
+async def _connect():
+    return await psycopg.AsyncConnection.connect(config.DATABASE_URL)
 
-async def init_db():
-    conn = get_db()
-    cursor = conn.cursor()
 
-    try:
-        # Create 'posts' table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS posts (
-            id SERIAL PRIMARY KEY,
-            image TEXT,
-            text TEXT,
-            username TEXT,  -- Changed from "user"
-            time_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+async def _check_connection(conn):
+    await conn.execute("SELECT 1")
+    await conn.rollback()
+
+
+async def _reset_connection(conn):
+    if conn.info.transaction_status != TransactionStatus.IDLE:
+        await conn.rollback()
+
+
+async def init_pool():
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            _connect,
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            timeout=config.DB_POOL_TIMEOUT,
+            check_after=config.DB_POOL_CHECK_AFTER,
+            check=_check_connection,
+            reset=_reset_connection,
         )
-    ''')
-        print("Table 'posts' created or already exists.")
-
-        # Create 'users' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username TEXT UNIQUE,
-                email TEXT UNIQUE,
-                password TEXT
-            )
-        ''')
-        print("Table 'users' created or already exists.")
-
-        # Create 'comments' table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS comments (
-                id SERIAL PRIMARY KEY,
-                post_id INTEGER NOT NULL REFERENCES posts(id),
-                text TEXT NOT NULL,
-                username TEXT NOT NULL,  -- Renamed from "user" to "username"
-                time_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("Table 'comments' created or already exists.")
-
-        conn.commit()
-        print("All tables initialized successfully.")
-
-    except Exception as e:
-        print(f"Error initializing database: {e}")
-        conn.rollback()
+        await _pool.open()
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
 
+
+def get_pool() -> AsyncConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Database pool is not initialized")
+    return _pool
+
+
+async def get_db():
+    """FastAPI dependency: borrow a pooled connection for the duration of the request."""
+    pool = get_pool()
+    conn = await pool.getconn()
+    try:
+        yield conn
     finally:
-        conn.close()
+        await pool.putconn(conn)
+
+
+async def init_db():
+    """Apply pending schema migrations (see migrate.py); a failure stops startup."""
+    async with get_pool().connection() as conn:
+        await migrate(conn)
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(size: int, mtime_ns: int, content_hash: Optional[str] = None) -> str:
+    """
+    Strong ETag for a file. Content-addressed files use their hash; everything else
+    is written atomically, so size and modification time identify a version.
+    """
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'"{mtime_ns:x}-{size:x}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (start, end) byte range.
+
+    Returns None when the whole file should be sent: no header, another unit, or
+    several ranges (we don't build multipart/byteranges bodies). Raises
+    RangeNotSatisfiable for a single range that lies outside the file.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start, sep, end = spec.partition("-")
+    if not sep:
+        raise RangeNotSatisfiable(header)
+    try:
+        if start == "":
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - length, 0), size - 1
+        first = int(start)
+        last = int(end) if end else size - 1
+    except ValueError:
+        raise RangeNotSatisfiable(header)
+    if first < 0 or first >= size or last < first:
+        raise RangeNotSatisfiable(header)
+    return first, min(last, size - 1)
+
+
+@dataclass
+class CachedFile:
+    body: bytes
+    etag: str
+    mtime_ns: int
+
+
+class SmallFileCache:
+    """
+    LRU of small image files (thumbnails) held in memory, bounded by total bytes.
+    Entries are keyed by path and checked against the file's mtime, so an
+    overwritten legacy file is never served stale.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_file_bytes: int = 256 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0}
+
+    def fits(self, size: int) -> bool:
+        return size <= self.max_file_bytes
+
+    def get(self, path: str, mtime_ns: Optional[int] = None) -> Optional[CachedFile]:
+        """Cached file for `path`; pass mtime_ns to reject an entry for an older version."""
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and mtime_ns is not None and cached.mtime_ns != mtime_ns:
+                self._remove(path)
+                cached = None
+            if cached is None:
+                self.counters["misses"] += 1
+                return None
+            self._files.move_to_end(path)
+            self.counters["hits"] += 1
+            return cached
+
+    def put(self, path: str, cached: CachedFile):
+        if not self.fits(len(cached.body)):
+            return
+        with self._lock:
+            if path in self._files:
+                self._remove(path)
+            self._files[path] = cached
+            self._bytes += len(cached.body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._files)))
+
+    def _remove(self, path):
+        self._bytes -= len(self._files.pop(path).body)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._files), "bytes": self._bytes, **self.counters}
+
+
+class ServingStats:
+    """Requests, status codes, bytes served and latency percentiles per image route."""
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+
+    def record(self, route: str, status: int, sent_bytes: int, seconds: float):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0, "bytes_served": 0, "statuses": {}, "latencies": deque(maxlen=self.window),
+                }
+            entry["requests"] += 1
+            entry["bytes_served"] += sent_bytes
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+            entry["latencies"].append(seconds)
+
+    @staticmethod
+    def percentile(samples, fraction: float) -> float:
+        ordered = sorted(samples)
+        if not ordered:
+            return 0.0
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for route, entry in self._routes.items():
+                latencies = list(entry["latencies"])
+                result[route] = {
+                    "requests": entry["requests"],
+                    "bytes_served": entry["bytes_served"],
+                    "statuses": dict(entry["statuses"]),
+                    "p50_ms": round(self.percentile(latencies, 0.50) * 1000, 3),
+                    "p99_ms": round(self.percentile(latencies, 0.99) * 1000, 3),
+                }
+            return result
+
+
+class ServingStatsMiddleware:
+    """
+    ASGI middleware timing GET requests under `prefix` until the last body byte has
+    been handed to the server, so file streaming is included in the latency.
+    The route is the first path segment after the prefix (full, rendition, ...).
+    """
+
+    def __init__(self, app, stats: ServingStats, prefix: str):
+        self.app = app
+        self.stats = stats
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"][len(self.prefix):].split("/", 1)[0] or "other"
+        started = time.perf_counter()
+        state = {"status": 500, "bytes": 0, "length": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-length":
+                        state["length"] = int(value)
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            elif message["type"] == "http.response.pathsend":
+                # The server sends the file itself
+                state["bytes"] += state["length"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.stats.record(route, state["status"], state["bytes"], time.perf_counter() - started)
@@ -0,0 +1,56 @@
+import functools
+import inspect
+import time
+
+from metrics import Counter, Gauge, Histogram
+from tracing import TRACER
+
+# Metrics of the API process, scraped from GET /metrics
+
+http_requests = Counter("http_requests", "HTTP requests by route and status.", ["method", "route", "status"])
+http_request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"])
+
+db_query_seconds = Histogram("db_query_duration_seconds", "Time spent in each service method, queries included.", ["service", "method"])
+db_query_errors = Counter("db_query_errors", "Service methods that raised.", ["service", "method"])
+
+db_pool_connections = Gauge("db_pool_connections", "Pooled database connections by state.", ["state"])
+db_pool_waiting = Gauge("db_pool_waiting", "Requests waiting for a database connection.")
+db_pool_events = Counter("db_pool_events", "Pool checkouts, waits, timeouts and connections opened or discarded.", ["event"])
+queue_depth = Gauge("queue_depth", "Work waiting in in-process queues.", ["queue"])
+resize_publish_events = Counter("resize_publish_events", "Resize jobs published, dropped and failed publish attempts.", ["event"])
+resize_result_events = Counter("resize_result_events", "Resize completion events consumed, and batches that failed.", ["event"])
+event_subscribers = Gauge("event_subscribers", "Open Server-Sent Events streams.")
+event_broker_events = Counter("event_broker_events", "Events published and delivered, and subscribers dropped or rejected.", ["event"])
+response_cache_entries = Gauge("response_cache_entries", "Responses held in the response cache.")
+
+
+def _timed(service: str, name: str, fn):
+    seconds = db_query_seconds.labels(service, name)
+    errors = db_query_errors.labels(service, name)
+
+    span_name = f"{service}.{name}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with TRACER.span(span_name, kind="client", attributes={"db.system": "postgresql"}):
+                return await fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def timed_service(cls):
+    """
+    Class decorator timing every async static method of a service into
+    db_query_seconds, each call in a span of its own.
+    """
+    for name, attr in list(vars(cls).items()):
+        if isinstance(attr, staticmethod) and inspect.iscoroutinefunction(attr.__func__):
+            setattr(cls, name, staticmethod(_timed(cls.__name__, name, attr.__func__)))
+    return cls
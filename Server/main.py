@@ -1,7 +1,35 @@
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, Query
-from db import get_db, init_db
-from schemas.post_schema import PostCreate, PostResponse, PostBase
+from datetime import datetime
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from db import get_db, init_db, init_pool, close_pool, get_pool
+from pool import PoolTimeout
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+from renditions import ManifestStore, pick_rendition
+from cache import CachedResponse, LRUCacheBackend, ResponseCache, etag_matches
+from publisher import MessagePublisher
+from consumer import MessageConsumer
+from uploads import UploadRejected, header_filename, store_stream
+from blobstore import BlobStore, blob_id_for, is_blob_id
+from image_serving import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, CachedFile, RangeNotSatisfiable, ServingStats,
+    ServingStatsMiddleware, SmallFileCache, file_etag, parse_range,
+)
+from services.blob_service import BlobService
+from singleflight import SingleFlight
+from broker import EventBroker
+from logsetup import setup_logging
+from tracing import TRACER, TracingMiddleware, extract, inject, setup_tracing
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS, MetricsMiddleware
+import instrumentation
+from security import InvalidToken, PasswordHasher, RateLimiter, TokenSigner, TrustedProxies, client_address, credential_key
+import secrets
+from thumbnails import MEDIA_TYPES, render_thumbnail, rendition_path
+from concurrent.futures import ThreadPoolExecutor
+import config
+import json
+import asyncio
+import time
+from schemas.post_schema import ImageRendition, PostCreate, PostResponse, PostBase, PostSearchResult
 from services.post_service import PostService
 from schemas.user_schema import UserCreate, UserResponse
 from services.user_service import UserService
@@ -10,139 +38,433 @@ from schemas.comment_schema import CommentCreate, CommentResponse
 from services.comment_service import CommentService
 from schemas.authentication_schema import Authentication, AuthenticationResponse
 from services.authentication_service import AuthenticationService
-from fastapi import File, UploadFile
-from fastapi.staticfiles import StaticFiles
-import shutil
+from schemas.feed_schema import FeedPost
+from schemas.bulk_schema import BulkResult
+from services.feed_service import FeedService
+from services.counter_service import CounterService
+from fastapi import File, UploadFile, Header
 import os
 
 import logging
 
 #For message service
 import pika
-from fastapi.responses import FileResponse
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,  # Log level
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),  # Log to file
-        logging.StreamHandler(),        # Log to console
-    ]
-)
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+
+# Setup logging: JSON lines via a background thread; see logsetup.py for the LOG_* settings
+setup_logging("api")
 logger = logging.getLogger(__name__)
+# Spans for requests, queries and uploads; see tracing.py for the TRACE_* settings
+setup_tracing("api")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Initializing application")
+    await init_pool()
     await init_db()
+    resize_publisher.start()
+    resize_results.start(asyncio.get_running_loop())
+    reconciler = asyncio.create_task(reconcile_counters_periodically())
+    proxy_resolver = asyncio.create_task(trusted_proxies.run())
     yield
     logger.info("Shutting down application")
-    # You can implement shutdown logic here if needed.
-    #await close_db()
+    reconciler.cancel()
+    proxy_resolver.cancel()
+    event_broker.close()
+    await asyncio.to_thread(resize_results.stop)
+    await asyncio.to_thread(resize_publisher.stop)
+    lazy_resize_executor.shutdown(wait=False, cancel_futures=True)
+    password_hasher.executor.shutdown(wait=False, cancel_futures=True)
+    await close_pool()
 
 app = FastAPI(lifespan=lifespan)
 
+
+counter_reconciliation = {"runs": 0, "last_result": None, "last_error": None}
+
+
+async def reconcile_counters_periodically():
+    """Repair counter drift every COUNTER_RECONCILE_INTERVAL seconds, starting one interval after boot."""
+    if config.COUNTER_RECONCILE_INTERVAL <= 0:
+        return
+    while True:
+        await asyncio.sleep(config.COUNTER_RECONCILE_INTERVAL)
+        try:
+            async with get_pool().connection() as db:
+                result = await CounterService.reconcile(db, config.COUNTER_RECONCILE_BATCH)
+            counter_reconciliation["runs"] += 1
+            counter_reconciliation["last_result"] = result
+        except Exception as e:
+            counter_reconciliation["last_error"] = str(e)
+            logger.error("Counter reconciliation failed: %s", e)
+
+
+image_stats = ServingStats()
+app.add_middleware(ServingStatsMiddleware, stats=image_stats, prefix="/api/v1/image/")
+app.add_middleware(MetricsMiddleware, requests=instrumentation.http_requests, latency=instrumentation.http_request_seconds)
+# Outermost, so the request span covers the other middleware; event streams stay open for minutes
+app.add_middleware(TracingMiddleware, exclude=("/metrics", "/api/v1/events"))
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    logger.error("Database pool exhausted for %s: %s", request.url.path, exc)
+    return JSONResponse(status_code=503, content={"detail": "Database busy, please retry."}, headers={"Retry-After": "1"})
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+def next_page_headers(request: Request, items: list, limit: int, cursor_for) -> dict:
+    """Advertise the cursor of the next page when this page came back full."""
+    if len(items) < limit:
+        return {}
+    next_cursor = cursor_for(items[-1])
+    next_url = request.url.remove_query_params("page").include_query_params(cursor=next_cursor)
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+
+
+def created_cursor(item) -> str:
+    return encode_cursor(item.time_created, item.id)
+
+
+# Response cache. Entries are tagged so writes drop exactly what they affect
+# (and a miss that raced a write is not stored; see CacheBackend):
+#   "posts:head"      first pages of the post listings and the latest post (a new post lands there)
+#   "comments:<id>"   comment listings, feed pages that embed the comments of post <id>, and
+#                     anything showing its comment_count (the post itself, post listings)
+response_cache = ResponseCache(LRUCacheBackend(config.CACHE_MAX_ENTRIES), config.CACHE_TTL)
+
+
+def serialize(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+
+
+def cached_response(request: Request, cached: CachedResponse) -> Response:
+    """Send a cached body, or 304 if the client already holds this version."""
+    headers = {**cached.headers, "ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        response_cache.counters["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+# Authentication: scrypt password hashes verified off the event loop, and signed
+# stateless access tokens any service holding AUTH_SECRET can check
+if not config.AUTH_SECRET:
+    logger.warning("AUTH_SECRET is not set; access tokens are signed with a random key and won't outlive this process")
+token_signer = TokenSigner(config.AUTH_SECRET or secrets.token_urlsafe(32), config.ACCESS_TOKEN_TTL)
+password_hasher = PasswordHasher(
+    n=config.PASSWORD_HASH_N,
+    executor=ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"),
+)
+login_limiter = RateLimiter(config.LOGIN_RATE, config.LOGIN_BURST)
+# Browser logins arrive through the frontend, which names the browser in X-Forwarded-For
+trusted_proxies = TrustedProxies(config.TRUSTED_PROXIES)
+# Recently failed username/password pairs, rejected again without a database round trip or a hash
+failed_logins = LRUCacheBackend(max_entries=100000)
+failed_login_secret = secrets.token_bytes(32)
+auth_counters = {"logins": 0, "failures": 0, "cached_failures": 0}
+
+
+async def current_user(authorization: Optional[str] = Header(None)) -> Optional[dict]:
+    """Claims of the caller's bearer token, checked without touching the database."""
+    if not authorization:
+        if config.AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Missing bearer token.", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Expected a bearer token.", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return token_signer.verify(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def check_author(claims: Optional[dict], username: str):
+    if claims is not None and claims["sub"] != username:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user.")
+
+
+def check_bulk_size(items: list, max_items: int = config.BULK_MAX_ITEMS):
+    if not items:
+        raise HTTPException(status_code=400, detail="Nothing to insert.")
+    if len(items) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} items per request.")
+
 UPLOAD_DIR = "uploads/full"
 REDUCED_DIR = "uploads/reduced"
 #os.makedirs(UPLOAD_DIR, exist_ok=True)  # Create the directory if it doesn't exist
+THUMB_RENDITION = "thumb"
+manifest_store = ManifestStore(REDUCED_DIR)
+blob_store = BlobStore(UPLOAD_DIR)
+upload_counters = {"stored": 0, "deduplicated": 0}
+image_cache = SmallFileCache(config.IMAGE_CACHE_MAX_BYTES, config.IMAGE_CACHE_MAX_FILE_BYTES)
+# Thumbnails rendered on request while the resizer hasn't got to an upload yet
+lazy_resize_executor = ThreadPoolExecutor(max_workers=config.LAZY_RESIZE_WORKERS, thread_name_prefix="lazy-resize")
+lazy_resizes = SingleFlight(lazy_resize_executor, config.LAZY_RESIZE_MAX_PENDING)
+
+
+# Live updates for browsers, fanned out per topic: "feed", "post:<id>" and "image:<blob id>"
+event_broker = EventBroker(
+    queue_size=config.EVENTS_QUEUE_SIZE,
+    replay_size=config.EVENTS_REPLAY_SIZE,
+    max_subscribers=config.EVENTS_MAX_SUBSCRIBERS,
+)
+
+
+def publish_post(post: dict):
+    event_broker.publish("feed", "post", post)
+
+
+def publish_comment(comment: dict):
+    # The feed shows the latest comments under every post
+    event_broker.publish(f"post:{comment['post_id']}", "comment", comment)
+    event_broker.publish("feed", "comment", comment)
+
+
+def publish_image(blob_id: str, image: dict):
+    # Pages showing a placeholder swap in the rendition; older pages follow the images they show
+    event_broker.publish("feed", "image", image)
+    event_broker.publish(f"image:{blob_id}", "image", image)
+
+
+def image_tags(posts) -> List[str]:
+    """Cache tags for responses embedding the image status of `posts`."""
+    return [f"image:{post.image}" for post in posts if is_blob_id(post.image) and post.image_status != "ready"]
+
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+def publish_bulk(items: List[dict], publish):
+    """Per-item events for small batches; one "refresh" for imports, which would overflow every client."""
+    if len(items) > config.EVENTS_BULK_FANOUT:
+        event_broker.publish("feed", "refresh", {"count": len(items)})
+        return
+    for item in items:
+        publish(item)
 
 
 # posts
 
 @app.post("/api/v1/post", response_model=PostCreate, status_code=200)
-def create_post(post: PostBase, db=Depends(get_db)):
-    logger.info(f"POST /posts called with data: {post}")
-    post_id = PostService.add_post(db, post)
-    logger.info(f"Post successfully added with ID: {post_id}")
+async def create_post(post: PostBase, claims=Depends(current_user), db=Depends(get_db)):
+    logger.debug("Creating post for %s", post.username)
+    check_author(claims, post.username)
+    post_id = await PostService.add_post(db, post)
+    logger.info("Post successfully added with ID: %s", post_id)
+    response_cache.invalidate("posts:head")
+    publish_post({"id": post_id, **post.model_dump()})
     return {"id": post_id, **post.model_dump(), "timestamp": "now"}
 
+@app.post("/api/v1/post/bulk", response_model=BulkResult)
+async def create_posts_bulk(posts: List[PostBase], claims=Depends(current_user), db=Depends(get_db)):
+    """Insert many posts in one transaction (for importers); ids are returned in request order."""
+    check_bulk_size(posts)
+    for post in posts:
+        check_author(claims, post.username)
+    logger.info("Bulk inserting %s posts", len(posts))
+    rows = await PostService.add_posts(db, posts)
+    response_cache.invalidate("posts:head")
+    publish_bulk([{**row, **post.model_dump()} for row, post in zip(rows, posts)], publish_post)
+    return {"created": [{"index": i, **row} for i, row in enumerate(rows)], "errors": []}
+
 @app.get("/api/v1/post/latest", response_model=PostResponse)
-def get_post_latest(db=Depends(get_db)):
+async def get_post_latest(request: Request):
     """
     Fetch the latest post.
     """
-    logger.info("Fetching the latest post")
-    post = PostService.get_latest_post(db)
-    if not post:
-        logger.warning("No posts available.")
-        raise HTTPException(status_code=404, detail="No posts available")
-    return post
+    logger.debug("Fetching the latest post")
+    key = ResponseCache.key("get_post_latest")
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation()
+        async with get_pool().connection() as db:
+            post = await PostService.get_latest_post(db)
+        if not post:
+            logger.warning("No posts available.")
+            raise HTTPException(status_code=404, detail="No posts available")
+        cached = response_cache.set(
+            key, serialize(post), tags=["posts:head", f"comments:{post.id}", *image_tags([post])], generation=generation,
+        )
+    return cached_response(request, cached)
 
 @app.get("/api/v1/post/{post_id}", response_model=PostResponse)
-def get_post(post_id: int, db=Depends(get_db)):
-    logger.info(f"Fetching post with ID: {post_id}")
-    post = PostService.get_post(db, id)
-    if not post:
-        logger.warning(f"Post with ID {id} not found")
-        raise HTTPException(status_code=404, detail="Post not found")
-    return post 
-
-@app.get("/api/v1/post/search/{query}", response_model=List[PostResponse])
-def search_posts(query: str, db=Depends(get_db)):
+async def get_post(post_id: int, request: Request):
+    logger.debug("Fetching post with ID: %s", post_id)
+    key = ResponseCache.key("get_post", {"post_id": post_id})
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation()
+        async with get_pool().connection() as db:
+            post = await PostService.get_post(db, post_id)
+        if not post:
+            logger.warning("Post with ID %s not found", post_id)
+            raise HTTPException(status_code=404, detail="Post not found")
+        # Only the comment counters and the image status of a post change
+        cached = response_cache.set(key, serialize(post), tags=[f"comments:{post_id}", *image_tags([post])], generation=generation)
+    return cached_response(request, cached)
+
+@app.get("/api/v1/post/search/{query}", response_model=List[PostSearchResult])
+async def search_posts(
+    query: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_db)
+):
     """
     Search for posts based on a query.
+    Supports websearch syntax ("quoted phrases", or, -excluded); results are ranked.
     """
-    logger.info(f"Searching posts with query: {query}")
-    posts = PostService.search_posts(db, query)
+    logger.debug("Searching posts with query: %s, cursor=%s, limit=%s", query, cursor, limit)
+    after = decode_cursor(cursor, float) if cursor else None
+    posts = await PostService.search_posts(db, query, limit, after)
+    response.headers.update(next_page_headers(request, posts, limit, lambda post: encode_cursor(post.rank, post.id)))
     return posts
 
 @app.get("/api/v1/post", response_model=List[PostResponse])
-def list_posts(
-    page: int = Query(1, ge=1),
+async def list_posts(
+    request: Request,
+    cursor: Optional[str] = None,
+    page: int = Query(1, ge=1, description="Deprecated, use the cursor from X-Next-Cursor"),
     limit: int = Query(50, ge=1),
-    db=Depends(get_db)
 ):
-    logger.info(f"Entering /post endpoint with page={page}, limit={limit}")
-    try:
-        posts = PostService.list_posts(db, page, limit)
-        logger.info(f"Posts retrieved: {len(posts)}")
-        return posts
-    except Exception as e:
-        logger.error(f"Error in /posts: {e}")
-        raise HTTPException(status_code=500, detail="Error fetching posts")
+    logger.debug("Entering /post endpoint with cursor=%s, page=%s, limit=%s", cursor, page, limit)
+    after = decode_cursor(cursor, datetime) if cursor else None
+    key = ResponseCache.key("list_posts", {"cursor": cursor or "", "page": page, "limit": limit})
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation()
+        async with get_pool().connection() as db:
+            try:
+                posts = await PostService.list_posts(db, limit, after, page)
+                logger.debug("Posts retrieved: %s", len(posts))
+            except Exception as e:
+                logger.error("Error in /posts: %s", e)
+                raise HTTPException(status_code=500, detail="Error fetching posts")
+        # Pages below a cursor never change when new posts arrive, only their comment counts and image statuses do
+        tags = [f"comments:{post.id}" for post in posts] + image_tags(posts)
+        if not after:
+            tags.append("posts:head")
+        cached = response_cache.set(
+            key, serialize(posts), next_page_headers(request, posts, limit, created_cursor), tags, generation=generation,
+        )
+    return cached_response(request, cached)
+
+# feed
+
+@app.get("/api/v1/feed", response_model=List[FeedPost])
+async def get_feed(
+    request: Request,
+    cursor: Optional[str] = None,
+    page: int = Query(1, ge=1, description="Deprecated, use the cursor from X-Next-Cursor"),
+    limit: int = Query(50, ge=1, le=100),
+    comments_limit: int = Query(5, ge=1, le=50),
+    image_width: int = Query(640, ge=1, le=4096, description="Display width in device pixels"),
+):
+    """
+    Posts with a preview of their latest comments and the total comment count,
+    so the home page needs a single request instead of one per post.
+    image_rendition names the smallest rendition at least image_width wide,
+    or is null while the resizer has not produced the renditions yet.
+    image_status says whether it still will (pending) or gave up (failed).
+    """
+    logger.debug("Fetching feed with cursor=%s, page=%s, limit=%s, comments_limit=%s", cursor, page, limit, comments_limit)
+    after = decode_cursor(cursor, datetime) if cursor else None
+    key = ResponseCache.key("get_feed", {
+        "cursor": cursor or "", "page": page, "limit": limit, "comments_limit": comments_limit, "image_width": image_width,
+    })
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation()
+        async with get_pool().connection() as db:
+            try:
+                posts = await FeedService.get_feed(db, limit, comments_limit, after, page)
+            except Exception as e:
+                logger.error("Error in /feed: %s", e)
+                raise HTTPException(status_code=500, detail="Error fetching feed")
+        for post in posts:
+            if post.image_renditions:
+                manifest = {"renditions": {name: r.model_dump() for name, r in post.image_renditions.items()}}
+            elif post.image and post.image_status != "failed":
+                # Images from before status tracking, or whose event hasn't been handled yet
+                manifest = manifest_store.get(storage_name(post.image))
+                if manifest is not None:
+                    post.image_status = "ready"
+                    post.image_width, post.image_height = manifest["width"], manifest["height"]
+                    post.image_renditions = {name: ImageRendition(**r) for name, r in manifest["renditions"].items()}
+            else:
+                manifest = None
+            post.image_rendition = pick_rendition(manifest, image_width) if manifest else None
+        tags = [f"comments:{post.id}" for post in posts] + image_tags(posts)
+        if not after:
+            tags.append("posts:head")
+        cached = response_cache.set(
+            key, serialize(posts), next_page_headers(request, posts, limit, created_cursor), tags, generation=generation,
+        )
+    return cached_response(request, cached)
 
 # users
 
 @app.post("/api/v1/user", response_model=UserResponse, status_code=201)
-def create_user(user: UserCreate, db=Depends(get_db)):
-    logger.info(f"Adding user: {user}")
+async def create_user(user: UserCreate):
+    logger.info("Adding user: %s", user.username)
     try:
-        user_id = UserService.add_user(db, user)
+        user_id = await UserService.add_user(get_pool(), password_hasher, user)
+        # Failures cached while this username didn't exist no longer apply
+        failed_logins.invalidate_tags([f"user:{user.username}"])
         return {"id": user_id, **user.model_dump()}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/v1/user/bulk", response_model=BulkResult)
+async def create_users_bulk(users: List[UserCreate]):
+    """Insert many users in one transaction; taken usernames or emails are reported per item."""
+    # Far fewer than other bulk inserts: every item costs a password hash
+    check_bulk_size(users, config.BULK_MAX_USERS)
+    logger.info("Bulk inserting %s users", len(users))
+    created, errors = await UserService.add_users(get_pool(), password_hasher, users)
+    failed_logins.invalidate_tags([f"user:{users[item['index']].username}" for item in created])
+    return {"created": created, "errors": errors}
+
 @app.get("/api/v1/user/{user_id}", response_model=UserResponse)
-def get_user_by_id(id: int, db=Depends(get_db)):
-    logger.info(f"Fetching user with ID: {id}")
-    user = UserService.get_user_by_id(db, id)
+async def get_user_by_id(id: int, db=Depends(get_db)):
+    logger.debug("Fetching user with ID: %s", id)
+    user = await UserService.get_user_by_id(db, id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @app.get("/api/v1/user", response_model=List[UserResponse])
-def search_users(
+async def search_users(
+    request: Request,
+    response: Response,
     username: Optional[str] = None,
     email: Optional[str] = None,
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = None,
+    page: int = Query(1, ge=1, description="Deprecated, use the cursor from X-Next-Cursor"),
     limit: int = Query(10, ge=1),
     db=Depends(get_db)
 ):
-    logger.info(f"Searching users, username: {username}, email: {email}, page: {page}, limit: {limit}")
-    return UserService.search_users(db, username, email, page, limit)
+    logger.debug("Searching users, username: %s, email: %s, cursor: %s, page: %s, limit: %s", username, email, cursor, page, limit)
+    after_id = decode_cursor(cursor, type(None))[1] if cursor else None
+    users = await UserService.search_users(db, username, email, limit, after_id, page)
+    response.headers.update(next_page_headers(request, users, limit, lambda user: encode_cursor(None, user.id)))
+    return users
 
 
 # comments
 
 @app.post("/api/v1/comment", response_model=CommentResponse, status_code=201)
-def create_comment(comment: CommentCreate, db=Depends(get_db)):
-    logger.info(f"Adding comment: {comment}")
+async def create_comment(comment: CommentCreate, claims=Depends(current_user), db=Depends(get_db)):
+    logger.debug("Adding comment on post %s by %s", comment.post_id, comment.username)
+    check_author(claims, comment.username)
     try:
-        result = CommentService.add_comment(db, comment)  # Now returns a dict with id and time_created
+        result = await CommentService.add_comment(db, comment)  # Now returns a dict with id and time_created
+        response_cache.invalidate(f"comments:{comment.post_id}")
         response = {
             "id": result["id"],
             "post_id": comment.post_id,
@@ -150,96 +472,515 @@ def create_comment(comment: CommentCreate, db=Depends(get_db)):
             "username": comment.username,
             "time_created": result["time_created"],  # Include time_created from DB
         }
-        logger.info(f"Comment response: {response}")
+        logger.info("Comment %s added to post %s", response["id"], comment.post_id)
+        publish_comment(response)
         return response
     except Exception as e:
-        logger.error(f"Error adding comment: {e}")
+        logger.error("Error adding comment: %s", e)
         raise HTTPException(status_code=500, detail="Error adding comment.")
 
 
+@app.post("/api/v1/comment/bulk", response_model=BulkResult)
+async def create_comments_bulk(comments: List[CommentCreate], claims=Depends(current_user), db=Depends(get_db)):
+    """Insert many comments in one transaction; comments on missing posts are reported per item."""
+    check_bulk_size(comments)
+    for comment in comments:
+        check_author(claims, comment.username)
+    logger.info("Bulk inserting %s comments", len(comments))
+    created, errors = await CommentService.add_comments(db, comments)
+    response_cache.invalidate(*{f"comments:{comments[item['index']].post_id}" for item in created})
+    publish_bulk(
+        [{"id": item["id"], "time_created": item["time_created"], **comments[item["index"]].model_dump()} for item in created],
+        publish_comment,
+    )
+    return {"created": created, "errors": errors}
+
+
 @app.get("/api/v1/comment/{post_id}", response_model=List[CommentResponse])
-def get_comments(post_id: int, db=Depends(get_db)):
-    logger.info(f"Fetching comments for post ID: {post_id}")
-    try:
-        comments = CommentService.get_comments_by_post(db, post_id)
+async def get_comments(
+    post_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+):
+    logger.debug("Fetching comments for post ID: %s, cursor=%s, limit=%s", post_id, cursor, limit)
+    after = decode_cursor(cursor, datetime) if cursor else None
+    key = ResponseCache.key("get_comments", {"post_id": post_id, "cursor": cursor or "", "limit": limit})
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation()
+        async with get_pool().connection() as db:
+            try:
+                comments = await CommentService.get_comments_by_post(db, post_id, limit, after)
+            except Exception as e:
+                logger.error("Error fetching comments for post ID %s: %s", post_id, e)
+                raise HTTPException(status_code=500, detail="Error fetching comments.")
         if not comments:
-            logger.warning(f"No comments found for post ID: {post_id}")
+            logger.warning("No comments found for post ID: %s", post_id)
         else:
-            logger.info(f"Comments fetched for post ID {post_id}: {comments}")
-        return comments
-    except Exception as e:
-        logger.error(f"Error fetching comments for post ID {post_id}: {e}")
-        raise HTTPException(status_code=500, detail="Error fetching comments.")
+            logger.debug("Fetched %s comments for post ID %s", len(comments), post_id)
+        headers = next_page_headers(request, comments, limit, created_cursor)
+        cached = response_cache.set(key, serialize(comments), headers, tags=[f"comments:{post_id}"], generation=generation)
+    return cached_response(request, cached)
+
+# live events
+
+def event_topics(topic: List[str]) -> List[str]:
+    topics = list(dict.fromkeys(topic))
+    if len(topics) > config.EVENTS_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {config.EVENTS_MAX_TOPICS} topics per stream.")
+    for name in topics:
+        kind, _, key = name.partition(":")
+        if not (name == "feed" or (kind == "post" and key.isdigit()) or (kind == "image" and is_blob_id(key))):
+            raise HTTPException(status_code=400, detail=f"Unknown topic {name!r}; use feed, post:<id> or image:<blob id>.")
+    return topics
+
+
+@app.get("/api/v1/events")
+async def stream_events(
+    topic: List[str] = Query(["feed"]),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events for new posts and comments, so pages update without
+    polling. Each stream ends after EVENTS_MAX_STREAM_SECONDS (or when the client
+    falls too far behind); EventSource then reconnects with Last-Event-ID and
+    receives what it missed from the replay buffer.
+    """
+    topics = event_topics(topic)
+    resume_after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscription = event_broker.subscribe(topics, resume_after)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many event streams.", headers={"Retry-After": "30"})
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.EVENTS_MAX_STREAM_SECONDS
+        try:
+            yield b"retry: 3000\n\n"
+            while loop.time() < deadline:
+                event = await subscription.next(timeout=config.EVENTS_KEEPALIVE)
+                if event is not None:
+                    yield event.to_sse()
+                elif subscription.closed:
+                    break
+                else:
+                    # Keeps proxies from timing out an idle stream
+                    yield b": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "Access-Control-Allow-Origin": config.EVENTS_ALLOW_ORIGIN,
+    }
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
 
 # For message service
 
 # RabbitMQ setup
-QUEUE_NAME = "image_resize"
+def connect_rabbitmq():
+    parameters = pika.URLParameters(config.RABBITMQ_URL)
+    return pika.BlockingConnection(parameters)
+
+
+resize_publisher = MessagePublisher(
+    connect_rabbitmq,
+    config.RESIZE_QUEUE,
+    make_properties=lambda headers: pika.BasicProperties(headers=headers or None),
+    max_buffer=config.PUBLISH_BUFFER_SIZE,
+    max_attempts=config.PUBLISH_MAX_ATTEMPTS,
+)
+
 
 def send_message_to_rabbitmq(file_path: str):
-    """Send a message to RabbitMQ to trigger image resizing."""
+    """Queue a message to RabbitMQ to trigger image resizing; delivery happens in the background."""
+    # The resizer reports the time from here to the start of the job as queue lag,
+    # and continues the upload's trace from the traceparent header
+    with TRACER.span(f"publish {config.RESIZE_QUEUE}", kind="producer", attributes={"file": file_path}) as span:
+        headers = inject({"x-enqueued-at": f"{time.time():.3f}"}, span)
+        if not resize_publisher.publish(file_path, headers=headers):
+            span.set_attribute("dropped", True)
+            logger.error("Failed to enqueue resize task for: %s", file_path)
+
+
+async def record_resize_results(messages):
+    """
+    Completion events from the resizer, a batch at a time: record each outcome
+    on its blob, drop cached responses showing the old status and tell pages.
+    """
+    received = time.time()
+    results, parents = [], {}
+    for body, headers in messages:
+        try:
+            event = json.loads(body)
+            blob_id = os.path.basename(event["file"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring malformed resize result %r: %s", body[:200], e)
+            continue
+        if not is_blob_id(blob_id):
+            continue  # legacy uploads have no blob row; their manifest is read from disk
+        results.append({
+            "id": blob_id,
+            "status": "ready" if event.get("status") == "ready" else "failed",
+            "width": event.get("width"),
+            "height": event.get("height"),
+            "renditions": event.get("renditions"),
+            "error": event.get("error"),
+        })
+        parents[blob_id] = extract(headers)
+    if not results:
+        return
+    async with get_pool().connection() as db:
+        updated = set(await BlobService.record_images(db, results))
+    response_cache.invalidate(*[f"image:{blob_id}" for blob_id in updated])
+    for result in results:
+        if result["id"] in updated:
+            publish_image(result["id"], {key: result[key] for key in ("id", "status", "width", "height", "renditions")})
+            # Ends the upload's trace: the image is ready (or failed) for every page
+            TRACER.start_span(
+                f"record {config.RESIZE_RESULTS_QUEUE}", kind="consumer", parent=parents[result["id"]],
+                attributes={"status": result["status"]}, start_time=received,
+            ).end()
+    logger.info("Recorded %s resize results (%s changed)", len(results), len(updated))
+
+
+resize_results = MessageConsumer(
+    connect_rabbitmq,
+    config.RESIZE_RESULTS_QUEUE,
+    record_resize_results,
+    batch_size=config.RESIZE_RESULTS_BATCH,
+)
+
+
+# images (placeholders)
+@app.exception_handler(UploadRejected)
+async def upload_rejected_handler(request: Request, exc: UploadRejected):
+    logger.warning("Upload rejected (%s): %s", exc.status_code, exc.detail)
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+
+def upload_response(blob_id: str, deduplicated: bool) -> dict:
+    message = "Image already stored, nothing to resize." if deduplicated else "Image uploaded and resize task enqueued."
+    return {"message": message, "image_path": blob_id, "deduplicated": deduplicated}
+
+
+async def save_upload(chunks, file_name: str) -> dict:
+    """
+    Stream an upload into the content-addressed blob store and enqueue it for
+    resizing. Identical content is stored and resized only once.
+    """
+    # Includes receiving the body, which streams in as it is written
+    with TRACER.span("store upload") as span:
+        stored = await store_stream(chunks, UPLOAD_DIR, config.MAX_UPLOAD_BYTES)
+        span.set_attribute("bytes", stored.size)
+    blob_id = blob_id_for(stored.sha256, stored.content_type)
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters("rabbitmq"))
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_NAME)
-        channel.basic_publish(exchange="", routing_key=QUEUE_NAME, body=file_path)
-        logger.info(f"Message sent to RabbitMQ for resizing: {file_path}")
-        connection.close()
+        with TRACER.span("blob put"):
+            written = await asyncio.to_thread(blob_store.put, stored.path, blob_id)
+        async with get_pool().connection() as db:
+            created = await BlobService.register_blob(db, blob_id, stored.size, stored.content_type)
     except Exception as e:
-        logger.error(f"Failed to send message to RabbitMQ: {e}")
-        #raise HTTPException(status_code=500, detail="Failed to enqueue image resize task.")
+        if os.path.exists(stored.path):
+            os.unlink(stored.path)
+        logger.error("Error uploading image: %s", e)
+        raise HTTPException(status_code=500, detail="Error uploading image.")
+
+    if not created:
+        upload_counters["deduplicated"] += 1
+        logger.info("Duplicate upload of %s matches blob %s", file_name, blob_id)
+        return upload_response(blob_id, deduplicated=True)
+
+    upload_counters["stored"] += 1
+    logger.info("Image %s saved as blob %s (%s bytes, written=%s)", file_name, blob_id, stored.size, written)
+    # Send message to RabbitMQ
+    send_message_to_rabbitmq(blob_store.relative_path(blob_id))
+    return upload_response(blob_id, deduplicated=False)
 
 
-# images (placeholders)
 @app.post("/api/v1/image")
-async def upload_image(image: UploadFile = File(...)):
-    """Upload an image and enqueue it for resizing."""
-    file_path = os.path.join(UPLOAD_DIR, image.filename)
+async def upload_image(image: UploadFile = File(...), claims=Depends(current_user)):
+    """Upload an image (multipart form) and enqueue it for resizing."""
+    async def chunks():
+        while chunk := await image.read(config.UPLOAD_CHUNK_SIZE):
+            yield chunk
+
+    return await save_upload(chunks(), image.filename)
+
+
+@app.post("/api/v1/image/stream")
+async def upload_image_stream(
+    request: Request,
+    x_filename: Optional[str] = Header(None),
+    x_content_sha256: Optional[str] = Header(None),
+    claims=Depends(current_user),
+):
+    """
+    Upload an image as the raw request body and enqueue it for resizing.
+    The body is written to disk as it arrives, so oversized or non-image uploads
+    are refused from the headers or the first bytes instead of after buffering.
+    If the client sends X-Content-SHA256 and that blob is already stored, the body
+    is not read at all.
+    """
+    file_name = header_filename(x_filename)
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise UploadRejected(415, "Content-Type must be an image type.")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.MAX_UPLOAD_BYTES:
+        raise UploadRejected(413, f"Image larger than {config.MAX_UPLOAD_BYTES} bytes.")
+    if x_content_sha256:
+        blob_id = blob_id_for(x_content_sha256.lower(), content_type)
+        if blob_id and is_blob_id(blob_id):
+            async with get_pool().connection() as db:
+                known = await BlobService.blob_exists(db, blob_id)
+            if known:
+                upload_counters["deduplicated"] += 1
+                logger.info("Upload of %s skipped, blob %s already stored", file_name, blob_id)
+                return upload_response(blob_id, deduplicated=True)
+    return await save_upload(request.stream(), file_name)
+
+
+def storage_name(file_name: str) -> str:
+    """Path of an image below uploads/full (and of its renditions): sharded for blobs, flat for legacy uploads."""
+    return blob_store.relative_path(file_name) if is_blob_id(file_name) else file_name
+
+@app.get("/api/v1/image/manifest/{file_name}")
+async def get_image_manifest(file_name: str):
+    """Renditions available for an image (name -> path, size, bytes); 404 until the resizer is done."""
+    manifest = manifest_store.get(storage_name(file_name))
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Image renditions not ready.")
+    return manifest
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def image_headers(etag: str, immutable: bool) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+
+def range_not_satisfiable(size: int, headers: dict) -> Response:
+    return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+
+def bytes_response(request: Request, body: bytes, media_type: Optional[str], headers: dict) -> Response:
+    """Send an in-memory file, honouring a single byte Range."""
     try:
-        # Save the uploaded image
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(image.file, f)
-        logger.info(f"Image saved: {file_path}")
+        byte_range = parse_range(request.headers.get("range"), len(body))
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(len(body), headers)
+    if_range = request.headers.get("if-range")
+    if byte_range is None or (if_range and if_range != headers["ETag"]):
+        return Response(content=body, media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers = {**headers, "Content-Range": f"bytes {start}-{end}/{len(body)}"}
+    return Response(content=body[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+async def serve_image(request: Request, path: str, media_type: Optional[str] = None, immutable: bool = False,
+                      content_hash: Optional[str] = None) -> Response:
+    """
+    Serve an image file with validators and caching headers.
 
-        # Send message to RabbitMQ
-        send_message_to_rabbitmq(image.filename)
+    Content-addressed files (blobs and their renditions) never change, so browsers
+    may keep them for a year without revalidating; legacy names get no-cache plus
+    a strong ETag, which turns repeat fetches into 304s. Small files are served
+    from an in-memory LRU, larger ones through FileResponse, which handles Range
+    itself and uses the server's zero-copy path send when it offers one.
+    """
+    if immutable:
+        # Immutable content: a cache hit needs no stat at all
+        cached = image_cache.get(path)
+        if cached is not None:
+            headers = image_headers(cached.etag, immutable)
+            if etag_matches(request.headers.get("if-none-match"), cached.etag):
+                return Response(status_code=304, headers=headers)
+            return bytes_response(request, cached.body, media_type, headers)
 
-        return {"message": "Image uploaded and resize task enqueued.", "image_path": image.filename}
-    except Exception as e:
-        logger.error(f"Error uploading image: {e}")
-        raise HTTPException(status_code=500, detail="Error uploading image.")
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found.")
+    etag = file_etag(stat_result.st_size, stat_result.st_mtime_ns, content_hash)
+    headers = image_headers(etag, immutable)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        parse_range(request.headers.get("range"), stat_result.st_size)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(stat_result.st_size, headers)
+
+    if image_cache.fits(stat_result.st_size):
+        cached = None if immutable else image_cache.get(path, stat_result.st_mtime_ns)
+        if cached is None:
+            cached = CachedFile(await asyncio.to_thread(read_file, path), etag, stat_result.st_mtime_ns)
+            image_cache.put(path, cached)
+        return bytes_response(request, cached.body, media_type, headers)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+
+@app.get("/api/v1/image/rendition/{rendition}/{file_name}")
+async def get_image_rendition(request: Request, rendition: str, file_name: str):
+    """Serve one rendition (e.g. thumb, feed, large) of an image."""
+    manifest = manifest_store.get(storage_name(file_name))
+    path = manifest_store.rendition_path(manifest, rendition) if manifest else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Rendition not found.")
+    media_type = f"image/{manifest['renditions'][rendition]['format']}"
+    # Renditions of a blob are written once, so they are as immutable as the blob
+    return await serve_image(request, path, media_type, immutable=is_blob_id(file_name))
 
 @app.get("/api/v1/image/reduced/{file_name}")
-async def get_reduced_image(file_name: str):
-    """Serve the reduced-size image."""
-    reduced_path = os.path.join(REDUCED_DIR, file_name)
-    if not os.path.exists(reduced_path):
+async def get_reduced_image(request: Request, file_name: str):
+    """
+    Serve the reduced-size image. If the resizer hasn't written it yet, render the
+    thumbnail now (one render per image however many requests ask for it) and
+    send the original if that takes longer than LAZY_RESIZE_TIMEOUT.
+    """
+    manifest = manifest_store.get(storage_name(file_name))
+    if manifest is not None:
+        return await get_image_rendition(request, THUMB_RENDITION, file_name)
+    if not is_blob_id(file_name):
+        # Thumbnails written before renditions existed
+        legacy_path = os.path.join(REDUCED_DIR, file_name)
+        if os.path.exists(legacy_path):
+            return await serve_image(request, legacy_path)
+
+    media_type = MEDIA_TYPES[config.RENDITION_FORMAT]
+    thumb_path = rendition_path(REDUCED_DIR, THUMB_RENDITION, storage_name(file_name), config.RENDITION_FORMAT)
+    if os.path.exists(thumb_path):
+        return await serve_image(request, thumb_path, media_type, immutable=is_blob_id(file_name))
+    source_path = os.path.join(UPLOAD_DIR, storage_name(file_name))
+    if not os.path.exists(source_path):
         raise HTTPException(status_code=404, detail="Reduced-size image not found.")
-    return FileResponse(reduced_path)
+
+    job = lazy_resizes.run(
+        thumb_path, render_thumbnail, source_path, thumb_path, config.THUMB_EDGE, config.RENDITION_FORMAT,
+        config.RENDITION_QUALITY,
+    )
+    if job is not None and await lazy_resizes.wait(job, config.LAZY_RESIZE_TIMEOUT):
+        return await serve_image(request, thumb_path, media_type, immutable=is_blob_id(file_name))
+    logger.warning("No thumbnail for %s in time, sending the original", file_name)
+    # Not cacheable as immutable: the thumbnail will replace it at this URL
+    return await serve_image(request, source_path)
 
 @app.get("/api/v1/image/full/{file_name}")
-async def get_full_image(file_name: str):
+async def get_full_image(request: Request, file_name: str):
     """Serve the full-size image."""
-    logger.info(f"Trying to get image: {file_name}")
-    file_path = os.path.join(UPLOAD_DIR, file_name)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Full-size image not found.")
-    return FileResponse(file_path)
+    logger.debug("Trying to get image: %s", file_name)
+    file_path = os.path.join(UPLOAD_DIR, storage_name(file_name))
+    if is_blob_id(file_name):
+        return await serve_image(request, file_path, immutable=True, content_hash=file_name.split(".")[0])
+    return await serve_image(request, file_path)
+
+
+# stats
+
+@METRICS.on_collect
+def collect_gauges():
+    """Point-in-time values read at scrape time rather than tracked on every change."""
+    publisher = resize_publisher.stats()
+    instrumentation.queue_depth.labels("resize_publish").set(publisher["buffered"])
+    for event in ("published", "dropped", "failed_attempts"):
+        instrumentation.resize_publish_events.labels(event).set_total(publisher[event])
+    instrumentation.queue_depth.labels("lazy_resize").set(lazy_resizes.stats()["inflight"])
+    results = resize_results.stats()
+    for event in ("consumed", "failed_batches"):
+        instrumentation.resize_result_events.labels(event).set_total(results[event])
+
+    events = event_broker.stats()
+    instrumentation.event_subscribers.set(events["subscribers"])
+    for event in ("published", "delivered", "overflows", "rejected"):
+        instrumentation.event_broker_events.labels(event).set_total(events[event])
+    instrumentation.response_cache_entries.set(len(response_cache.backend))
+
+    pool = get_pool().stats()
+    instrumentation.db_pool_connections.labels("idle").set(pool["idle"])
+    instrumentation.db_pool_connections.labels("in_use").set(pool["in_use"])
+    instrumentation.db_pool_waiting.set(pool["waiting"])
+    for event in ("connections_opened", "connections_discarded", "checkouts", "waits", "timeouts"):
+        instrumentation.db_pool_events.labels(event).set_total(pool[event])
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(METRICS.exposition(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/v1/stats/db")
+async def get_db_stats():
+    """Connection pool usage, to spot saturation (in_use close to max_size, waits and timeouts growing)."""
+    return get_pool().stats()
+
+@app.get("/api/v1/stats/publisher")
+async def get_publisher_stats():
+    return {**resize_publisher.stats(), "results": resize_results.stats()}
+
+@app.get("/api/v1/stats/blobs")
+async def get_blob_stats(db=Depends(get_db)):
+    """Stored blobs and their references; references minus blobs is what deduplication saved."""
+    return {**await BlobService.get_stats(db), **upload_counters}
+
+@app.get("/api/v1/stats/images")
+async def get_image_stats():
+    """Bytes served and latency percentiles per image route, plus the thumbnail cache."""
+    return {"routes": image_stats.stats(), "memory_cache": image_cache.stats(), "lazy_resizes": lazy_resizes.stats()}
+
+@app.get("/api/v1/stats/events")
+async def get_event_stats():
+    return event_broker.stats()
+
+@app.get("/api/v1/stats/counters")
+async def get_counter_stats():
+    return counter_reconciliation
+
+@app.get("/api/v1/stats/cache")
+async def get_cache_stats():
+    return response_cache.stats()
 
 
 # authentication
 
 @app.post("/api/v1/authenticate", response_model=AuthenticationResponse, status_code=201)
-async def authenticate(authentication: Authentication, db=Depends(get_db)):
-    logger.info(f"Trying to authenticate user: {authentication.username}")
-    try:
-        result = AuthenticationService.authenticate_user(db, authentication)  # Now returns a dict with id and time_created
-        response = {
-            "valid": result
-        }
-        logger.info(f"Authentication response: {response}")
-        return response
-    except Exception as e:
-        logger.error(f"Error authenticating: {e}")
-        raise HTTPException(status_code=500, detail="Error authenticating.")
-    
+async def authenticate(request: Request, authentication: Authentication):
+    """
+    Check a username and password and issue an access token. Attempts are rate
+    limited per client address and per username (429 when exceeded).
+    """
+    logger.debug("Trying to authenticate user: %s", authentication.username)
+    client = client_address(request.client.host if request.client else None, request.headers.get("x-forwarded-for"), trusted_proxies)
+    if not (login_limiter.allow(f"client:{client}") and login_limiter.allow(f"user:{authentication.username}")):
+        logger.warning("Login attempts rate limited for %s from %s", authentication.username, client)
+        raise HTTPException(
+            status_code=429, detail="Too many login attempts.", headers={"Retry-After": str(login_limiter.retry_after())}
+        )
+
+    key = credential_key(failed_login_secret, authentication.username, authentication.password)
+    if failed_logins.get(key) is not None:
+        auth_counters["cached_failures"] += 1
+        return {"valid": False}
+    user_id = await AuthenticationService.authenticate_user(get_pool(), password_hasher, authentication)
+    if user_id is None:
+        auth_counters["failures"] += 1
+        failed_logins.set(key, True, config.LOGIN_FAILURE_TTL, tags=[f"user:{authentication.username}"])
+        logger.info("Authentication failed for user: %s", authentication.username)
+        return {"valid": False}
+
+    auth_counters["logins"] += 1
+    return {
+        "valid": True,
+        "access_token": token_signer.issue(authentication.username, user_id),
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_TTL,
+    }
+
+@app.get("/api/v1/stats/auth")
+async def get_auth_stats():
+    return {**auth_counters, **login_limiter.counters}
@@ -0,0 +1,119 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+# pg_advisory_lock key shared by every replica running migrations
+MIGRATION_LOCK_ID = 7_346_001
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: str
+
+    def sql(self) -> str:
+        with open(self.path) as f:
+            return f.read()
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Migrations named <version>_<name>.sql, in version order."""
+    migrations = {}
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Two migrations with version {version}: {migrations[version].name}, {match.group(2)}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, file_name))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def pending(migrations: List[Migration], applied: Set[int]) -> List[Migration]:
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+async def applied_versions(conn) -> Optional[Set[int]]:
+    """Versions recorded in schema_migrations, or None if the table doesn't exist yet."""
+    cursor = await conn.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    exists = (await cursor.fetchone())[0]
+    applied = None
+    if exists:
+        cursor = await conn.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in await cursor.fetchall()}
+    await conn.commit()
+    return applied
+
+
+async def migrate(conn, migrations: List[Migration] = None) -> List[int]:
+    """
+    Bring the schema up to date and return the versions applied.
+
+    When every migration is already recorded this costs two catalog queries and
+    runs no DDL. Otherwise it takes an advisory lock, so replicas starting at the
+    same time apply each migration exactly once: the others wait, then find
+    nothing left to do. Each migration runs in its own transaction together with
+    its schema_migrations row.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    applied = await applied_versions(conn)
+    if applied is not None and not pending(migrations, applied):
+        logger.info("Database schema is current (version %s)", max(applied, default=0))
+        return []
+
+    await conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    await conn.commit()
+    try:
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await conn.commit()
+        # Another replica may have migrated while we waited for the lock
+        applied = await applied_versions(conn)
+        done = []
+        for migration in pending(migrations, applied):
+            logger.info("Applying migration %s_%s", migration.version, migration.name)
+            try:
+                async with conn.transaction():
+                    await conn.execute(migration.sql())
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (migration.version, migration.name)
+                    )
+            except Exception as e:
+                raise MigrationError(f"Migration {migration.version}_{migration.name} failed: {e}") from e
+            done.append(migration.version)
+        return done
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        await conn.commit()
+
+
+if __name__ == "__main__":
+    # Apply migrations without starting the API: python migrate.py
+    import asyncio
+    import psycopg
+    import config
+
+    async def main():
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        async with await psycopg.AsyncConnection.connect(config.DATABASE_URL) as conn:
+            applied = await migrate(conn)
+            logger.info("Applied migrations: %s", applied or 'none')
+
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+-- Tables as they were created by init_db before migrations existed.
+-- IF NOT EXISTS so databases created by init_db are adopted as version 1.
+
+CREATE TABLE IF NOT EXISTS posts (
+    id SERIAL PRIMARY KEY,
+    image TEXT,
+    text TEXT,
+    username TEXT,
+    time_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username TEXT UNIQUE,
+    email TEXT UNIQUE,
+    password TEXT
+);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id SERIAL PRIMARY KEY,
+    post_id INTEGER NOT NULL REFERENCES posts(id),
+    text TEXT NOT NULL,
+    username TEXT NOT NULL,
+    time_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Content-addressed uploads referenced by posts.image
+CREATE TABLE IF NOT EXISTS blobs (
+    id TEXT PRIMARY KEY,  -- sha256 hex + extension
+    size BIGINT NOT NULL,
+    content_type TEXT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    time_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
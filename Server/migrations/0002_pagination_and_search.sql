@@ -0,0 +1,17 @@
+-- Keyset pagination on (time_created, id). The comments index also serves as
+-- the index on the comments.post_id foreign key.
+CREATE INDEX IF NOT EXISTS posts_time_created_id_idx ON posts (time_created DESC, id DESC);
+CREATE INDEX IF NOT EXISTS comments_post_id_time_created_id_idx ON comments (post_id, time_created, id);
+
+-- Full-text search over posts and trigram search over users
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(text, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(username, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS posts_search_vector_idx ON posts USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS users_username_trgm_idx ON users USING GIN (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS users_email_trgm_idx ON users USING GIN (email gin_trgm_ops);
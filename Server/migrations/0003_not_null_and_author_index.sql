@@ -0,0 +1,25 @@
+-- The API never wrote NULLs here; backfill anything inserted by hand, then enforce it.
+UPDATE posts SET image = '' WHERE image IS NULL;
+UPDATE posts SET text = '' WHERE text IS NULL;
+UPDATE posts SET username = '' WHERE username IS NULL;
+UPDATE posts SET time_created = CURRENT_TIMESTAMP WHERE time_created IS NULL;
+ALTER TABLE posts
+    ALTER COLUMN image SET NOT NULL,
+    ALTER COLUMN text SET NOT NULL,
+    ALTER COLUMN username SET NOT NULL,
+    ALTER COLUMN time_created SET NOT NULL;
+
+UPDATE comments SET time_created = CURRENT_TIMESTAMP WHERE time_created IS NULL;
+ALTER TABLE comments ALTER COLUMN time_created SET NOT NULL;
+
+UPDATE blobs SET time_created = CURRENT_TIMESTAMP WHERE time_created IS NULL;
+ALTER TABLE blobs ALTER COLUMN time_created SET NOT NULL;
+
+-- Users always get all three through the API; a NULL here would be unusable anyway
+ALTER TABLE users
+    ALTER COLUMN username SET NOT NULL,
+    ALTER COLUMN email SET NOT NULL,
+    ALTER COLUMN password SET NOT NULL;
+
+-- Posts by author, newest first
+CREATE INDEX IF NOT EXISTS posts_username_time_created_idx ON posts (username, time_created DESC);
@@ -0,0 +1,18 @@
+-- Denormalized activity counters, kept up to date by the services in the same
+-- transaction as the write and repaired by CounterService.reconcile.
+ALTER TABLE posts
+    ADD COLUMN IF NOT EXISTS comment_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS last_comment_at TIMESTAMP;
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS post_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE posts p
+SET comment_count = c.n, last_comment_at = c.last
+FROM (SELECT post_id, count(*) AS n, max(time_created) AS last FROM comments GROUP BY post_id) c
+WHERE p.id = c.post_id;
+
+UPDATE users u
+SET post_count = p.n
+FROM (SELECT username, count(*) AS n FROM posts GROUP BY username) p
+WHERE u.username = p.username;
@@ -0,0 +1,14 @@
+-- Resize outcome per image, recorded from the resizer's completion events
+-- (image_resize.done). Posts read it through posts.image = blobs.id, so every
+-- post of identical content shares one status.
+ALTER TABLE blobs
+    ADD COLUMN IF NOT EXISTS image_status TEXT,  -- pending, ready or failed
+    ADD COLUMN IF NOT EXISTS width INTEGER,
+    ADD COLUMN IF NOT EXISTS height INTEGER,
+    ADD COLUMN IF NOT EXISTS renditions JSONB,  -- name -> {path, width, height, bytes, format}
+    ADD COLUMN IF NOT EXISTS image_error TEXT,
+    ADD COLUMN IF NOT EXISTS processed_at TIMESTAMP;
+
+-- Blobs stored from now on wait for their event. Earlier ones keep a NULL
+-- status: whether they were resized is only known from the manifest on disk.
+ALTER TABLE blobs ALTER COLUMN image_status SET DEFAULT 'pending';
@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+SortKey = Union[datetime, float, None]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not produced by encode_cursor."""
+
+
+def encode_cursor(sort_key: SortKey, row_id: int) -> str:
+    """
+    Opaque keyset cursor pointing at the last row of a page: the row's sort key
+    (time_created, or the rank for search results) and its id as a tie-breaker.
+    """
+    payload = [sort_key.isoformat() if isinstance(sort_key, datetime) else sort_key, row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_key_type: Optional[type] = None) -> Tuple[SortKey, int]:
+    """
+    The sort key and id in a cursor. `sort_key_type` is what the endpoint pages
+    by (datetime, float or type(None)); a cursor from an endpoint sorted by
+    something else is rejected rather than reaching the query.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, row_id = json.loads(raw)
+        if not isinstance(row_id, int) or isinstance(row_id, bool):
+            raise InvalidCursor("Invalid cursor")
+        if isinstance(sort_key, str):
+            sort_key = datetime.fromisoformat(sort_key)
+        elif isinstance(sort_key, bool) or (sort_key is not None and not isinstance(sort_key, (int, float))):
+            raise InvalidCursor("Invalid cursor")
+        elif isinstance(sort_key, int):
+            sort_key = float(sort_key)  # a rank that serialized without a fraction
+        if sort_key_type is not None and not isinstance(sort_key, sort_key_type):
+            raise InvalidCursor("Invalid cursor")
+        return sort_key, row_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
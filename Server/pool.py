@@ -0,0 +1,172 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout."""
+
+
+class AsyncConnectionPool:
+    """
+    Pool of database connections for use from the event loop.
+
+    `connect` opens a new connection, `check` raises if a connection is no longer
+    usable and `reset` returns a connection to a clean state before it is reused;
+    all three are coroutine functions.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0, check_after=30.0, check=None, reset=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self._check = check
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+
+        self._cond = asyncio.Condition()
+        self._idle = deque()  # (connection, time returned to the pool)
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "connections_opened": 0,
+            "connections_discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    async def open(self):
+        conns = await asyncio.gather(*(self._connect() for _ in range(self.min_size)))
+        now = time.monotonic()
+        async with self._cond:
+            for conn in conns:
+                self._idle.append((conn, now))
+            self._size += len(conns)
+            self._counters["connections_opened"] += len(conns)
+
+    async def _discard(self, conn):
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.warning("Error closing pooled connection: %s", e)
+        async with self._cond:
+            self._size -= 1
+            self._counters["connections_discarded"] += 1
+            self._cond.notify()
+
+    async def _healthy(self, conn, idle_since):
+        if getattr(conn, "closed", False):
+            return False
+        if self._check is None or time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            await self._check(conn)
+            return True
+        except Exception as e:
+            logger.warning("Discarding unhealthy pooled connection: %s", e)
+            return False
+
+    async def _wait_for_idle(self, timeout):
+        self._counters["waits"] += 1
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._cond.wait(), timeout)
+        finally:
+            self._waiting -= 1
+
+    async def getconn(self, timeout=None):
+        """Take a connection from the pool, opening one if below max_size."""
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            async with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                reserved = False
+                while not self._idle:
+                    if self._size < self.max_size:
+                        # Reserve the slot before connecting outside the lock.
+                        self._size += 1
+                        reserved = True
+                        break
+                    remaining = deadline - loop.time()
+                    try:
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        await self._wait_for_idle(remaining)
+                    except asyncio.TimeoutError:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available after {timeout:.1f}s")
+                if not reserved:
+                    conn, idle_since = self._idle.pop()
+
+            if reserved:
+                try:
+                    conn = await self._connect()
+                except BaseException:
+                    async with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                async with self._cond:
+                    self._counters["connections_opened"] += 1
+            elif not await self._healthy(conn, idle_since):
+                await self._discard(conn)
+                continue
+
+            self._counters["checkouts"] += 1
+            return conn
+
+    async def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if it is broken."""
+        if not discard and not getattr(conn, "closed", False) and self._reset is not None:
+            try:
+                await self._reset(conn)
+            except Exception as e:
+                logger.warning("Failed to reset pooled connection: %s", e)
+                discard = True
+        if discard or self._closed or getattr(conn, "closed", False):
+            await self._discard(conn)
+            return
+        async with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        conn = await self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            await self.putconn(conn)
+
+    def stats(self) -> dict:
+        idle = len(self._idle)
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": idle,
+            "in_use": self._size - idle,
+            "waiting": self._waiting,
+            **self._counters,
+        }
+
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            await self._discard(conn)
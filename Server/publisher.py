@@ -0,0 +1,169 @@
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutgoingMessage:
+    body: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    attempts: int = 0
+
+
+class MessagePublisher:
+    """
+    Long-lived publisher for one queue.
+
+    The broker connection is owned by a background thread (pika connections are not
+    thread-safe), which reuses one channel with publisher confirms enabled. publish()
+    only appends to an in-memory buffer, so it is safe to call from the event loop.
+    While the broker is unreachable messages stay buffered and the thread reconnects
+    with exponential backoff; a message is only dropped from the buffer once the
+    broker has confirmed it, or after `max_attempts` failed publishes of it, so
+    one the broker keeps refusing (nacked, or returned as unroutable) does not
+    hold up everything queued behind it. Failing to connect uses no attempts.
+
+    `connect` returns a pika BlockingConnection (or anything with the same
+    interface); `make_properties` turns message headers into BasicProperties.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        queue_name: str,
+        make_properties: Optional[Callable] = None,
+        max_buffer: int = 10000,
+        max_attempts: int = 10,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+        idle_interval: float = 1.0,
+    ):
+        self._connect = connect
+        self.queue_name = queue_name
+        self._make_properties = make_properties
+        self.max_buffer = max_buffer
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.idle_interval = idle_interval
+
+        self._buffer = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._connection = None
+        self._channel = None
+        self._counters = {"published": 0, "failed_attempts": 0, "dropped": 0, "reconnects": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"publisher-{self.queue_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop after flushing the buffer, waiting at most `timeout` seconds."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        remaining = len(self._buffer)
+        if remaining:
+            logger.error("Publisher stopped with %s unsent messages for %s", remaining, self.queue_name)
+
+    def publish(self, body: str, headers: Dict[str, str] = None) -> bool:
+        """Queue a message for delivery; returns False if the buffer is full."""
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self._counters["dropped"] += 1
+                logger.error("Publish buffer full, dropping message for %s: %s", self.queue_name, body)
+                return False
+            self._buffer.append(OutgoingMessage(body, dict(headers or {})))
+            self._cond.notify()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queue": self.queue_name,
+            "connected": self._channel is not None,
+            "buffered": len(self._buffer),
+            **self._counters,
+        }
+
+    def _open_channel(self):
+        self._connection = self._connect()
+        channel = self._connection.channel()
+        channel.confirm_delivery()
+        channel.queue_declare(queue=self.queue_name)
+        self._channel = channel
+        logger.info("Publisher connected for queue %s", self.queue_name)
+
+    def _close(self):
+        connection, self._connection, self._channel = self._connection, None, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _next_message(self) -> Optional[OutgoingMessage]:
+        with self._cond:
+            if not self._buffer and not self._stopping:
+                self._cond.wait(self.idle_interval)
+            return self._buffer.popleft() if self._buffer else None
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self._cond:
+                if self._stopping and not self._buffer:
+                    break
+            try:
+                if self._channel is None:
+                    self._open_channel()
+                    delay = self.retry_delay
+                message = self._next_message()
+                if message is None:
+                    # Keep heartbeats flowing while idle
+                    self._connection.process_data_events(time_limit=0)
+                    continue
+                self._send(message)
+            except Exception as e:
+                self._counters["reconnects"] += 1
+                logger.error("Publisher for %s lost the broker, retrying in %.1fs: %s", self.queue_name, delay, e)
+                self._close()
+                with self._cond:
+                    if self._stopping:
+                        # Don't hold up shutdown waiting for the broker to come back
+                        break
+                    self._cond.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+        self._close()
+
+    def _send(self, message: OutgoingMessage):
+        properties = self._make_properties(message.headers) if self._make_properties else None
+        message.attempts += 1
+        try:
+            # With confirms enabled this blocks until the broker acks, and raises on nack
+            self._channel.basic_publish(
+                exchange="",
+                routing_key=self.queue_name,
+                body=message.body,
+                properties=properties,
+                mandatory=True,
+            )
+        except Exception as e:
+            self._counters["failed_attempts"] += 1
+            if message.attempts >= self.max_attempts:
+                self._counters["dropped"] += 1
+                logger.error("Dropping message for %s after %s failed attempts: %s (%s)",
+                             self.queue_name, message.attempts, message.body, e)
+            else:
+                with self._cond:
+                    self._buffer.appendleft(message)
+            raise
+        self._counters["published"] += 1
+        logger.debug("Message sent to RabbitMQ queue %s: %s", self.queue_name, message.body)
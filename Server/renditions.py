@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class ManifestStore:
+    """
+    Reads the rendition manifests written by the image resizer.
+
+    A manifest only appears once every rendition of an image has been written and
+    never changes afterwards, so found manifests are kept in a bounded in-memory LRU.
+    Missing ones are not cached: the resizer may still be working on them.
+    """
+
+    def __init__(self, reduced_dir: str, max_entries: int = 4096):
+        self.reduced_dir = reduced_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._manifests = OrderedDict()
+
+    def manifest_path(self, file_name: str) -> str:
+        return os.path.join(self.reduced_dir, "manifest", f"{file_name}.json")
+
+    def rendition_path(self, manifest: dict, rendition: str) -> Optional[str]:
+        entry = manifest["renditions"].get(rendition)
+        return os.path.join(self.reduced_dir, entry["path"]) if entry else None
+
+    def get(self, file_name: str) -> Optional[dict]:
+        with self._lock:
+            manifest = self._manifests.get(file_name)
+            if manifest is not None:
+                self._manifests.move_to_end(file_name)
+                return manifest
+        try:
+            with open(self.manifest_path(file_name)) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        with self._lock:
+            self._manifests[file_name] = manifest
+            while len(self._manifests) > self.max_entries:
+                self._manifests.popitem(last=False)
+        return manifest
+
+
+def pick_rendition(manifest: dict, width: int) -> Optional[str]:
+    """Smallest rendition at least `width` pixels wide, or the largest one if none is."""
+    renditions = sorted(manifest.get("renditions", {}).items(), key=lambda item: item[1]["width"])
+    if not renditions:
+        return None
+    for name, entry in renditions:
+        if entry["width"] >= width:
+            return name
+    return renditions[-1][0]
@@ -1,8 +1,12 @@
 from pydantic import BaseModel, EmailStr
+from typing import Optional
 
 class Authentication(BaseModel):
     username: str
     password: str
 
 class AuthenticationResponse(BaseModel):
-    valid: bool
\ No newline at end of file
+    valid: bool
+    access_token: Optional[str] = None  # send as "Authorization: Bearer <token>"
+    token_type: Optional[str] = None
+    expires_in: Optional[int] = None
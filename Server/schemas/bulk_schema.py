@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class BulkCreated(BaseModel):
+    index: int  # position in the request body
+    id: int
+    time_created: Optional[datetime] = None
+
+class BulkError(BaseModel):
+    index: int
+    detail: str
+
+class BulkResult(BaseModel):
+    created: List[BulkCreated]
+    errors: List[BulkError]
@@ -0,0 +1,7 @@
+from typing import List, Optional
+from schemas.post_schema import PostResponse
+from schemas.comment_schema import CommentResponse
+
+class FeedPost(PostResponse):
+    comments: List[CommentResponse]  # most recent comments, oldest first
+    image_rendition: Optional[str] = None  # smallest rendition that fits the requested width
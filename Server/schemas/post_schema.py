@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Dict, Optional
 
 class PostCreate(BaseModel):
     username: str
@@ -13,9 +14,28 @@ class PostBase(BaseModel):
     image: str
 
 
+class ImageRendition(BaseModel):
+    width: int
+    height: int
+    bytes: int
+    format: str
+
+
 class PostResponse(BaseModel):
     id: int
     username: str
     text: str
     image: str
-    time_created: datetime
\ No newline at end of file
+    time_created: datetime
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
+    # Set from the resizer's completion event: pending, ready or failed. Null for
+    # images uploaded before this was tracked, whose renditions may still exist.
+    image_status: Optional[str] = None
+    image_width: Optional[int] = None
+    image_height: Optional[int] = None
+    image_renditions: Optional[Dict[str, ImageRendition]] = None  # name (thumb, feed, large) -> size
+
+class PostSearchResult(PostResponse):
+    rank: float
+    headline: str  # HTML: the escaped text excerpt with matches wrapped in <mark>
@@ -9,4 +9,5 @@ class UserCreate(BaseModel):
 class UserResponse(BaseModel):
     id: int
     username: str
-    email: str
\ No newline at end of file
+    email: str
+    post_count: int = 0
\ No newline at end of file
@@ -0,0 +1,221 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCRYPT_PREFIX = "scrypt"
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class PasswordHasher:
+    """
+    scrypt password hashes stored as "scrypt$n$r$p$salt$hash".
+
+    The cost (n) is tunable; hashes made with a lower cost, and legacy plaintext
+    passwords, report needs_rehash() so they can be upgraded at the next login.
+    The async variants run in `executor` (hashlib.scrypt releases the GIL), so a
+    burst of logins can't block the event loop or starve other thread work.
+    """
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, executor: Optional[Executor] = None):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.executor = executor
+        # Verified for unknown users, so they take as long as known ones
+        self._dummy_hash = self.hash(os.urandom(16).hex())
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{SCRYPT_PREFIX}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    def verify(self, password: str, stored: Optional[str]) -> bool:
+        if stored is None:
+            self.verify(password, self._dummy_hash)
+            return False
+        if not stored.startswith(SCRYPT_PREFIX + "$"):
+            # Legacy row from before passwords were hashed
+            return hmac.compare_digest(password.encode(), stored.encode())
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            expected = _b64decode(digest)
+            actual = self._derive(password, _b64decode(salt), int(n), int(r), int(p))
+        except ValueError:
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, stored: str) -> bool:
+        if not stored.startswith(SCRYPT_PREFIX + "$"):
+            return True
+        _, n, r, p, _, _ = stored.split("$")
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.hash, password)
+
+    async def verify_async(self, password: str, stored: Optional[str]) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.verify, password, stored)
+
+
+class TokenSigner:
+    """
+    Stateless access tokens: base64url(JSON claims) + "." + base64url(HMAC-SHA256).
+    Any service holding the secret can check a token without a database lookup.
+    """
+
+    def __init__(self, secret: str, ttl: float = 3600, clock=time.time):
+        self._key = secret.encode()
+        self.ttl = ttl
+        self._clock = clock
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, username: str, user_id: int) -> str:
+        now = int(self._clock())
+        claims = {"sub": username, "uid": user_id, "iat": now, "exp": now + int(self.ttl)}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises InvalidToken if it is malformed, forged or expired."""
+        payload, sep, signature = token.partition(".")
+        if not sep or not hmac.compare_digest(signature, self._sign(payload)):
+            raise InvalidToken("Invalid token signature.")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidToken("Malformed token.")
+        if claims.get("exp", 0) <= self._clock():
+            raise InvalidToken("Token expired.")
+        return claims
+
+
+class RateLimiter:
+    """
+    Token bucket per key (client address, username): `burst` attempts at once,
+    refilled at `rate` per second. Only the `max_keys` most recent keys are tracked.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.counters = {"allowed": 0, "limited": 0}
+
+    def allow(self, key: str) -> bool:
+        now = self._clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self.counters["allowed" if allowed else "limited"] += 1
+        return allowed
+
+    def retry_after(self) -> int:
+        """Seconds until a limited key has an attempt again."""
+        return max(1, int(1 / self.rate + 0.5))
+
+
+class TrustedProxies:
+    """
+    Peers whose X-Forwarded-For is believed: addresses, networks (10.0.0.0/8) or
+    host names such as the frontend's compose service.
+
+    Names are looked up by run(), a task that resolves them again every `refresh`
+    seconds since a restarted container may get a new address; membership checks
+    only read the last answers, so requests never wait on DNS. A name that fails
+    to resolve keeps its previous addresses. `resolve` is a coroutine function
+    from a host name to its addresses, by default the event loop's getaddrinfo.
+    """
+
+    def __init__(self, entries: Iterable[str], refresh: float = 30.0, resolve=None):
+        self.networks = []
+        self.hosts = []
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self.hosts.append(entry)
+        self.refresh = refresh
+        self._resolve = resolve or self._getaddrinfo
+        self._host_addresses = {}  # host -> addresses from its last successful lookup
+        self._resolved = frozenset()
+
+    @staticmethod
+    async def _getaddrinfo(host: str) -> List[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+        return [info[4][0] for info in infos]
+
+    async def resolve_hosts(self):
+        for host in self.hosts:
+            try:
+                self._host_addresses[host] = frozenset(await self._resolve(host))
+            except OSError as e:
+                logger.warning("Could not resolve trusted proxy %s: %s", host, e)
+        self._resolved = frozenset().union(*self._host_addresses.values())
+
+    async def run(self):
+        while self.hosts:
+            await self.resolve_hosts()
+            await asyncio.sleep(self.refresh)
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.networks) or address in self._resolved
+
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str], trusted: TrustedProxies) -> str:
+    """
+    The address a request came from: for a request relayed by a trusted proxy,
+    the last X-Forwarded-For entry (the one that proxy added), otherwise the peer.
+    """
+    peer = peer or "unknown"
+    if forwarded_for and peer in trusted:
+        forwarded = forwarded_for.split(",")[-1].strip()
+        if forwarded:
+            return forwarded
+    return peer
+
+
+def credential_key(secret: bytes, username: str, password: str) -> str:
+    """Keyed digest of a login attempt, so caches never hold passwords."""
+    return hashlib.blake2b(f"{username}\0{password}".encode(), key=secret, digest_size=16).hexdigest()
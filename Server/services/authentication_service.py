@@ -1,14 +1,46 @@
-from typing import Optional, List
-from sqlite3 import Connection
+from typing import Optional, Tuple
+from psycopg import AsyncConnection
+from pool import AsyncConnectionPool
 from schemas.authentication_schema import Authentication
+from security import PasswordHasher
+from instrumentation import timed_service
 
+@timed_service
 class AuthenticationService:
     @staticmethod
-    def authenticate_user(db: Connection, authentication: Authentication) -> bool:
-        cursor = db.cursor()
-        try:
-            cursor.execute("SELECT password FROM users WHERE username = %s", (authentication.username,))
-            row = cursor.fetchone()
-            return row[0] == authentication.password
-        except Exception as e:
-            return False
\ No newline at end of file
+    async def get_credentials(db: AsyncConnection, username: str) -> Tuple[Optional[int], Optional[str]]:
+        async with db.cursor() as cursor:
+            await cursor.execute("SELECT id, password FROM users WHERE username = %s", (username,))
+            row = await cursor.fetchone()
+        await db.commit()
+        return row if row else (None, None)
+
+    @staticmethod
+    async def update_password_hash(db: AsyncConnection, user_id: int, old_hash: str, new_hash: str):
+        async with db.cursor() as cursor:
+            try:
+                # Only if nobody changed the password in the meantime
+                await cursor.execute(
+                    "UPDATE users SET password = %s WHERE id = %s AND password = %s", (new_hash, user_id, old_hash)
+                )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def authenticate_user(pool: AsyncConnectionPool, hasher: PasswordHasher, authentication: Authentication) -> Optional[int]:
+        """
+        Id of the user if the password matches, else None. The slow hash runs with
+        no database connection checked out. Legacy plaintext and lower-cost hashes
+        are replaced by a current hash on a successful login.
+        """
+        async with pool.connection() as db:
+            user_id, stored = await AuthenticationService.get_credentials(db, authentication.username)
+        if not await hasher.verify_async(authentication.password, stored):
+            return None
+        if hasher.needs_rehash(stored):
+            new_hash = await hasher.hash_async(authentication.password)
+            async with pool.connection() as db:
+                await AuthenticationService.update_password_hash(db, user_id, stored, new_hash)
+        return user_id
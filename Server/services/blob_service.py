@@ -0,0 +1,61 @@
+import json
+from typing import List
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from instrumentation import timed_service
+
+@timed_service
+class BlobService:
+    @staticmethod
+    async def register_blob(db: AsyncConnection, blob_id: str, size: int, content_type: str) -> bool:
+        """Record a stored blob; returns False if it was already known."""
+        async with db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "INSERT INTO blobs (id, size, content_type) VALUES (%s, %s, %s) ON CONFLICT (id) DO NOTHING RETURNING id",
+                    (blob_id, size, content_type)
+                )
+                created = await cursor.fetchone() is not None
+                await db.commit()
+                return created
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def record_images(db: AsyncConnection, results: List[dict]) -> List[str]:
+        """
+        Record resize outcomes (id, status, width, height, renditions, error) in one
+        statement. A ready image stays ready. Returns the ids that changed.
+        """
+        async with db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "UPDATE blobs SET image_status = r.status, width = r.width, height = r.height, "
+                    "renditions = r.renditions, image_error = r.error, processed_at = CURRENT_TIMESTAMP "
+                    "FROM jsonb_to_recordset(%s::jsonb) "
+                    "AS r(id text, status text, width int, height int, renditions jsonb, error text) "
+                    "WHERE blobs.id = r.id AND blobs.image_status IS DISTINCT FROM 'ready' "
+                    "RETURNING blobs.id",
+                    (json.dumps(results),)
+                )
+                updated = [row[0] for row in await cursor.fetchall()]
+                await db.commit()
+                return updated
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def blob_exists(db: AsyncConnection, blob_id: str) -> bool:
+        async with db.cursor() as cursor:
+            await cursor.execute("SELECT 1 FROM blobs WHERE id = %s", (blob_id,))
+            return await cursor.fetchone() is not None
+
+    @staticmethod
+    async def get_stats(db: AsyncConnection) -> dict:
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(
+                "SELECT count(*) AS blobs, coalesce(sum(size), 0) AS bytes, coalesce(sum(ref_count), 0) AS references FROM blobs"
+            )
+            return await cursor.fetchone()
@@ -1,45 +1,95 @@
-from psycopg2.extensions import connection as Connection
-from typing import List
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from datetime import datetime
+from typing import List, Optional, Tuple
 from schemas.comment_schema import CommentCreate, CommentResponse
+from instrumentation import timed_service
 
+@timed_service
 class CommentService:
     @staticmethod
-    def add_comment(db: Connection, comment: CommentCreate) -> dict:
-        cursor = db.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO comments (post_id, text, username) VALUES (%s, %s, %s) RETURNING id, time_created",
-                (comment.post_id, comment.text, comment.username)
-            )
-            result = cursor.fetchone()  # Returns a tuple (id, time_created)
-            db.commit()
-            return {"id": result[0], "time_created": result[1]}  # Return both fields
-        except Exception as e:
-            db.rollback()
-            raise e
-        finally:
-            cursor.close()
+    async def add_comment(db: AsyncConnection, comment: CommentCreate) -> dict:
+        async with db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "INSERT INTO comments (post_id, text, username) VALUES (%s, %s, %s) RETURNING id, time_created",
+                    (comment.post_id, comment.text, comment.username)
+                )
+                result = await cursor.fetchone()  # Returns a tuple (id, time_created)
+                await cursor.execute(
+                    "UPDATE posts SET comment_count = comment_count + 1, "
+                    "last_comment_at = GREATEST(last_comment_at, %s) WHERE id = %s",
+                    (result[1], comment.post_id)
+                )
+                await db.commit()
+                return {"id": result[0], "time_created": result[1]}  # Return both fields
+            except Exception as e:
+                await db.rollback()
+                raise e
 
     @staticmethod
-    def get_comments_by_post(db: Connection, post_id: int) -> List[CommentResponse]:
-        cursor = db.cursor()
-        try:
-            cursor.execute(
-                "SELECT id, post_id, text, username, time_created FROM comments WHERE post_id = %s ORDER BY time_created ASC",
-                (post_id,)
-            )
-            rows = cursor.fetchall()
-            return [
-                CommentResponse(
-                    id=row[0],
-                    post_id=row[1],
-                    text=row[2],
-                    username=row[3],
-                    time_created=row[4]
+    async def add_comments(db: AsyncConnection, comments: List[CommentCreate]) -> Tuple[List[dict], List[dict]]:
+        """
+        Insert many comments in one transaction. Comments on posts that don't exist
+        are reported instead of failing the batch. Returns (created, errors), each
+        entry carrying the index of the comment in `comments`.
+        """
+        async with db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "SELECT id FROM posts WHERE id = ANY(%s)", (list({c.post_id for c in comments}),)
                 )
-                for row in rows
-            ]
-        except Exception as e:
-            raise e
-        finally:
-            cursor.close()
+                existing = {row[0] for row in await cursor.fetchall()}
+                valid = [i for i, c in enumerate(comments) if c.post_id in existing]
+                errors = [
+                    {"index": i, "detail": f"Post {c.post_id} does not exist."}
+                    for i, c in enumerate(comments) if c.post_id not in existing
+                ]
+                rows = []
+                if valid:
+                    await cursor.execute(
+                        "INSERT INTO comments (post_id, text, username) "
+                        "SELECT post_id, text, username FROM unnest(%s::int[], %s::text[], %s::text[]) "
+                        "WITH ORDINALITY AS t(post_id, text, username, ord) ORDER BY ord "
+                        "RETURNING id, time_created",
+                        (
+                            [comments[i].post_id for i in valid],
+                            [comments[i].text for i in valid],
+                            [comments[i].username for i in valid],
+                        )
+                    )
+                    rows = sorted(await cursor.fetchall())
+                    await cursor.execute(
+                        "UPDATE posts SET comment_count = posts.comment_count + added.n, "
+                        "last_comment_at = GREATEST(posts.last_comment_at, added.last) "
+                        "FROM (SELECT post_id, count(*) AS n, max(time_created) AS last FROM comments "
+                        "WHERE id = ANY(%s) GROUP BY post_id) AS added "
+                        "WHERE posts.id = added.post_id",
+                        ([row[0] for row in rows],)
+                    )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        created = [{"index": i, "id": row[0], "time_created": row[1]} for i, row in zip(valid, rows)]
+        return created, errors
+
+    @staticmethod
+    async def get_comments_by_post(db: AsyncConnection, post_id: int, limit: int, after: Optional[Tuple[datetime, int]] = None) -> List[CommentResponse]:
+        """Oldest comments first, continuing after the (time_created, id) of the previous page."""
+        if after:
+            query = (
+                "SELECT id, post_id, text, username, time_created FROM comments "
+                "WHERE post_id = %s AND (time_created, id) > (%s, %s) ORDER BY time_created ASC, id ASC LIMIT %s"
+            )
+            params = (post_id, *after, limit)
+        else:
+            query = (
+                "SELECT id, post_id, text, username, time_created FROM comments "
+                "WHERE post_id = %s ORDER BY time_created ASC, id ASC LIMIT %s"
+            )
+            params = (post_id, limit)
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+        return [CommentResponse(**row) for row in rows]
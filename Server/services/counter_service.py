@@ -0,0 +1,114 @@
+from psycopg import AsyncConnection
+import logging
+from instrumentation import timed_service
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key, so only one replica reconciles at a time
+RECONCILE_LOCK_ID = 7_346_002
+
+@timed_service
+class CounterService:
+    """
+    Repairs drift in the denormalized counters (posts.comment_count and
+    last_comment_at, users.post_count), e.g. after rows were written or deleted
+    outside the services.
+
+    Rows are processed in id order, a batch per transaction. Each batch locks its
+    rows FOR NO KEY UPDATE before counting: a counter UPDATE still in flight
+    either holds the lock (and is counted once it commits) or increments after
+    the batch commits, so reconciling never loses a concurrent increment. Unlike
+    FOR UPDATE it does not conflict with the FOR KEY SHARE locks that inserting
+    comments and posts takes on the rows they reference.
+    """
+
+    @staticmethod
+    async def reconcile_posts(db: AsyncConnection, batch_size: int = 1000) -> int:
+        repaired, last_id = 0, 0
+        async with db.cursor() as cursor:
+            while True:
+                try:
+                    await cursor.execute(
+                        "SELECT id FROM posts WHERE id > %s ORDER BY id LIMIT %s FOR NO KEY UPDATE", (last_id, batch_size)
+                    )
+                    ids = [row[0] for row in await cursor.fetchall()]
+                    if not ids:
+                        await db.commit()
+                        return repaired
+                    await cursor.execute(
+                        """
+                        UPDATE posts p
+                        SET comment_count = actual.n, last_comment_at = actual.last
+                        FROM (
+                            SELECT ids.id, count(c.id) AS n, max(c.time_created) AS last
+                            FROM unnest(%s::int[]) AS ids(id)
+                            LEFT JOIN comments c ON c.post_id = ids.id
+                            GROUP BY ids.id
+                        ) actual
+                        WHERE p.id = actual.id
+                          AND (p.comment_count <> actual.n OR p.last_comment_at IS DISTINCT FROM actual.last)
+                        """,
+                        (ids,)
+                    )
+                    repaired += cursor.rowcount
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+                last_id = ids[-1]
+
+    @staticmethod
+    async def reconcile_users(db: AsyncConnection, batch_size: int = 1000) -> int:
+        repaired, last_id = 0, 0
+        async with db.cursor() as cursor:
+            while True:
+                try:
+                    await cursor.execute(
+                        "SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s FOR NO KEY UPDATE", (last_id, batch_size)
+                    )
+                    ids = [row[0] for row in await cursor.fetchall()]
+                    if not ids:
+                        await db.commit()
+                        return repaired
+                    await cursor.execute(
+                        """
+                        UPDATE users u
+                        SET post_count = actual.n
+                        FROM (
+                            SELECT u2.id, count(p.id) AS n
+                            FROM users u2
+                            LEFT JOIN posts p ON p.username = u2.username
+                            WHERE u2.id = ANY(%s)
+                            GROUP BY u2.id
+                        ) actual
+                        WHERE u.id = actual.id AND u.post_count <> actual.n
+                        """,
+                        (ids,)
+                    )
+                    repaired += cursor.rowcount
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+                last_id = ids[-1]
+
+    @staticmethod
+    async def reconcile(db: AsyncConnection, batch_size: int = 1000) -> dict:
+        """Reconcile every counter, unless another replica is already doing so (then returns {})."""
+        async with db.cursor() as cursor:
+            await cursor.execute("SELECT pg_try_advisory_lock(%s)", (RECONCILE_LOCK_ID,))
+            locked = (await cursor.fetchone())[0]
+            await db.commit()
+            if not locked:
+                return {}
+            try:
+                result = {
+                    "posts_repaired": await CounterService.reconcile_posts(db, batch_size),
+                    "users_repaired": await CounterService.reconcile_users(db, batch_size),
+                }
+            finally:
+                await cursor.execute("SELECT pg_advisory_unlock(%s)", (RECONCILE_LOCK_ID,))
+                await db.commit()
+        if result["posts_repaired"] or result["users_repaired"]:
+            logger.warning("Counter drift repaired: %s", result)
+        return result
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from schemas.comment_schema import CommentResponse
+from schemas.feed_schema import FeedPost
+from services.post_service import PostService
+import logging
+from instrumentation import timed_service
+
+logger = logging.getLogger(__name__)
+
+@timed_service
+class FeedService:
+    @staticmethod
+    async def get_feed(db: AsyncConnection, limit: int, comments_limit: int, after: Optional[Tuple[datetime, int]] = None, page: int = 1) -> List[FeedPost]:
+        """
+        A page of posts with their latest comments embedded.
+
+        Comments for the whole page are loaded with one batched query instead of one
+        query per post: a LATERAL LIMIT per post reads only the newest
+        `comments_limit` entries of comments_post_id_time_created_id_idx, and the
+        totals come from the posts.comment_count counter instead of a COUNT.
+        Paging works as in PostService.list_posts.
+        """
+        posts = await PostService.list_posts(db, limit, after, page)
+        if not posts:
+            return []
+
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(
+                """
+                SELECT c.id, c.post_id, c.text, c.username, c.time_created
+                FROM unnest(%s::int[]) AS p(id)
+                CROSS JOIN LATERAL (
+                    SELECT id, post_id, text, username, time_created
+                    FROM comments
+                    WHERE post_id = p.id
+                    ORDER BY time_created DESC, id DESC
+                    LIMIT %s
+                ) c
+                ORDER BY c.post_id, c.time_created ASC, c.id ASC
+                """,
+                ([post.id for post in posts], comments_limit)
+            )
+            rows = await cursor.fetchall()
+
+        comments = defaultdict(list)
+        for row in rows:
+            comments[row["post_id"]].append(CommentResponse(**row))
+        logger.debug("Feed page after=%s, page=%s: %s posts, %s preview comments", after, page, len(posts), len(rows))
+
+        return [FeedPost(**post.model_dump(), comments=comments[post.id]) for post in posts]
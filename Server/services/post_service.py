@@ -1,40 +1,172 @@
-from typing import List, Optional
-from sqlite3 import Connection
-from schemas.post_schema import PostCreate, PostResponse
+from datetime import datetime
+import html
+from typing import List, Optional, Tuple
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from schemas.post_schema import PostBase, PostResponse, PostSearchResult
 import logging
+from instrumentation import timed_service
 
 logger = logging.getLogger(__name__)
 
+POST_COLUMNS = (
+    "p.id, p.username, p.text, p.image, p.time_created, p.comment_count, p.last_comment_at, "
+    "b.image_status, b.width AS image_width, b.height AS image_height, b.renditions AS image_renditions"
+)
+# Image status is kept per blob (one resize serves every post of the same content); a primary key lookup per post
+POSTS = "posts p LEFT JOIN blobs b ON b.id = p.image"
+
+# ts_headline marks matches with these instead of <mark> so the excerpt can be
+# HTML-escaped first; they are stripped from the post text beforehand
+MATCH_START, MATCH_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f'StartSel="{MATCH_START}", StopSel="{MATCH_STOP}", MaxFragments=2, MaxWords=25, MinWords=8'
+
+
+def highlight(headline: str) -> str:
+    """A ts_headline excerpt as HTML: the post text escaped, matches wrapped in <mark>."""
+    return html.escape(headline).replace(MATCH_START, "<mark>").replace(MATCH_STOP, "</mark>")
+
+@timed_service
 class PostService:
     @staticmethod
-    def add_post(db: Connection, post: PostCreate) -> int:
-        cursor = db.cursor()
-        cursor.execute(
-            "INSERT INTO posts (image, text, username) VALUES (%s, %s, %s)",
-            (post.image, post.text, post.username)
-        )
-        db.commit()
-        return cursor.lastrowid
+    async def add_post(db: AsyncConnection, post: PostBase) -> int:
+        async with db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "INSERT INTO posts (image, text, username) VALUES (%s, %s, %s) RETURNING id",
+                    (post.image, post.text, post.username)
+                )
+                row = await cursor.fetchone()
+                # Count the reference in the same transaction; legacy file names match no blob
+                await cursor.execute("UPDATE blobs SET ref_count = ref_count + 1 WHERE id = %s", (post.image,))
+                await cursor.execute("UPDATE users SET post_count = post_count + 1 WHERE username = %s", (post.username,))
+                await db.commit()
+                return row[0]
+            except Exception:
+                await db.rollback()
+                raise
 
     @staticmethod
-    def get_post(db: Connection, post_id: int) -> Optional[PostResponse]:
-        cursor = db.cursor()
-        cursor.execute("SELECT * FROM posts WHERE id = %s", (post_id,))
-        row = cursor.fetchone()
+    async def add_posts(db: AsyncConnection, posts: List[PostBase]) -> List[dict]:
+        """
+        Insert many posts with one statement in one transaction. Returns id and
+        time_created per post, in input order.
+        """
+        async with db.cursor() as cursor:
+            try:
+                # Rows are inserted in ordinality order, so the ids come out ascending in input order
+                await cursor.execute(
+                    "INSERT INTO posts (image, text, username) "
+                    "SELECT image, text, username FROM unnest(%s::text[], %s::text[], %s::text[]) "
+                    "WITH ORDINALITY AS t(image, text, username, ord) ORDER BY ord "
+                    "RETURNING id, time_created",
+                    ([p.image for p in posts], [p.text for p in posts], [p.username for p in posts])
+                )
+                rows = sorted(await cursor.fetchall())
+                await cursor.execute(
+                    "UPDATE blobs SET ref_count = blobs.ref_count + refs.n "
+                    "FROM (SELECT image, count(*) AS n FROM unnest(%s::text[]) AS image GROUP BY image) AS refs "
+                    "WHERE blobs.id = refs.image",
+                    ([p.image for p in posts],)
+                )
+                await cursor.execute(
+                    "UPDATE users SET post_count = users.post_count + authors.n "
+                    "FROM (SELECT username, count(*) AS n FROM unnest(%s::text[]) AS username GROUP BY username) AS authors "
+                    "WHERE users.username = authors.username",
+                    ([p.username for p in posts],)
+                )
+                await db.commit()
+                return [{"id": row[0], "time_created": row[1]} for row in rows]
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def get_post(db: AsyncConnection, post_id: int) -> Optional[PostResponse]:
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(f"SELECT {POST_COLUMNS} FROM {POSTS} WHERE p.id = %s", (post_id,))
+            row = await cursor.fetchone()
         if row:
-            return PostResponse(**dict(zip([column[0] for column in cursor.description], row)))
+            return PostResponse(**row)
         return None
 
     @staticmethod
-    def list_posts(db: Connection, page: int, limit: int) -> List[PostResponse]:
-        offset = (page - 1) * limit
-        logger.info(f"Fetching posts from DB with offset={offset}, limit={limit}")
+    async def get_latest_post(db: AsyncConnection) -> Optional[PostResponse]:
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(
+                f"SELECT {POST_COLUMNS} FROM {POSTS} ORDER BY p.time_created DESC, p.id DESC LIMIT 1"
+            )
+            row = await cursor.fetchone()
+        if row:
+            return PostResponse(**row)
+        return None
+
+    @staticmethod
+    async def list_posts(db: AsyncConnection, limit: int, after: Optional[Tuple[datetime, int]] = None, page: int = 1) -> List[PostResponse]:
+        """
+        Newest posts first. `after` is the (time_created, id) of the last post of the
+        previous page; the keyset condition is served by posts_time_created_id_idx so
+        deep pages cost the same as the first one. `page` is the legacy OFFSET paging.
+        """
+        if after:
+            query = (
+                f"SELECT {POST_COLUMNS} FROM {POSTS} "
+                "WHERE (p.time_created, p.id) < (%s, %s) ORDER BY p.time_created DESC, p.id DESC LIMIT %s"
+            )
+            params = (*after, limit)
+        else:
+            query = f"SELECT {POST_COLUMNS} FROM {POSTS} ORDER BY p.time_created DESC, p.id DESC LIMIT %s OFFSET %s"
+            params = (limit, (page - 1) * limit)
+        logger.debug("Fetching posts from DB with after=%s, page=%s, limit=%s", after, page, limit)
         try:
-            cursor = db.cursor()
-            cursor.execute("SELECT * FROM posts ORDER BY time_created DESC LIMIT %s OFFSET %s", (limit, offset))
-            rows = cursor.fetchall()
-            logger.info(f"Posts fetched from DB: {len(rows)}")
-            return [PostResponse(**dict(zip([column[0] for column in cursor.description], row))) for row in rows]
+            async with db.cursor(row_factory=dict_row) as cursor:
+                await cursor.execute(query, params)
+                rows = await cursor.fetchall()
+            logger.debug("Posts fetched from DB: %s", len(rows))
+            return [PostResponse(**row) for row in rows]
         except Exception as e:
-            logger.error(f"Error querying posts from DB: {e}")
+            logger.error("Error querying posts from DB: %s", e)
             raise
+
+    @staticmethod
+    async def search_posts(db: AsyncConnection, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[PostSearchResult]:
+        """
+        Full-text search over post text and username, best matches first.
+
+        Matching uses the GIN index on posts.search_vector. The query is parsed with
+        both the english and simple configurations since usernames are indexed
+        unstemmed. Headlines are only generated for the returned page.
+        """
+        keyset = "WHERE (rank, id) < (%(after_rank)s, %(after_id)s)" if after else ""
+        sql = f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery('english', %(query)s) || websearch_to_tsquery('simple', %(query)s) AS tsq
+            )
+            SELECT page.id, page.username, page.text, page.image, page.time_created,
+                   page.comment_count, page.last_comment_at, page.rank,
+                   b.image_status, b.width AS image_width, b.height AS image_height, b.renditions AS image_renditions,
+                   ts_headline('english', translate(coalesce(page.text, ''), %(markers)s, ''), q.tsq,
+                               %(headline_options)s) AS headline
+            FROM (
+                SELECT * FROM (
+                    SELECT p.id, p.username, p.text, p.image, p.time_created, p.comment_count, p.last_comment_at,
+                           ts_rank_cd(p.search_vector, q.tsq)::float8 AS rank
+                    FROM posts p, q
+                    WHERE p.search_vector @@ q.tsq
+                ) matches
+                {keyset}
+                ORDER BY rank DESC, id DESC
+                LIMIT %(limit)s
+            ) page
+            CROSS JOIN q
+            LEFT JOIN blobs b ON b.id = page.image
+            ORDER BY page.rank DESC, page.id DESC
+        """
+        params = {"query": query, "limit": limit, "markers": MATCH_START + MATCH_STOP, "headline_options": HEADLINE_OPTIONS}
+        if after:
+            params["after_rank"], params["after_id"] = after
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+        logger.debug("Search for %r returned %s posts", query, len(rows))
+        return [PostSearchResult(**{**row, "headline": highlight(row["headline"])}) for row in rows]
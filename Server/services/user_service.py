@@ -1,57 +1,102 @@
-from typing import Optional, List
-from sqlite3 import Connection
+import asyncio
+from typing import Optional, List, Tuple
+from psycopg import AsyncConnection
+from psycopg.rows import dict_row
+from pool import AsyncConnectionPool
 from schemas.user_schema import UserCreate, UserResponse
+from security import PasswordHasher
+from instrumentation import timed_service
 
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+@timed_service
 class UserService:
     @staticmethod
-    def add_user(db: Connection, user: UserCreate) -> int:
-        cursor = db.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
-                (user.username, user.email, user.password)
-            )
-            db.commit()
-            return cursor.lastrowid
-        except Exception as e:
-            db.rollback()
-            raise ValueError(f"Failed to create user: {e}")
+    async def add_user(pool: AsyncConnectionPool, hasher: PasswordHasher, user: UserCreate) -> int:
+        """Id of the new user. The password is hashed before a connection is checked out."""
+        password_hash = await hasher.hash_async(user.password)
+        async with pool.connection() as db, db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "INSERT INTO users (username, email, password) VALUES (%s, %s, %s) RETURNING id",
+                    (user.username, user.email, password_hash)
+                )
+                row = await cursor.fetchone()
+                await db.commit()
+                return row[0]
+            except Exception as e:
+                await db.rollback()
+                raise ValueError(f"Failed to create user: {e}")
+
+    @staticmethod
+    async def add_users(pool: AsyncConnectionPool, hasher: PasswordHasher, users: List[UserCreate]) -> Tuple[List[dict], List[dict]]:
+        """
+        Insert many users in one transaction. Users whose username or email is
+        already taken (or repeated within the batch) are reported instead of
+        failing the batch. Returns (created, errors) with input indexes.
+        """
+        # Hashing dominates; spread it over the hasher's worker threads, with no connection checked out
+        password_hashes = await asyncio.gather(*(hasher.hash_async(u.password) for u in users))
+        async with pool.connection() as db, db.cursor() as cursor:
+            try:
+                await cursor.execute(
+                    "INSERT INTO users (username, email, password) "
+                    "SELECT username, email, password FROM unnest(%s::text[], %s::text[], %s::text[]) "
+                    "WITH ORDINALITY AS t(username, email, password, ord) ORDER BY ord "
+                    "ON CONFLICT DO NOTHING RETURNING id, username, email",
+                    ([u.username for u in users], [u.email for u in users], list(password_hashes))
+                )
+                # Both are unique, so a row matches only the items with its username and email;
+                # of identical items the first one was inserted
+                inserted = {(row[1], row[2]): row[0] for row in await cursor.fetchall()}
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        created, errors, seen = [], [], set()
+        for i, user in enumerate(users):
+            key = (user.username, user.email)
+            if key in inserted and key not in seen:
+                created.append({"index": i, "id": inserted[key]})
+                seen.add(key)
+            else:
+                errors.append({"index": i, "detail": "Username or email already taken."})
+        return created, errors
 
     @staticmethod
-    def get_user_by_id(db: Connection, user_id: int) -> Optional[UserResponse]:
-        cursor = db.cursor()
-        cursor.execute("SELECT id, username, email FROM users WHERE id = %s", (user_id,))
-        row = cursor.fetchone()
+    async def get_user_by_id(db: AsyncConnection, user_id: int) -> Optional[UserResponse]:
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute("SELECT id, username, email, post_count FROM users WHERE id = %s", (user_id,))
+            row = await cursor.fetchone()
         if row:
             return UserResponse(**row)
         return None
 
     @staticmethod
-    def search_users(db: Connection, username: Optional[str], email: Optional[str], page: int, limit: int) -> List[UserResponse]:
-        query = "SELECT id, username, email FROM users WHERE 1=1"
+    async def search_users(db: AsyncConnection, username: Optional[str], email: Optional[str], limit: int, after_id: Optional[int] = None, page: int = 1) -> List[UserResponse]:
+        """
+        Case-insensitive substring search in id order; `after_id` continues after the
+        last user of the previous page. The substring matches use the trigram indexes.
+        """
+        query = "SELECT id, username, email, post_count FROM users WHERE 1=1"
         params = []
 
         if username:
-            query += " AND username LIKE %s"
-            params.append(f"%{username}%")
+            query += " AND username ILIKE %s"
+            params.append(f"%{escape_like(username)}%")
         if email:
-            query += " AND email LIKE %s"
-            params.append(f"%{email}%")
+            query += " AND email ILIKE %s"
+            params.append(f"%{escape_like(email)}%")
 
-        query += " LIMIT %s OFFSET %s"
-        params.extend([limit, (page - 1) * limit])
+        if after_id is not None:
+            query += " AND id > %s ORDER BY id LIMIT %s"
+            params.extend([after_id, limit])
+        else:
+            query += " ORDER BY id LIMIT %s OFFSET %s"
+            params.extend([limit, (page - 1) * limit])
 
-        cursor = db.cursor()
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
+        async with db.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(query, tuple(params))
+            rows = await cursor.fetchall()
         return [UserResponse(**row) for row in rows]
-    
-    @staticmethod
-    def authenticate_user(db: Connection, username: str, password: str):
-        cursor = db.cursor()
-        try:
-            cursor.execute("SELECT password FROM users WHERE username = %s", (username,))
-            row = cursor.fetchone()
-            return row[0] == password
-        except Exception as e:
-            return False
\ No newline at end of file
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Runs blocking jobs in an executor, at most one per key at a time.
+
+    Callers asking for a key that is already being worked on share the running
+    job instead of starting another. At most `max_pending` jobs are queued or
+    running; beyond that run() returns None and the caller should fall back.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, executor: Executor, max_pending: int = 32):
+        self.executor = executor
+        self.max_pending = max_pending
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {"started": 0, "coalesced": 0, "rejected": 0, "failed": 0, "timeouts": 0}
+
+    def run(self, key: str, fn: Callable, *args) -> Optional[asyncio.Future]:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return future
+        if len(self._inflight) >= self.max_pending:
+            self.counters["rejected"] += 1
+            return None
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        self._inflight[key] = future
+        self.counters["started"] += 1
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return future
+
+    def _finished(self, key: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        # Retrieve the exception even if every waiter gave up, so it is logged once
+        if not future.cancelled() and future.exception() is not None:
+            self.counters["failed"] += 1
+            logger.error("Job %s failed: %s", key, future.exception())
+
+    async def wait(self, future: asyncio.Future, timeout: float):
+        """
+        Result of a job, or None if it doesn't finish within `timeout` seconds or
+        fails. A timed-out job keeps running for the other waiters.
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            return None
+        except Exception:
+            return None
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), **self.counters}
@@ -0,0 +1,44 @@
+import os
+import tempfile
+from PIL import Image, ImageOps
+
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
+MEDIA_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+# Besides the quality, which comes from RENDITION_QUALITY like in the image resizer
+SAVE_OPTIONS = {
+    "WEBP": {"method": 4},
+    "JPEG": {"optimize": True, "progressive": True},
+}
+
+
+def rendition_path(reduced_dir: str, rendition: str, file_path: str, image_format: str) -> str:
+    """Where the image resizer puts `rendition` of uploads/full/<file_path>."""
+    return os.path.join(reduced_dir, rendition, f"{file_path}.{EXTENSIONS[image_format]}")
+
+
+def render_thumbnail(source_path: str, output_path: str, edge: int, image_format: str, quality: int) -> str:
+    """
+    Write a `edge` px rendition of the source next to the resizer's output, with
+    the same settings, so the worker later replaces it with an equivalent file.
+    Runs in a worker thread; Pillow releases the GIL while decoding and resampling.
+    """
+    if os.path.exists(output_path):
+        return output_path
+    with Image.open(source_path) as img:
+        img.draft("RGB", (edge, edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA") or (img.mode == "RGBA" and image_format == "JPEG"):
+            img = img.convert("RGB")
+        img.thumbnail((edge, edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        directory = os.path.dirname(output_path)
+        os.makedirs(directory, exist_ok=True)
+        # Unique temp name: the resizer may be writing the same rendition right now
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".lazy-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format=image_format, quality=quality, **SAVE_OPTIONS[image_format])
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return output_path
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from urllib.parse import unquote
+
+# Magic numbers of the image formats we accept
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+SNIFF_BYTES = 12
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredUpload:
+    path: str  # temporary file; the caller moves it into place or deletes it
+    size: int
+    sha256: str
+    content_type: str
+
+
+def header_filename(value: Optional[str]) -> Optional[str]:
+    """The client's file name from X-Filename, which is percent-encoded since header values must be ASCII."""
+    return unquote(value) if value else None
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _write_chunk(f, hasher, chunk: bytes):
+    # hashlib releases the GIL for large buffers, so hashing and writing both run off the loop
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+async def store_stream(chunks: AsyncIterator[bytes], directory: str, max_bytes: int) -> StoredUpload:
+    """
+    Write an upload to a temporary file in `directory` chunk by chunk, hashing it on
+    the way. Memory use is bounded by the chunk size. Raises UploadRejected as soon
+    as the stream is not an image or grows past `max_bytes`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    f = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    content_type = None
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadRejected(413, f"Image larger than {max_bytes} bytes.")
+            if content_type is None:
+                head += chunk[:SNIFF_BYTES]
+                if len(head) < SNIFF_BYTES:
+                    await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+                    continue
+                content_type = sniff_image_type(head)
+                if content_type is None:
+                    raise UploadRejected(415, "Unsupported image type.")
+            await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+        if content_type is None:
+            content_type = sniff_image_type(head)
+            if content_type is None:
+                raise UploadRejected(415, "Unsupported image type.")
+        await asyncio.to_thread(f.close)
+        return StoredUpload(path=tmp_path, size=size, sha256=hasher.hexdigest(), content_type=content_type)
+    except BaseException:
+        f.close()
+        os.unlink(tmp_path)
+        raise
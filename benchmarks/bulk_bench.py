@@ -0,0 +1,78 @@
+"""
+Compare row-at-a-time inserts with the bulk endpoints.
+
+    python benchmarks/bulk_bench.py --url http://localhost:8080 --rows 20000 \
+        --concurrency 50 --batch-size 1000
+
+Inserts --rows posts through POST /api/v1/post (one row and one commit per
+request, --concurrency requests in flight), then the same number through
+POST /api/v1/post/bulk in batches of --batch-size, and does the same for
+comments on the first post. Prints rows/sec for each path.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def post_row(i):
+    return {"username": "bench", "text": f"bulk bench post {i}", "image": "bench.jpg"}
+
+
+def comment_row(post_id, i):
+    return {"post_id": post_id, "username": "bench", "text": f"bulk bench comment {i}"}
+
+
+async def single(client, path, rows, concurrency):
+    queue = list(reversed(rows))
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            response = await client.post(path, json=queue.pop())
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, errors
+
+
+async def bulk(client, path, rows, batch_size):
+    errors = 0
+    started = time.perf_counter()
+    for start in range(0, len(rows), batch_size):
+        response = await client.post(path, json=rows[start:start + batch_size])
+        response.raise_for_status()
+        errors += len(response.json()["errors"])
+    return time.perf_counter() - started, errors
+
+
+def result(name, rows, elapsed, errors):
+    return {"path": name, "rows": rows, "errors": errors, "seconds": round(elapsed, 2), "rows_per_sec": round(rows / elapsed, 1)}
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120) as client:
+        posts = [post_row(i) for i in range(args.rows)]
+        results = [result("post", args.rows, *await single(client, "/api/v1/post", posts, args.concurrency))]
+        results.append(result(f"post/bulk x{args.batch_size}", args.rows, *await bulk(client, "/api/v1/post/bulk", posts, args.batch_size)))
+
+        post_id = (await client.get("/api/v1/post/latest")).json()["id"]
+        comments = [comment_row(post_id, i) for i in range(args.rows)]
+        results.append(result("comment", args.rows, *await single(client, "/api/v1/comment", comments, args.concurrency)))
+        results.append(result(f"comment/bulk x{args.batch_size}", args.rows, *await bulk(client, "/api/v1/comment/bulk", comments, args.batch_size)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""
+Compare two benchmark reports written by suite.py.
+
+    python benchmarks/compare.py benchmarks/results/<before>.json benchmarks/results/<after>.json \
+        --threshold 10 --fail-on-regression
+
+Prints throughput and latency changes per scenario and marks a scenario as a
+regression when throughput drops, or p95/p99 latency rises, by more than
+--threshold percent. With --fail-on-regression the exit status is 1 if any did.
+"""
+import argparse
+import json
+import sys
+
+# Metric -> whether a higher value is better
+METRICS = {"rps": True, "images_per_sec": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+# Only these count towards a regression; p50 moves too much between runs
+GATED = {"rps", "images_per_sec", "p95_ms", "p99_ms"}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before: float, after: float) -> float:
+    """Percent change from before to after."""
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    """One row per scenario present in both reports."""
+    previous = {result["name"]: result for result in before["results"]}
+    rows = []
+    for result in after["results"]:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        changes = {
+            metric: round(change(old[metric], result[metric]), 1)
+            for metric in METRICS if metric in old and metric in result
+        }
+        regressions = [
+            metric for metric, pct in changes.items()
+            if metric in GATED and (-pct if METRICS[metric] else pct) > threshold
+        ]
+        rows.append({"name": result["name"], "before": old, "after": result, "change_pct": changes, "regressions": regressions})
+    return rows
+
+
+def format_rows(rows: list) -> str:
+    lines = [f"{'scenario':<28} {'metric':<15} {'before':>10} {'after':>10} {'change':>8}"]
+    for row in rows:
+        for metric, pct in row["change_pct"].items():
+            flag = "  REGRESSION" if metric in row["regressions"] else ""
+            lines.append(
+                f"{row['name']:<28} {metric:<15} {row['before'][metric]:>10} {row['after'][metric]:>10} {pct:>+7.1f}%{flag}"
+            )
+    return "\n".join(lines)
+
+
+def main(args) -> int:
+    before, after = load(args.before), load(args.after)
+    print(f"before: {before['environment'].get('commit')}  after: {after['environment'].get('commit')}")
+    if before["environment"].get("platform") != after["environment"].get("platform"):
+        print("warning: the reports come from different machines", file=sys.stderr)
+    rows = compare(before, after, args.threshold)
+    print(format_rows(rows))
+    regressed = [row["name"] for row in rows if row["regressions"]]
+    if regressed:
+        print(f"\n{len(regressed)} scenario(s) regressed by more than {args.threshold}%: {', '.join(regressed)}")
+    return 1 if regressed and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    sys.exit(main(parser.parse_args()))
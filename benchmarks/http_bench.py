@@ -0,0 +1,86 @@
+"""
+Fixed-concurrency HTTP load generator for the Server endpoints.
+
+    python benchmarks/http_bench.py --url http://localhost:8080 \
+        --path /api/v1/post --path /api/v1/comment/1 --concurrency 200 --duration 30
+
+Prints requests/sec and latency percentiles per path.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_requests(client, name, send, concurrency, duration, warmup=0.0):
+    """
+    Call `send(client, i)` from `concurrency` workers for `duration` seconds, after
+    `warmup` seconds whose requests aren't counted. `i` numbers the requests, so a
+    scenario can rotate through ids or payloads.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(1 << 62))
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            failed = False
+            try:
+                response = await send(client, next(counter))
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if start >= measure_from:
+                latencies.append(time.perf_counter() - start)
+                errors += failed
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - max(started, measure_from)
+    latencies.sort()
+    return {
+        "name": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_path(client, path, concurrency, duration):
+    result = await run_requests(client, path, lambda client, i: client.get(path), concurrency, duration)
+    return {"path": result.pop("name"), **result}
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        results = [await run_path(client, path, args.concurrency, args.duration) for path in args.path]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--path", action="append", default=None)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    args.path = args.path or ["/api/v1/post", "/api/v1/comment/1"]
+    asyncio.run(main(args))
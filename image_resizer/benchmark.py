@@ -0,0 +1,53 @@
+"""
+Measure resize throughput (images/sec) for different worker pool sizes.
+
+    python benchmark.py --images 200 --sizes 1 2 4 8
+
+Generates synthetic photos in a temporary directory and runs the same job the
+worker runs (resize_service.resize_file) through a ProcessPoolExecutor.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from resize_service import resize_file
+
+
+def make_images(directory, count, size):
+    # A noisy image compresses like a photo, unlike a flat colour
+    source = Image.effect_noise(size, 64).convert("RGB")
+    names = []
+    for i in range(count):
+        name = f"bench_{i}.jpg"
+        source.save(os.path.join(directory, name), quality=90)
+        names.append(name)
+    return names
+
+
+def run(names, upload_dir, reduced_dir, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm up the worker processes before timing
+        list(executor.map(resize_file, names[:workers], [upload_dir] * workers, [reduced_dir] * workers))
+        started = time.perf_counter()
+        list(executor.map(resize_file, names, [upload_dir] * len(names), [reduced_dir] * len(names), chunksize=1))
+        elapsed = time.perf_counter() - started
+    return {"workers": workers, "images": len(names), "seconds": round(elapsed, 3), "images_per_sec": round(len(names) / elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--width", type=int, default=3024)
+    parser.add_argument("--height", type=int, default=4032)
+    parser.add_argument("--sizes", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as upload_dir, tempfile.TemporaryDirectory() as reduced_dir:
+        names = make_images(upload_dir, args.images, (args.width, args.height))
+        results = [run(names, upload_dir, reduced_dir, workers) for workers in args.sizes]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,401 @@
+"""
+Distributed tracing without a client library: W3C trace context
+(`traceparent: 00-<trace id>-<span id>-<flags>`) carried over HTTP headers and
+AMQP message headers, spans kept in a context variable, and finished spans
+exported as JSON lines to a file or a collector from a background thread.
+
+Every service is built from its own directory, so this file is copied into
+Server/, Frontend/ and image_resizer/; test_tracing.py checks the copies match.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value) -> Optional[SpanContext]:
+    """The context in a traceparent header, or None if it is missing or malformed."""
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+class Span:
+    """One timed operation. Ending it hands it to the tracer's exporter, if sampled."""
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str], kind: str,
+                 attributes: Optional[dict], start_time: Optional[float]):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        # Wall clock to line spans up across processes, perf_counter for the duration
+        now = time.time()
+        self.start_time = now if start_time is None else start_time
+        self._started = time.perf_counter() - (now - self.start_time)
+        self.duration = None
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"[:500]
+
+    def traceparent(self) -> str:
+        return self.context.traceparent()
+
+    def end(self, end_time: Optional[float] = None):
+        if self.duration is not None:
+            return
+        if end_time is None:
+            self.duration = time.perf_counter() - self._started
+        else:
+            self.duration = max(0.0, end_time - self.start_time)
+        if self.context.sampled:
+            self.tracer.export([self.to_dict()])
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "service": self.tracer.service,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start_time, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans while tracing is off, so callers need no checks."""
+
+    context = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def traceparent(self):
+        return None
+
+    def end(self, end_time=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+class SpanExporter:
+    """
+    Batches finished spans on a daemon thread. submit() only appends to a bounded
+    queue and drops the span when it is full, so tracing never blocks a request.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 512, interval: float = 1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+            # Flush what is still queued when the process exits
+            atexit.register(self.shutdown)
+
+    def submit(self, spans: List[dict]):
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0):
+        """Export what is queued and stop; safe to call again."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def export(self, batch: List[dict]):
+        raise NotImplementedError
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if not batch:
+                continue
+            try:
+                self.export(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logger.warning("Exporting %s spans failed: %s", len(batch), e)
+
+
+class FileExporter(SpanExporter):
+    """Appends spans as JSON lines to `path`."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def export(self, batch: List[dict]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(span, default=str) + "\n" for span in batch))
+
+
+class HttpExporter(SpanExporter):
+    """POSTs batches of spans as a JSON array to a collector, e.g. trace_collector/collector.py."""
+
+    def __init__(self, url: str, timeout: float = 2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, batch: List[dict]):
+        request = urllib.request.Request(
+            self.url, data=json.dumps(batch, default=str).encode(), headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class MemoryExporter:
+    """Keeps spans in a list, e.g. in a worker process that returns them with its result."""
+
+    def __init__(self):
+        self.spans: List[dict] = []
+
+    def submit(self, spans: List[dict]):
+        self.spans.extend(spans)
+
+    def drain(self) -> List[dict]:
+        spans, self.spans = self.spans, []
+        return spans
+
+
+class Tracer:
+    """
+    Creates spans for one service. Without an exporter tracing is off and every
+    span is NOOP_SPAN. New traces are sampled at `sample_rate`; a propagated
+    context keeps the decision made where the trace started.
+    """
+
+    def __init__(self, service: str = "", exporter=None, sample_rate: float = 1.0):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, kind: str = "internal", parent: Optional[SpanContext] = None,
+                   attributes: Optional[dict] = None, start_time: Optional[float] = None):
+        """A span that is not made current; call end() on it. The parent defaults to the current span."""
+        if self.exporter is None:
+            return NOOP_SPAN
+        if parent is None:
+            current = _current.get()
+            parent = current.context if current is not None else None
+        if parent is None:
+            context = SpanContext(_new_id(128), _new_id(64), random.random() < self.sample_rate)
+            parent_id = None
+        else:
+            context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+            parent_id = parent.span_id
+        return Span(self, name, context, parent_id, kind, attributes, start_time)
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: str = "internal", parent: Optional[SpanContext] = None,
+             attributes: Optional[dict] = None):
+        """Time the block as the current span; works in threads and asyncio tasks alike."""
+        span = self.start_span(name, kind, parent, attributes)
+        if span is NOOP_SPAN:
+            yield span
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    def export(self, spans: List[dict]):
+        """Spans already finished, e.g. returned by a worker process."""
+        if self.exporter is not None and spans:
+            self.exporter.submit(spans)
+
+
+TRACER = Tracer()
+
+
+def inject(headers, span=None):
+    """Add the traceparent of `span` (default: the current span) to a headers mapping; returns it."""
+    span = span if span is not None else _current.get()
+    traceparent = span.traceparent() if span is not None else None
+    if traceparent:
+        headers["traceparent"] = traceparent
+    return headers
+
+
+def extract(headers) -> Optional[SpanContext]:
+    """The propagated context in a headers mapping (HTTP or AMQP), if any."""
+    return parse_traceparent((headers or {}).get("traceparent"))
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds trace_id and span_id to records logged inside a span, to find a trace's log lines."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current.get()
+        if span is not None:
+            record.trace_id = span.context.trace_id
+            record.span_id = span.context.span_id
+        return True
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware running each HTTP request in a server span, continuing the
+    trace of an incoming traceparent. Spans are named by the route template
+    ("POST /api/v1/image/stream"), like the metrics.
+    """
+
+    def __init__(self, app, tracer: Tracer = None, exclude=("/metrics",)):
+        self.app = app
+        self.tracer = tracer or TRACER
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled or scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value)
+                break
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        with self.tracer.span(scope["method"], kind="server", parent=parent, attributes={"http.path": scope["path"]}) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # The router records the matched route in the scope
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute("http.route", route)
+
+
+def setup_tracing(service: str, tracer: Tracer = None) -> Tracer:
+    """
+    Configure TRACER from the environment: TRACE_EXPORTER ("" for off, file or
+    http), TRACE_FILE (traces.jsonl), TRACE_COLLECTOR_URL
+    (http://trace-collector:4318/v1/spans), TRACE_SAMPLE_RATE (1.0) and
+    TRACE_QUEUE_SIZE (10000). Log records then carry the trace and span ids.
+    """
+    tracer = tracer or TRACER
+    tracer.service = service
+    tracer.sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+    kind = os.getenv("TRACE_EXPORTER", "").lower()
+    max_queue = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+    if kind == "file":
+        tracer.exporter = FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"), max_queue=max_queue)
+    elif kind == "http":
+        tracer.exporter = HttpExporter(
+            os.getenv("TRACE_COLLECTOR_URL", "http://trace-collector:4318/v1/spans"), max_queue=max_queue,
+        )
+    elif kind in ("", "none"):
+        tracer.exporter = None
+        return tracer
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORTER {kind!r}; use file, http or leave it empty")
+    tracer.exporter.start()
+    for handler in logging.getLogger().handlers:
+        # Handler filters run in the logging thread, where the span is current
+        if not any(isinstance(f, TraceContextFilter) for f in handler.filters):
+            handler.addFilter(TraceContextFilter())
+    return tracer
+
+
+def record_spans_in_memory(tracer: Tracer = None):
+    """
+    ProcessPoolExecutor initializer: a forked worker inherits the parent's exporter
+    but not its thread, so keep the worker's spans in memory to return with results.
+    """
+    tracer = tracer or TRACER
+    if tracer.enabled:
+        tracer.exporter = MemoryExporter()
@@ -0,0 +1,53 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+import compare
+
+
+def report(commit, *results):
+    return {"environment": {"commit": commit, "platform": "linux"}, "results": list(results)}
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_changes_and_regressions(self):
+        before = report("a", {"name": "api feed", "rps": 1000, "p50_ms": 10, "p95_ms": 20, "p99_ms": 40})
+        after = report("b", {"name": "api feed", "rps": 850, "p50_ms": 14, "p95_ms": 21, "p99_ms": 40})
+        [row] = compare.compare(before, after, threshold=10)
+        self.assertEqual(row["change_pct"], {"rps": -15.0, "p50_ms": 40.0, "p95_ms": 5.0, "p99_ms": 0.0})
+        # p50 is reported but not gated
+        self.assertEqual(row["regressions"], ["rps"])
+
+    def test_improvements_and_unmatched_scenarios(self):
+        before = report("a", {"name": "resizer x4", "images_per_sec": 20.0}, {"name": "gone", "rps": 1})
+        after = report("b", {"name": "resizer x4", "images_per_sec": 30.0}, {"name": "new", "rps": 1})
+        rows = compare.compare(before, after, threshold=10)
+        self.assertEqual([(row["name"], row["change_pct"], row["regressions"]) for row in rows],
+                         [("resizer x4", {"images_per_sec": 50.0}, [])])
+
+    def test_exit_status(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for commit, p95 in (("a", 20), ("b", 30)):
+                path = os.path.join(tmp, f"{commit}.json")
+                with open(path, "w") as f:
+                    json.dump(report(commit, {"name": "api comments", "rps": 100, "p95_ms": p95}), f)
+                paths.append(path)
+            args = Namespace(before=paths[0], after=paths[1], threshold=10.0, fail_on_regression=True)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                self.assertEqual(compare.main(args), 1)
+                args.fail_on_regression = False
+                self.assertEqual(compare.main(args), 0)
+            self.assertIn("REGRESSION", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from blobstore import BlobStore, blob_id_for, is_blob_id
+
+SHA = "ab" * 32
+
+
+class TestBlobIds(unittest.TestCase):
+    def test_blob_id_for_known_type(self):
+        self.assertEqual(blob_id_for(SHA, "image/png"), f"{SHA}.png")
+
+    def test_blob_id_for_unknown_type(self):
+        self.assertIsNone(blob_id_for(SHA, "text/plain"))
+
+    def test_is_blob_id(self):
+        self.assertTrue(is_blob_id(f"{SHA}.jpg"))
+        self.assertFalse(is_blob_id("holiday.jpg"))
+        self.assertFalse(is_blob_id(f"../{SHA}.jpg"))
+        self.assertFalse(is_blob_id(None))
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_tmp(self, data: bytes) -> str:
+        fd, path = tempfile.mkstemp(dir=self.tmp.name)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_relative_path_is_sharded(self):
+        self.assertEqual(BlobStore.relative_path(f"{SHA}.png"), os.path.join("ab", "ab", f"{SHA}.png"))
+
+    def test_put_moves_file_into_place(self):
+        blob_id = f"{SHA}.png"
+        tmp_path = self.write_tmp(b"data")
+        self.assertTrue(self.store.put(tmp_path, blob_id))
+        self.assertFalse(os.path.exists(tmp_path))
+        with open(self.store.path(blob_id), "rb") as f:
+            self.assertEqual(f.read(), b"data")
+
+    def test_put_duplicate_keeps_original_and_drops_upload(self):
+        blob_id = f"{SHA}.png"
+        self.store.put(self.write_tmp(b"data"), blob_id)
+        duplicate = self.write_tmp(b"data")
+        self.assertFalse(self.store.put(duplicate, blob_id))
+        self.assertFalse(os.path.exists(duplicate))
+        self.assertTrue(self.store.exists(blob_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from broker import BrokerBackend, EventBroker
+
+
+class TestEventBroker(unittest.TestCase):
+
+    def test_events_fan_out_by_topic(self):
+        async def main():
+            broker = EventBroker()
+            feed = broker.subscribe(["feed"])
+            post = broker.subscribe(["post:1"])
+            broker.publish("feed", "post", {"id": 1})
+            broker.publish("post:1", "comment", {"id": 7, "post_id": 1})
+            return broker, await feed.next(0.1), await feed.next(0.01), await post.next(0.1)
+
+        broker, first, nothing, comment = asyncio.run(main())
+        self.assertEqual((first.topic, first.type, first.data), ("feed", "post", {"id": 1}))
+        self.assertIsNone(nothing)
+        self.assertEqual(comment.data, {"id": 7, "post_id": 1})
+        self.assertEqual(broker.stats()["delivered"], 2)
+
+    def test_slow_subscriber_is_dropped_not_buffered(self):
+        async def main():
+            broker = EventBroker(queue_size=2)
+            slow = broker.subscribe(["feed"])
+            fast = broker.subscribe(["feed"])
+            received = []
+            for i in range(3):
+                broker.publish("feed", "post", {"id": i})
+                received.append(await fast.next(0.1))
+            return broker, slow, fast, received
+
+        broker, slow, fast, received = asyncio.run(main())
+        self.assertEqual([event.data["id"] for event in received], [0, 1, 2])
+        self.assertTrue(slow.closed and slow.overflowed)
+        self.assertFalse(fast.closed)
+        self.assertEqual(broker.stats()["subscribers"], 1)
+        self.assertEqual(broker.stats()["overflows"], 1)
+
+    def test_closed_subscription_drains_then_ends(self):
+        async def main():
+            broker = EventBroker()
+            subscription = broker.subscribe(["feed"])
+            broker.publish("feed", "post", {"id": 1})
+            broker.close()
+            return [await subscription.next(1), await subscription.next(1), await subscription.next(1)]
+
+        first, end, again = asyncio.run(main())
+        self.assertEqual(first.data, {"id": 1})
+        self.assertIsNone(end)
+        self.assertIsNone(again)
+
+    def test_reconnect_replays_missed_events(self):
+        async def main():
+            broker = EventBroker()
+            broker.publish("feed", "post", {"id": 1})
+            broker.publish("post:9", "comment", {"id": 2})
+            broker.publish("feed", "post", {"id": 3})
+            subscription = broker.subscribe(["feed"], last_event_id=1)
+            return await subscription.next(0.1), await subscription.next(0.01)
+
+        replayed, nothing = asyncio.run(main())
+        self.assertEqual(replayed.data, {"id": 3})
+        self.assertIsNone(nothing)
+
+    def test_subscriber_limit(self):
+        async def main():
+            broker = EventBroker(max_subscribers=1)
+            first = broker.subscribe(["feed"])
+            rejected = broker.subscribe(["feed"])
+            first.close()
+            return broker, rejected, broker.subscribe(["feed"])
+
+        broker, rejected, after_close = asyncio.run(main())
+        self.assertIsNone(rejected)
+        self.assertIsNotNone(after_close)
+        self.assertEqual(broker.stats()["rejected"], 1)
+
+    def test_backend_carries_publishes(self):
+        class RecordingBackend(BrokerBackend):
+            def __init__(self):
+                self.sent = []
+
+            def publish(self, topic, type, data):
+                self.sent.append(topic)
+                self.broker.deliver(topic, type, data)
+
+        backend = RecordingBackend()
+        broker = EventBroker(backend)
+        broker.publish("feed", "post", {"id": 1})
+        self.assertEqual(backend.sent, ["feed"])
+
+    def test_sse_format(self):
+        async def main():
+            broker = EventBroker()
+            subscription = broker.subscribe(["feed"])
+            broker.publish("feed", "comment", {"text": "a\nb"})
+            return await subscription.next(0.1)
+
+        frame = asyncio.run(main()).to_sse().decode()
+        lines = frame.split("\n")
+        self.assertEqual(lines[:2], ["id: 1", "event: comment"])
+        self.assertEqual(json.loads(lines[2][len("data: "):]), {"text": "a\nb"})
+        self.assertTrue(frame.endswith("\n\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from cache import CacheBackend, LRUCacheBackend, ResponseCache, etag_matches
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCacheBackend(CacheBackend):
+    """Dict-backed stand-in for a shared cache: no eviction, no expiry."""
+
+    def __init__(self):
+        self.entries = {}
+        self.invalidated = {}  # tag -> generation
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl, tags=(), generation=None):
+        if generation is not None and any(self.invalidated.get(tag, 0) > generation for tag in tags):
+            return False
+        self.entries[key] = (value, set(tags))
+        return True
+
+    def generation(self):
+        return len(self.invalidated) and max(self.invalidated.values())
+
+    def invalidate_tags(self, tags):
+        for tag in tags:
+            self.invalidated[tag] = self.generation() + 1
+        doomed = [key for key, (_, entry_tags) in self.entries.items() if entry_tags & set(tags)]
+        for key in doomed:
+            del self.entries[key]
+        return len(doomed)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class TestLRUCacheBackend(unittest.TestCase):
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        backend = LRUCacheBackend(max_entries=10, clock=clock)
+        backend.set("a", "value", ttl=5)
+        clock.now = 4.9
+        self.assertEqual(backend.get("a"), "value")
+        clock.now = 5.0
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        backend = LRUCacheBackend(max_entries=2)
+        backend.set("a", 1, ttl=60)
+        backend.set("b", 2, ttl=60)
+        backend.get("a")
+        backend.set("c", 3, ttl=60)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), 1)
+        self.assertEqual(backend.get("c"), 3)
+
+    def test_invalidation_only_drops_tagged_entries(self):
+        backend = LRUCacheBackend()
+        backend.set("feed", 1, ttl=60, tags=["posts:head", "comments:1", "comments:2"])
+        backend.set("comments:1", 2, ttl=60, tags=["comments:1"])
+        backend.set("comments:3", 3, ttl=60, tags=["comments:3"])
+        self.assertEqual(backend.invalidate_tags(["comments:1"]), 2)
+        self.assertIsNone(backend.get("feed"))
+        self.assertEqual(backend.get("comments:3"), 3)
+        # The feed entry was removed from the index of its other tags as well
+        self.assertEqual(backend.invalidate_tags(["posts:head", "comments:2"]), 0)
+
+    def test_load_that_raced_an_invalidation_is_not_stored(self):
+        backend = LRUCacheBackend()
+        generation = backend.generation()
+        # A comment on post 1 lands while the feed page is being read
+        backend.invalidate_tags(["comments:1"])
+        self.assertFalse(backend.set("feed", "old", ttl=60, tags=["comments:1", "comments:2"], generation=generation))
+        self.assertIsNone(backend.get("feed"))
+        # Invalidations of unrelated tags don't stop it
+        self.assertTrue(backend.set("comments:2", "page", ttl=60, tags=["comments:2"], generation=generation))
+        self.assertTrue(backend.set("feed", "new", ttl=60, tags=["comments:1"], generation=backend.generation()))
+
+    def test_forgotten_invalidations_refuse_older_loads(self):
+        backend = LRUCacheBackend(max_tracked_tags=2)
+        generation = backend.generation()
+        backend.invalidate_tags(["comments:1"])
+        backend.invalidate_tags(["comments:2", "comments:3"])
+        self.assertFalse(backend.set("post:1", 1, ttl=60, tags=["comments:1"], generation=generation))
+        self.assertTrue(backend.set("post:1", 1, ttl=60, tags=["comments:1"], generation=backend.generation()))
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(FakeCacheBackend())
+
+    def test_key_ignores_parameter_order(self):
+        self.assertEqual(
+            ResponseCache.key("list_posts", {"limit": 50, "cursor": ""}),
+            ResponseCache.key("list_posts", {"cursor": "", "limit": 50}),
+        )
+        self.assertNotEqual(ResponseCache.key("list_posts", {"limit": 50}), ResponseCache.key("get_feed", {"limit": 50}))
+
+    def test_read_through_counts_hits_and_misses(self):
+        key = ResponseCache.key("get_comments", {"post_id": 1})
+        self.assertIsNone(self.cache.get(key))
+        stored = self.cache.set(key, b"[]", headers={"X-Next-Cursor": "abc"}, tags=["comments:1"])
+        self.assertEqual(self.cache.get(key), stored)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertEqual(self.cache.invalidate("comments:1"), 1)
+        self.assertIsNone(self.cache.get(key))
+
+    def test_stale_load_is_returned_but_not_cached(self):
+        generation = self.cache.generation()
+        self.cache.invalidate("comments:1")
+        stored = self.cache.set("get_comments?post_id=1", b"[]", tags=["comments:1"], generation=generation)
+        self.assertEqual(stored.body, b"[]")
+        self.assertIsNone(self.cache.get("get_comments?post_id=1"))
+        self.assertEqual(self.cache.stats()["stale_sets"], 1)
+
+    def test_etag_depends_on_body(self):
+        first = self.cache.set("a", b"[1]")
+        second = self.cache.set("b", b"[1]")
+        third = self.cache.set("c", b"[2]")
+        self.assertEqual(first.etag, second.etag)
+        self.assertNotEqual(first.etag, third.etag)
+
+    def test_if_none_match(self):
+        etag = self.cache.set("a", b"{}").etag
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches(f"W/{etag}", etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+if __name__ == '__main__':
+    unittest.main()
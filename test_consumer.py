@@ -0,0 +1,187 @@
+import asyncio
+import os
+import queue
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from consumer import MessageConsumer
+
+
+class BrokerDown(Exception):
+    pass
+
+
+class Method:
+    def __init__(self, delivery_tag):
+        self.delivery_tag = delivery_tag
+
+
+class Properties:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeBroker:
+    """In-process stand-in for one RabbitMQ queue, speaking the subset of the pika API the consumer uses."""
+
+    def __init__(self):
+        self.up = True
+        self.ready = queue.Queue()
+        self.connections = 0
+        self.acks = []  # (delivery tag, multiple)
+        self.nacks = []
+
+    def put(self, body, headers=None):
+        self.ready.put((body, headers))
+
+    def connect(self):
+        if not self.up:
+            raise BrokerDown("connection refused")
+        self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def channel(self):
+        return FakeChannel(self.broker)
+
+    def close(self):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.broker = broker
+        self.unacked = []  # (tag, body, headers)
+        self.next_tag = 1
+
+    def queue_declare(self, queue):
+        pass
+
+    def basic_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    def consume(self, queue_name, inactivity_timeout):
+        while True:
+            if not self.broker.up:
+                raise BrokerDown("connection reset")
+            try:
+                body, headers = self.broker.ready.get(timeout=inactivity_timeout)
+            except queue.Empty:
+                yield None, None, None
+                continue
+            tag, self.next_tag = self.next_tag, self.next_tag + 1
+            self.unacked.append((tag, body, headers))
+            yield Method(tag), Properties(headers), body
+
+    def _settle(self, delivery_tag, multiple):
+        settled = [m for m in self.unacked if m[0] <= delivery_tag] if multiple else [m for m in self.unacked if m[0] == delivery_tag]
+        self.unacked = [m for m in self.unacked if m not in settled]
+        return settled
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self._settle(delivery_tag, multiple)
+        self.broker.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        for _, body, headers in self._settle(delivery_tag, multiple):
+            if requeue:
+                self.broker.put(body, headers)
+        self.broker.nacks.append((delivery_tag, multiple))
+
+    def cancel(self):
+        for _, body, headers in self.unacked:
+            self.broker.put(body, headers)
+        self.unacked = []
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestMessageConsumer(unittest.TestCase):
+
+    def run_consumer(self, broker, handle, scenario, **kwargs):
+        """Run `scenario(consumer)` in a thread while the event loop serves the handler."""
+        async def main():
+            consumer = MessageConsumer(broker.connect, "image_resize.done", handle, retry_delay=0.01, **kwargs)
+            consumer.start(asyncio.get_running_loop())
+            await asyncio.to_thread(scenario, consumer)
+            await asyncio.to_thread(consumer.stop)
+            return consumer
+
+        return asyncio.run(main())
+
+    def test_messages_are_handled_in_batches_and_acked_once(self):
+        broker = FakeBroker()
+        batches = []
+
+        async def handle(messages):
+            batches.append(messages)
+
+        for i in range(5):
+            broker.put(f"m{i}".encode(), {"traceparent": f"t{i}"})
+
+        def scenario(consumer):
+            self.assertTrue(wait_until(lambda: sum(map(len, batches)) == 5))
+
+        consumer = self.run_consumer(broker, handle, scenario, batch_size=2, batch_interval=0.05)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[0][1], (b"m1", {"traceparent": "t1"}))
+        self.assertEqual(broker.acks, [(2, True), (4, True), (5, True)])
+        self.assertEqual(consumer.stats()["consumed"], 5)
+
+    def test_failed_batch_is_requeued_and_retried(self):
+        broker = FakeBroker()
+        attempts = []
+
+        async def handle(messages):
+            attempts.append([body for body, _ in messages])
+            if len(attempts) == 1:
+                raise RuntimeError("database unavailable")
+
+        broker.put(b"a")
+        broker.put(b"b")
+
+        def scenario(consumer):
+            self.assertTrue(wait_until(lambda: len(attempts) == 2))
+
+        consumer = self.run_consumer(broker, handle, scenario, batch_size=2, batch_interval=0.05)
+        self.assertEqual(attempts, [[b"a", b"b"], [b"a", b"b"]])
+        self.assertEqual(broker.nacks, [(2, True)])
+        self.assertEqual(consumer.stats()["failed_batches"], 1)
+
+    def test_reconnects_after_losing_the_broker(self):
+        broker = FakeBroker()
+        handled = []
+
+        async def handle(messages):
+            handled.extend(body for body, _ in messages)
+
+        def scenario(consumer):
+            broker.put(b"before")
+            self.assertTrue(wait_until(lambda: handled == [b"before"]))
+            broker.up = False
+            self.assertTrue(wait_until(lambda: consumer.stats()["reconnects"] >= 1))
+            broker.up = True
+            broker.put(b"after")
+            self.assertTrue(wait_until(lambda: handled == [b"before", b"after"]))
+
+        consumer = self.run_consumer(broker, handle, scenario, batch_interval=0.02)
+        self.assertGreaterEqual(broker.connections, 2)
+        self.assertEqual(consumer.stats()["consumed"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from pool import AsyncConnectionPool, PoolTimeout
+
+
+class FakeAsyncConnection:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+async def open_fake_async_connection():
+    return FakeAsyncConnection()
+
+
+class TestAsyncConnectionPool(unittest.TestCase):
+
+    def test_connections_are_reused(self):
+        async def scenario():
+            pool = AsyncConnectionPool(open_fake_async_connection, min_size=1, max_size=2)
+            await pool.open()
+            async with pool.connection() as first:
+                pass
+            async with pool.connection() as second:
+                self.assertIs(second, first)
+            return pool.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+
+    def test_concurrent_requests_share_a_small_pool(self):
+        async def scenario():
+            pool = AsyncConnectionPool(open_fake_async_connection, min_size=0, max_size=3, timeout=2)
+
+            async def request():
+                async with pool.connection():
+                    await asyncio.sleep(0.001)
+
+            await asyncio.gather(*(request() for _ in range(100)))
+            return pool.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats["size"], 3)
+        self.assertEqual(stats["checkouts"], 100)
+        self.assertEqual(stats["timeouts"], 0)
+
+    def test_waiting_is_capped(self):
+        async def scenario():
+            pool = AsyncConnectionPool(open_fake_async_connection, min_size=0, max_size=1, timeout=0.05)
+            await pool.getconn()
+            with self.assertRaises(PoolTimeout):
+                await pool.getconn()
+            return pool.stats()
+
+        self.assertEqual(asyncio.run(scenario())["timeouts"], 1)
+
+    def test_unhealthy_connections_are_replaced(self):
+        broken = []
+
+        async def check(conn):
+            if conn in broken:
+                raise RuntimeError("server closed the connection")
+
+        async def scenario():
+            pool = AsyncConnectionPool(open_fake_async_connection, min_size=1, max_size=1, check_after=0, check=check)
+            await pool.open()
+            conn = await pool.getconn()
+            await pool.putconn(conn)
+            broken.append(conn)
+            replacement = await pool.getconn()
+            self.assertIsNot(replacement, conn)
+            self.assertTrue(conn.closed)
+            return pool.stats()
+
+        self.assertEqual(asyncio.run(scenario())["connections_discarded"], 1)
+
+    def test_reset_failure_discards_connection(self):
+        async def reset(conn):
+            raise RuntimeError("connection lost")
+
+        async def scenario():
+            pool = AsyncConnectionPool(open_fake_async_connection, min_size=0, max_size=1, reset=reset)
+            conn = await pool.getconn()
+            await pool.putconn(conn)
+            self.assertTrue(conn.closed)
+            return pool.stats()
+
+        self.assertEqual(asyncio.run(scenario())["size"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
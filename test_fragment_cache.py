@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Frontend"))
+
+from fragment_cache import FragmentCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = FragmentCache(ttl=2.0, max_entries=2, clock=self.clock)
+
+    def test_keys_separate_pages_variants_and_cursors(self):
+        keys = {
+            FragmentCache.key("/", "member"),
+            FragmentCache.key("/", "anonymous"),
+            FragmentCache.key("/", "member", "abc"),
+        }
+        self.assertEqual(len(keys), 3)
+
+    def test_fresh_until_ttl_then_stale_but_kept(self):
+        self.cache.set("k", "<ul></ul>", '"v1"')
+        self.assertTrue(self.cache.is_fresh(self.cache.get("k")))
+        self.clock.now = 2.5
+        fragment = self.cache.get("k")
+        self.assertFalse(self.cache.is_fresh(fragment))
+        self.assertEqual(fragment.version, '"v1"')
+
+    def test_refresh_after_revalidation(self):
+        fragment = self.cache.set("k", "<ul></ul>", '"v1"')
+        self.clock.now = 5
+        self.cache.refresh(fragment)
+        self.assertTrue(self.cache.is_fresh(self.cache.get("k")))
+        self.assertEqual(self.cache.stats()["revalidated"], 1)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("a", "a")
+        self.cache.set("b", "b")
+        self.cache.get("a")
+        self.cache.set("c", "c")
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_clear(self):
+        self.cache.set("a", "a")
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
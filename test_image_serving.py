@@ -0,0 +1,128 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+# Importing the API sets up its logging; keep it out of app.log
+os.environ.setdefault("LOG_FILE", "")
+
+from starlette.requests import Request
+
+from image_serving import (
+    CachedFile, RangeNotSatisfiable, ServingStats, ServingStatsMiddleware, SmallFileCache, file_etag, parse_range,
+)
+import main
+
+
+class TestParseRange(unittest.TestCase):
+
+    def test_no_header_or_other_unit_sends_whole_file(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range("items=0-5", 100))
+
+    def test_multiple_ranges_send_whole_file(self):
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+
+    def test_closed_open_and_suffix_ranges(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ("bytes=100-", "bytes=5-1", "bytes=-0", "bytes=a-b", "bytes=5"):
+            with self.assertRaises(RangeNotSatisfiable, msg=header):
+                parse_range(header, 100)
+
+
+class TestFileEtag(unittest.TestCase):
+
+    def test_content_hash_wins(self):
+        self.assertEqual(file_etag(10, 123, "abc"), '"abc"')
+
+    def test_changes_with_version(self):
+        self.assertNotEqual(file_etag(10, 123), file_etag(10, 124))
+        self.assertNotEqual(file_etag(10, 123), file_etag(11, 123))
+
+
+class TestSmallFileCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = SmallFileCache(max_bytes=10, max_file_bytes=5)
+        cache.put("a", CachedFile(b"aaaa", '"a"', 1))
+        cache.put("b", CachedFile(b"bbbb", '"b"', 1))
+        cache.get("a")
+        cache.put("c", CachedFile(b"cccc", '"c"', 1))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+    def test_large_files_are_not_cached(self):
+        cache = SmallFileCache(max_bytes=100, max_file_bytes=5)
+        cache.put("a", CachedFile(b"x" * 6, '"a"', 1))
+        self.assertIsNone(cache.get("a"))
+
+    def test_stale_mtime_is_a_miss(self):
+        cache = SmallFileCache()
+        cache.put("a", CachedFile(b"old", '"a"', 1))
+        self.assertIsNone(cache.get("a", mtime_ns=2))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+class TestServingStats(unittest.TestCase):
+
+    def test_percentiles_and_bytes(self):
+        stats = ServingStats()
+        for i in range(100):
+            stats.record("full", 200, 10, (i + 1) / 1000)
+        route = stats.stats()["full"]
+        self.assertEqual(route["requests"], 100)
+        self.assertEqual(route["bytes_served"], 1000)
+        self.assertEqual(route["statuses"], {200: 100})
+        self.assertEqual(route["p99_ms"], 100.0)
+
+    def test_middleware_counts_body_bytes(self):
+        stats = ServingStats()
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"6")]})
+            await send({"type": "http.response.body", "body": b"abc", "more_body": True})
+            await send({"type": "http.response.body", "body": b"def"})
+
+        async def send(message):
+            pass
+
+        middleware = ServingStatsMiddleware(app, stats, "/api/v1/image/")
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/api/v1/image/full/x.jpg"}, None, send))
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/api/v1/post"}, None, send))
+        self.assertEqual(list(stats.stats()), ["full"])
+        self.assertEqual(stats.stats()["full"]["bytes_served"], 6)
+
+
+class TestServeImage(unittest.TestCase):
+
+    def get(self, path, **headers):
+        scope = {"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                 "headers": [(name.encode(), value.encode()) for name, value in headers.items()]}
+        return asyncio.run(main.serve_image(Request(scope), path, "image/webp", immutable=True))
+
+    def test_unsatisfiable_range_on_a_cached_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blob.webp")
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            self.assertEqual(self.get(path).status_code, 200)
+            self.assertIsNotNone(main.image_cache.get(path))
+            # Served from the cache without a stat
+            response = self.get(path, range="bytes=500-")
+            self.assertEqual(response.status_code, 416)
+            self.assertEqual(response.headers["content-range"], "bytes */100")
+            response = self.get(path, range="bytes=10-19")
+            self.assertEqual((response.status_code, response.body), (206, b"x" * 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import filecmp
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "Server"))
+
+from logsetup import JsonFormatter, LazyQueueHandler, SamplingFilter, redact_text, setup_logging
+
+
+def make_record(msg, *args, level=logging.INFO, name="api", lineno=1, **extra):
+    record = logging.LogRecord(name, level, __file__, lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestRedaction(unittest.TestCase):
+
+    def test_sensitive_values_are_masked(self):
+        self.assertEqual(
+            redact_text("username='ann' email='a@b.c' password='hunter2'"),
+            "username='ann' email='a@b.c' password='[redacted]'",
+        )
+        self.assertEqual(redact_text('{"password": "hunter2", "n": 1}'), '{"password": "[redacted]", "n": 1}')
+        self.assertEqual(redact_text("Authorization: Bearer abc.def"), "Authorization: [redacted]")
+        self.assertEqual(redact_text("issued 3 tokens"), "issued 3 tokens")
+
+
+class TestJsonFormatter(unittest.TestCase):
+
+    def test_fields_extras_and_redaction(self):
+        record = make_record("User %s logged in", "ann", user_id=7, headers={"Authorization": "Bearer x", "Accept": "*/*"})
+        entry = json.loads(JsonFormatter("api").format(record))
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["service"], "api")
+        self.assertEqual(entry["msg"], "User ann logged in")
+        self.assertEqual(entry["user_id"], 7)
+        self.assertEqual(entry["headers"], {"Authorization": "[redacted]", "Accept": "*/*"})
+        self.assertTrue(entry["ts"].endswith("+00:00"))
+
+    def test_exceptions_are_included(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("api", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+        entry = json.loads(JsonFormatter("api").format(record))
+        self.assertIn("ValueError: boom", entry["exc"])
+
+
+class TestSamplingFilter(unittest.TestCase):
+
+    def test_keeps_one_in_n_per_call_site(self):
+        sampler = SamplingFilter(rate=0.25, level=logging.DEBUG)
+        kept = [sampler.filter(make_record("x", level=logging.DEBUG, lineno=10)) for _ in range(8)]
+        self.assertEqual(kept, [True, False, False, False, True, False, False, False])
+        # Another call site has its own count
+        self.assertTrue(sampler.filter(make_record("y", level=logging.DEBUG, lineno=11)))
+        self.assertEqual(sampler.dropped, 6)
+
+    def test_levels_above_the_sample_level_are_kept(self):
+        sampler = SamplingFilter(rate=0.0, level=logging.DEBUG)
+        self.assertFalse(sampler.filter(make_record("x", level=logging.DEBUG)))
+        self.assertTrue(sampler.filter(make_record("x", level=logging.WARNING)))
+
+    def test_logger_and_record_rates(self):
+        sampler = SamplingFilter(logger_rates={"uvicorn.access": 0.5})
+        kept = [sampler.filter(make_record("GET /", name="uvicorn.access")) for _ in range(4)]
+        self.assertEqual(kept.count(True), 2)
+        record = make_record("hot path", sample_rate=0.0)
+        self.assertFalse(sampler.filter(record))
+
+
+class TestLazyQueueHandler(unittest.TestCase):
+
+    def test_message_is_not_formatted_by_the_caller(self):
+        formatted = []
+
+        class Payload:
+            def __str__(self):
+                formatted.append(1)
+                return "payload"
+
+        log_queue = queue.Queue()
+        LazyQueueHandler(log_queue).handle(make_record("got %s", Payload()))
+        self.assertEqual(formatted, [])
+        self.assertEqual(log_queue.get_nowait().getMessage(), "got payload")
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = LazyQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(make_record("a"))
+        handler.handle(make_record("b"))
+        self.assertEqual(handler.dropped, 1)
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        saved = (list(root.handlers), root.level)
+
+        def restore():
+            root.handlers[:] = saved[0]
+            root.setLevel(saved[1])
+
+        self.addCleanup(restore)
+
+    def test_records_reach_the_file_as_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "app.log")
+            with patch.dict(os.environ, {"LOG_LEVEL": "INFO"}):
+                listener = setup_logging("api", log_file=path)
+            logger = logging.getLogger("test_logsetup")
+            logger.debug("not at INFO")
+            logger.info("created post %s", 5, extra={"post_id": 5})
+            listener.stop()
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([(line["msg"], line["post_id"]) for line in lines], [("created post 5", 5)])
+
+    def test_service_copies_match(self):
+        for service in ("Frontend", "image_resizer"):
+            self.assertTrue(
+                filecmp.cmp(os.path.join(ROOT, "Server", "logsetup.py"), os.path.join(ROOT, service, "logsetup.py"), shallow=False),
+                f"{service}/logsetup.py differs from Server/logsetup.py",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
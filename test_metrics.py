@@ -0,0 +1,144 @@
+import asyncio
+import filecmp
+import os
+import sys
+import unittest
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "Server"))
+
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry, start_http_server
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge_exposition(self):
+        requests = Counter("requests", "Requests served.", ["route"], registry=self.registry)
+        requests.labels("/a").inc()
+        requests.labels(route="/a").inc(2)
+        depth = Gauge("depth", 'Queue "depth".', registry=self.registry)
+        depth.set(4)
+        depth.dec()
+        self.assertEqual(self.registry.exposition(), "\n".join([
+            '# HELP depth Queue \\"depth\\".',
+            "# TYPE depth gauge",
+            "depth 3",
+            "# HELP requests_total Requests served.",
+            "# TYPE requests_total counter",
+            'requests_total{route="/a"} 3',
+        ]) + "\n")
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.1, 0.5, 3):
+            latency.observe(value)
+        lines = self.registry.exposition().splitlines()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("latency_seconds_sum 3.65", lines)
+        self.assertIn("latency_seconds_count 4", lines)
+
+    def test_label_values_are_escaped(self):
+        errors = Counter("errors", "Errors.", ["message"], registry=self.registry)
+        errors.labels('bad "quote"\nline').inc()
+        self.assertIn('errors_total{message="bad \\"quote\\"\\nline"} 1', self.registry.exposition())
+
+    def test_misuse_is_rejected(self):
+        counter = Counter("jobs", "Jobs.", ["outcome"], registry=self.registry)
+        with self.assertRaises(ValueError):
+            counter.inc()
+        with self.assertRaises(ValueError):
+            counter.labels("ok", "extra")
+        with self.assertRaises(ValueError):
+            counter.labels("ok").inc(-1)
+        with self.assertRaises(ValueError):
+            Counter("jobs", "Again.", registry=self.registry)
+
+    def test_collectors_run_at_scrape_time_and_failures_are_contained(self):
+        depth = Gauge("depth", "Depth.", registry=self.registry)
+        queue = [1, 2]
+        self.registry.on_collect(lambda: depth.set(len(queue)))
+
+        @self.registry.on_collect
+        def broken():
+            raise RuntimeError("pool not initialized")
+
+        queue.append(3)
+        self.assertIn("depth 3", self.registry.exposition().splitlines())
+
+    def test_middleware_labels_by_route_template(self):
+        requests = Counter("http_requests", "Requests.", ["method", "route", "status"], registry=self.registry)
+        latency = Histogram("http_seconds", "Latency.", ["method", "route"], registry=self.registry)
+
+        class Route:
+            path = "/api/v1/post/{post_id}"
+
+        async def app(scope, receive, send):
+            scope["route"] = Route()  # as the router does
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        middleware = MetricsMiddleware(app, requests, latency)
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/api/v1/post/7"}, None, send))
+        exposition = self.registry.exposition()
+        self.assertIn('http_requests_total{method="GET",route="/api/v1/post/{post_id}",status="404"} 1', exposition)
+        self.assertIn('http_seconds_count{method="GET",route="/api/v1/post/{post_id}"} 1', exposition)
+
+    def test_http_server(self):
+        Counter("scraped", "Scrapes.", registry=self.registry).inc()
+        server = start_http_server(0, self.registry, addr="127.0.0.1")
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn("scraped_total 1", response.read().decode())
+
+    def test_service_copies_match(self):
+        for service in ("Frontend", "image_resizer"):
+            self.assertTrue(
+                filecmp.cmp(os.path.join(ROOT, "Server", "metrics.py"), os.path.join(ROOT, service, "metrics.py"), shallow=False),
+                f"{service}/metrics.py differs from Server/metrics.py",
+            )
+
+
+class TestTimedService(unittest.TestCase):
+
+    def test_async_static_methods_are_timed(self):
+        from instrumentation import db_query_errors, db_query_seconds, timed_service
+
+        @timed_service
+        class ExampleService:
+            @staticmethod
+            async def fetch(value):
+                return value
+
+            @staticmethod
+            async def fail():
+                raise RuntimeError("boom")
+
+            @staticmethod
+            def helper():
+                return "untouched"
+
+        async def main():
+            self.assertEqual(await ExampleService.fetch(5), 5)
+            with self.assertRaises(RuntimeError):
+                await ExampleService.fail()
+
+        asyncio.run(main())
+        self.assertEqual(ExampleService.helper(), "untouched")
+        self.assertEqual(db_query_seconds.labels("ExampleService", "fetch").count, 1)
+        self.assertEqual(db_query_seconds.labels("ExampleService", "fail").count, 1)
+        self.assertEqual(db_query_errors.labels("ExampleService", "fail").value, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
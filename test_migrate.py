@@ -0,0 +1,130 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from migrate import MIGRATIONS_DIR, MigrationError, load_migrations, migrate, pending
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetchone(self):
+        return self.rows[0]
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Just enough of psycopg's AsyncConnection to follow the migration runner."""
+
+    def __init__(self, applied=None):
+        self.applied = applied  # None: schema_migrations doesn't exist
+        self.executed = []
+        self.locked = False
+        self._recording = None
+
+    async def execute(self, sql, params=None):
+        sql = sql.strip()
+        self.executed.append(sql)
+        if "to_regclass" in sql:
+            return FakeCursor([(self.applied is not None,)])
+        if sql.startswith("SELECT version"):
+            return FakeCursor([(version,) for version in self.applied])
+        if "pg_advisory_lock" in sql:
+            self.locked = True
+        elif "pg_advisory_unlock" in sql:
+            self.locked = False
+        elif "CREATE TABLE IF NOT EXISTS schema_migrations" in sql and self.applied is None:
+            self.applied = set()
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self._recording.add(params[0])
+        elif sql == "broken;":
+            raise RuntimeError("syntax error")
+        return FakeCursor([])
+
+    async def commit(self):
+        pass
+
+    @asynccontextmanager
+    async def transaction(self):
+        self._recording = set()
+        yield
+        self.applied |= self._recording
+
+    def ddl(self):
+        return [sql for sql in self.executed if sql.startswith("CREATE TABLE t")]
+
+
+class TestMigrate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, file_name, sql):
+        with open(os.path.join(self.tmp.name, file_name), "w") as f:
+            f.write(sql)
+
+    def test_load_orders_by_version_and_skips_other_files(self):
+        self.write("0002_second.sql", "CREATE TABLE t2;")
+        self.write("0010_tenth.sql", "CREATE TABLE t10;")
+        self.write("0001_first.sql", "CREATE TABLE t1;")
+        self.write("README.md", "")
+        migrations = load_migrations(self.tmp.name)
+        self.assertEqual([(m.version, m.name) for m in migrations], [(1, "first"), (2, "second"), (10, "tenth")])
+        self.assertEqual([m.version for m in pending(migrations, {1, 10})], [2])
+
+    def test_duplicate_versions_are_rejected(self):
+        self.write("0001_a.sql", "")
+        self.write("1_b.sql", "")
+        with self.assertRaises(MigrationError):
+            load_migrations(self.tmp.name)
+
+    def test_fresh_database_applies_everything_under_the_lock(self):
+        self.write("0001_first.sql", "CREATE TABLE t1;")
+        self.write("0002_second.sql", "CREATE TABLE t2;")
+        conn = FakeConnection()
+        applied = asyncio.run(migrate(conn, load_migrations(self.tmp.name)))
+        self.assertEqual(applied, [1, 2])
+        self.assertEqual(conn.applied, {1, 2})
+        self.assertEqual(conn.ddl(), ["CREATE TABLE t1;", "CREATE TABLE t2;"])
+        self.assertFalse(conn.locked)
+
+    def test_current_schema_runs_no_ddl_and_takes_no_lock(self):
+        self.write("0001_first.sql", "CREATE TABLE t1;")
+        conn = FakeConnection(applied={1})
+        self.assertEqual(asyncio.run(migrate(conn, load_migrations(self.tmp.name))), [])
+        self.assertEqual(conn.ddl(), [])
+        self.assertFalse(any("pg_advisory_lock" in sql for sql in conn.executed))
+
+    def test_only_pending_migrations_run(self):
+        self.write("0001_first.sql", "CREATE TABLE t1;")
+        self.write("0002_second.sql", "CREATE TABLE t2;")
+        conn = FakeConnection(applied={1})
+        self.assertEqual(asyncio.run(migrate(conn, load_migrations(self.tmp.name))), [2])
+        self.assertEqual(conn.ddl(), ["CREATE TABLE t2;"])
+
+    def test_failure_stops_and_releases_the_lock(self):
+        self.write("0001_first.sql", "CREATE TABLE t1;")
+        self.write("0002_broken.sql", "broken;")
+        self.write("0003_third.sql", "CREATE TABLE t3;")
+        conn = FakeConnection()
+        with self.assertRaises(MigrationError):
+            asyncio.run(migrate(conn, load_migrations(self.tmp.name)))
+        self.assertEqual(conn.applied, {1})
+        self.assertFalse(conn.locked)
+
+    def test_shipped_migrations_load(self):
+        versions = [m.version for m in load_migrations(MIGRATIONS_DIR)]
+        self.assertEqual(versions, list(range(1, len(versions) + 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
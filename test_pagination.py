@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        created = datetime(2024, 11, 20, 13, 5, 42, 123456)
+        self.assertEqual(decode_cursor(encode_cursor(created, 42)), (created, 42))
+
+    def test_round_trip_without_timestamp(self):
+        self.assertEqual(decode_cursor(encode_cursor(None, 7)), (None, 7))
+
+    def test_round_trip_with_rank(self):
+        self.assertEqual(decode_cursor(encode_cursor(0.0607927, 3)), (0.0607927, 3))
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(datetime(2024, 1, 1), 10**12)
+        self.assertNotIn("=", cursor)
+        self.assertNotIn("/", cursor)
+        self.assertNotIn("+", cursor)
+
+    def test_cursor_of_another_endpoint_is_rejected(self):
+        created = datetime(2024, 1, 1)
+        self.assertEqual(decode_cursor(encode_cursor(created, 1), datetime), (created, 1))
+        self.assertEqual(decode_cursor(encode_cursor(2, 1), float), (2.0, 1))
+        # A search cursor (rank) sent to a listing keyed by time, and the reverse
+        for cursor, sort_key_type in [(encode_cursor(0.5, 1), datetime), (encode_cursor(None, 1), datetime),
+                                      (encode_cursor(created, 1), float), (encode_cursor(True, 1), float)]:
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, sort_key_type)
+
+    def test_garbage_is_rejected(self):
+        for cursor in ["", "not-a-cursor", encode_cursor(None, 1)[:-3], "WyJ4IiwxXQ", "W3t9LDFd"]:
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
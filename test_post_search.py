@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from services.post_service import MATCH_START, MATCH_STOP, PostService, highlight
+
+
+class FakeCursor:
+    """Returns one row whose headline is what ts_headline makes of `text`, matching every word."""
+
+    def __init__(self, text):
+        self.text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params):
+        self.params = params
+        for marker in params["markers"]:
+            self.text = self.text.replace(marker, "")
+        self.headline = " ".join(MATCH_START + word + MATCH_STOP for word in self.text.split(" "))
+
+    async def fetchall(self):
+        return [{
+            "id": 1, "username": "mallory", "text": self.text, "image": "a.png", "time_created": datetime(2024, 1, 1),
+            "comment_count": 0, "last_comment_at": None, "rank": 0.5, "image_status": None, "image_width": None,
+            "image_height": None, "image_renditions": None, "headline": self.headline,
+        }]
+
+
+class FakeConnection:
+    def __init__(self, text):
+        self.text = text
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self.text)
+
+
+class TestSearchHeadline(unittest.TestCase):
+
+    def test_post_text_is_escaped_around_the_marks(self):
+        text = f"<script>alert(1)</script> {MATCH_STOP}<img src=x onerror=alert(2)>"
+        result, = asyncio.run(PostService.search_posts(FakeConnection(text), "script", limit=10))
+        self.assertEqual(
+            result.headline,
+            "<mark>&lt;script&gt;alert(1)&lt;/script&gt;</mark> <mark>&lt;img</mark> <mark>src=x</mark> "
+            "<mark>onerror=alert(2)&gt;</mark>",
+        )
+
+    def test_highlight(self):
+        self.assertEqual(highlight(f"a &amp; {MATCH_START}b{MATCH_STOP} \"c\""), "a &amp;amp; <mark>b</mark> &quot;c&quot;")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from publisher import MessagePublisher
+
+
+class BrokerDown(Exception):
+    pass
+
+
+class Nacked(Exception):
+    pass
+
+
+class FakeBroker:
+    """In-process stand-in for RabbitMQ speaking the subset of the pika API the publisher uses."""
+
+    def __init__(self):
+        self.up = True
+        self.queues = {}
+        self.connections = 0
+        self.refused = set()  # bodies the broker nacks
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if not self.up:
+            raise BrokerDown("connection refused")
+        self.connections += 1
+        return FakeConnection(self)
+
+    def messages(self, queue):
+        with self.lock:
+            return list(self.queues.get(queue, []))
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+
+    def channel(self):
+        return FakeChannel(self.broker)
+
+    def process_data_events(self, time_limit=0):
+        if not self.broker.up:
+            raise BrokerDown("connection reset")
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.broker = broker
+        self.confirms = False
+
+    def confirm_delivery(self):
+        self.confirms = True
+
+    def queue_declare(self, queue):
+        with self.broker.lock:
+            self.broker.queues.setdefault(queue, [])
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        if not self.broker.up:
+            raise BrokerDown("connection reset")
+        assert self.confirms
+        if body in self.broker.refused:
+            raise Nacked(body)
+        with self.broker.lock:
+            self.broker.queues[routing_key].append((body, properties))
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestMessagePublisher(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = FakeBroker()
+        self.publisher = MessagePublisher(
+            self.broker.connect, "image_resize", make_properties=dict, retry_delay=0.01, idle_interval=0.01
+        )
+
+    def tearDown(self):
+        self.publisher.stop()
+
+    def test_connection_is_reused(self):
+        self.publisher.start()
+        for i in range(20):
+            self.assertTrue(self.publisher.publish(f"image{i}.jpg", {"attempt": "1"}))
+        self.assertTrue(wait_until(lambda: len(self.broker.messages("image_resize")) == 20))
+        self.assertEqual(self.broker.connections, 1)
+        self.assertEqual(self.broker.messages("image_resize")[0], ("image0.jpg", {"attempt": "1"}))
+
+    def test_messages_survive_an_outage(self):
+        self.broker.up = False
+        self.publisher.start()
+        self.publisher.publish("a.jpg")
+        self.publisher.publish("b.jpg")
+        self.assertTrue(wait_until(lambda: self.publisher.stats()["reconnects"] >= 2))
+        self.assertEqual(self.publisher.stats()["buffered"], 2)
+
+        self.broker.up = True
+        self.assertTrue(wait_until(lambda: len(self.broker.messages("image_resize")) == 2))
+        self.assertEqual([body for body, _ in self.broker.messages("image_resize")], ["a.jpg", "b.jpg"])
+
+    def test_buffer_is_bounded(self):
+        publisher = MessagePublisher(self.broker.connect, "image_resize", max_buffer=1)
+        self.assertTrue(publisher.publish("a.jpg"))
+        self.assertFalse(publisher.publish("b.jpg"))
+        self.assertEqual(publisher.stats()["dropped"], 1)
+
+    def test_refused_message_is_dropped_after_max_attempts(self):
+        publisher = MessagePublisher(self.broker.connect, "image_resize", max_attempts=3, retry_delay=0.01, idle_interval=0.01)
+        self.broker.refused.add("poison.jpg")
+        publisher.publish("poison.jpg")
+        publisher.publish("next.jpg")
+        publisher.start()
+        try:
+            self.assertTrue(wait_until(lambda: self.broker.messages("image_resize") == [("next.jpg", None)]))
+            stats = publisher.stats()
+            self.assertEqual((stats["failed_attempts"], stats["dropped"], stats["buffered"]), (3, 1, 0))
+        finally:
+            publisher.stop()
+
+    def test_stop_flushes_the_buffer(self):
+        for i in range(5):
+            self.publisher.publish(f"image{i}.jpg")
+        self.publisher.start()
+        self.publisher.stop()
+        self.assertEqual(len(self.broker.messages("image_resize")), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from renditions import ManifestStore, pick_rendition
+
+MANIFEST = {
+    "source": "photo.jpg",
+    "width": 3024,
+    "height": 4032,
+    "renditions": {
+        "large": {"path": "large/photo.jpg.webp", "width": 960, "height": 1280, "bytes": 90000, "format": "webp"},
+        "thumb": {"path": "thumb/photo.jpg.webp", "width": 96, "height": 128, "bytes": 3000, "format": "webp"},
+        "feed": {"path": "feed/photo.jpg.webp", "width": 480, "height": 640, "bytes": 30000, "format": "webp"},
+    },
+}
+
+
+class TestPickRendition(unittest.TestCase):
+
+    def test_smallest_that_fits(self):
+        self.assertEqual(pick_rendition(MANIFEST, 64), "thumb")
+        self.assertEqual(pick_rendition(MANIFEST, 96), "thumb")
+        self.assertEqual(pick_rendition(MANIFEST, 400), "feed")
+        self.assertEqual(pick_rendition(MANIFEST, 481), "large")
+
+    def test_largest_when_nothing_fits(self):
+        self.assertEqual(pick_rendition(MANIFEST, 4000), "large")
+
+    def test_no_renditions(self):
+        self.assertIsNone(pick_rendition({"renditions": {}}, 100))
+
+
+class TestManifestStore(unittest.TestCase):
+
+    def test_missing_manifests_are_retried(self):
+        with tempfile.TemporaryDirectory() as reduced_dir:
+            store = ManifestStore(reduced_dir)
+            self.assertIsNone(store.get("photo.jpg"))
+
+            os.makedirs(os.path.join(reduced_dir, "manifest"))
+            with open(store.manifest_path("photo.jpg"), "w") as f:
+                json.dump(MANIFEST, f)
+            manifest = store.get("photo.jpg")
+            self.assertEqual(manifest, MANIFEST)
+            self.assertEqual(store.rendition_path(manifest, "feed"), os.path.join(reduced_dir, "feed/photo.jpg.webp"))
+            self.assertIsNone(store.rendition_path(manifest, "huge"))
+
+            # Served from memory once found
+            os.remove(store.manifest_path("photo.jpg"))
+            self.assertEqual(store.get("photo.jpg"), MANIFEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import functools
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_resizer"))
+# Importing the service sets up its logging; keep it out of app.log
+os.environ.setdefault("LOG_FILE", "")
+
+from PIL import Image
+
+from resize_service import ORIENTATION_TAG, WorkerPool, callback, resize_image
+
+
+class Method:
+    delivery_tag = 1
+
+
+class Properties:
+    headers = {}
+
+
+class FakeChannel:
+    def __init__(self):
+        self.nacks = []
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+
+class TestResizeImage(unittest.TestCase):
+
+    def test_rotated_photo_reports_its_displayed_size(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path = os.path.join(tmp, "photo.jpg")
+            exif = Image.Exif()
+            # Stored landscape, shown portrait: rotate 90 degrees clockwise
+            exif[ORIENTATION_TAG] = 6
+            Image.new("RGB", (400, 200), "red").save(input_path, exif=exif)
+
+            manifest = resize_image(input_path, os.path.join(tmp, "reduced"), "photo.jpg", {"thumb": 64})
+
+        self.assertEqual((manifest["width"], manifest["height"]), (200, 400))
+        thumb = manifest["renditions"]["thumb"]
+        self.assertEqual((thumb["width"], thumb["height"]), (32, 64))
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_dead_worker_requeues_the_job_and_replaces_the_pool(self):
+        pool = WorkerPool(functools.partial(ProcessPoolExecutor, max_workers=1))
+        try:
+            broken = pool.executor
+            # A worker killed mid-job, as by the OOM killer or a crashing decoder
+            with self.assertRaises(BrokenProcessPool):
+                pool.submit(os._exit, 1).result()
+
+            channel = FakeChannel()
+            callback(channel, Method(), Properties(), b"photo.jpg", pool=pool, connection=None)
+            self.assertEqual(channel.nacks, [(1, True)])
+            self.assertIsNot(pool.executor, broken)
+            self.assertEqual(pool.submit(pow, 2, 3).result(), 8)
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
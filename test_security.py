@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from security import (
+    InvalidToken, PasswordHasher, RateLimiter, TokenSigner, TrustedProxies, client_address, credential_key,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestPasswordHasher(unittest.TestCase):
+
+    def setUp(self):
+        # Low cost keeps the tests fast
+        self.hasher = PasswordHasher(n=2 ** 4)
+
+    def test_hash_and_verify(self):
+        stored = self.hasher.hash("secret")
+        self.assertTrue(stored.startswith("scrypt$16$8$1$"))
+        self.assertNotEqual(stored, self.hasher.hash("secret"))  # salted
+        self.assertTrue(self.hasher.verify("secret", stored))
+        self.assertFalse(self.hasher.verify("wrong", stored))
+        self.assertFalse(self.hasher.needs_rehash(stored))
+
+    def test_unknown_user_and_malformed_hash(self):
+        self.assertFalse(self.hasher.verify("secret", None))
+        self.assertFalse(self.hasher.verify("secret", "scrypt$16$8$1$broken"))
+
+    def test_legacy_plaintext_is_verified_and_flagged(self):
+        self.assertTrue(self.hasher.verify("secret", "secret"))
+        self.assertFalse(self.hasher.verify("wrong", "secret"))
+        self.assertTrue(self.hasher.needs_rehash("secret"))
+
+    def test_lower_cost_needs_rehash(self):
+        stored = PasswordHasher(n=2 ** 2).hash("secret")
+        self.assertTrue(self.hasher.verify("secret", stored))
+        self.assertTrue(self.hasher.needs_rehash(stored))
+
+    def test_async_runs_in_executor(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        hasher = PasswordHasher(n=2 ** 4, executor=executor)
+
+        async def main():
+            stored = await hasher.hash_async("secret")
+            return await hasher.verify_async("secret", stored)
+
+        self.assertTrue(asyncio.run(main()))
+
+
+class TestTokenSigner(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.signer = TokenSigner("key", ttl=60, clock=self.clock)
+
+    def test_round_trip(self):
+        claims = self.signer.verify(self.signer.issue("alice", 7))
+        self.assertEqual((claims["sub"], claims["uid"]), ("alice", 7))
+
+    def test_expired(self):
+        token = self.signer.issue("alice", 7)
+        self.clock.now += 61
+        with self.assertRaises(InvalidToken):
+            self.signer.verify(token)
+
+    def test_tampered_or_foreign(self):
+        token = self.signer.issue("alice", 7)
+        payload, signature = token.split(".")
+        forged = self.signer.issue("mallory", 8).split(".")[0] + "." + signature
+        for bad in (forged, payload, "garbage", TokenSigner("other", clock=self.clock).issue("alice", 7)):
+            with self.assertRaises(InvalidToken):
+                self.signer.verify(bad)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=1.0, burst=3, clock=clock)
+        self.assertEqual([limiter.allow("ip") for _ in range(4)], [True, True, True, False])
+        self.assertTrue(limiter.allow("other"))
+        clock.now += 1
+        self.assertTrue(limiter.allow("ip"))
+        self.assertFalse(limiter.allow("ip"))
+        self.assertEqual(limiter.counters, {"allowed": 5, "limited": 2})
+
+    def test_forgets_oldest_keys(self):
+        limiter = RateLimiter(rate=1.0, burst=1, max_keys=2, clock=FakeClock())
+        limiter.allow("a")
+        limiter.allow("b")
+        limiter.allow("c")
+        self.assertTrue(limiter.allow("a"))
+
+
+class TestClientAddress(unittest.TestCase):
+
+    FRONTEND = "172.18.0.5"
+
+    def setUp(self):
+        self.trusted = TrustedProxies(["172.18.0.5", "10.1.0.0/16"])
+
+    def test_clients_behind_the_frontend_are_limited_separately(self):
+        limiter = RateLimiter(rate=0.001, burst=2, clock=FakeClock())
+        attacker = client_address(self.FRONTEND, "198.51.100.7", self.trusted)
+        user = client_address(self.FRONTEND, "203.0.113.9", self.trusted)
+        self.assertEqual([limiter.allow(f"client:{attacker}") for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.allow(f"client:{user}"))
+
+    def test_only_trusted_peers_may_name_the_client(self):
+        # Spoofed by the client itself; a trusted proxy appends what it saw last
+        self.assertEqual(client_address(self.FRONTEND, "1.2.3.4, 198.51.100.7", self.trusted), "198.51.100.7")
+        self.assertEqual(client_address("10.1.4.2", "198.51.100.7", self.trusted), "198.51.100.7")
+        self.assertEqual(client_address("198.51.100.7", "10.0.0.1", self.trusted), "198.51.100.7")
+        self.assertEqual(client_address(self.FRONTEND, None, self.trusted), self.FRONTEND)
+        self.assertEqual(client_address(None, "10.0.0.1", self.trusted), "unknown")
+        self.assertEqual(client_address(self.FRONTEND, "10.0.0.1", TrustedProxies([])), self.FRONTEND)
+
+    def test_host_names_are_resolved_in_the_background(self):
+        answers = {"web-app": ["172.18.0.5"]}
+
+        async def resolve(host):
+            if host not in answers:
+                raise OSError("Name or service not known")
+            return answers[host]
+
+        trusted = TrustedProxies(["web-app"], resolve=resolve)
+        # Nothing is looked up on the request path
+        self.assertNotIn("172.18.0.5", trusted)
+        asyncio.run(trusted.resolve_hosts())
+        self.assertIn("172.18.0.5", trusted)
+        # The frontend restarted with a new address
+        answers["web-app"] = ["172.18.0.9"]
+        asyncio.run(trusted.resolve_hosts())
+        self.assertNotIn("172.18.0.5", trusted)
+        self.assertIn("172.18.0.9", trusted)
+        # A failed lookup keeps the last answer
+        del answers["web-app"]
+        asyncio.run(trusted.resolve_hosts())
+        self.assertIn("172.18.0.9", trusted)
+
+
+class TestCredentialKey(unittest.TestCase):
+
+    def test_distinct_and_keyed(self):
+        self.assertNotEqual(credential_key(b"s", "alice", "pw"), credential_key(b"s", "alice", "pw2"))
+        self.assertNotEqual(credential_key(b"s", "alice", "pw"), credential_key(b"t", "alice", "pw"))
+
+
+if __name__ == "__main__":
+    unittest.main()
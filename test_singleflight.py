@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_concurrent_callers_share_one_job(self):
+        calls = []
+        release = threading.Event()
+
+        def job(key):
+            calls.append(key)
+            release.wait(1)
+            return key
+
+        async def main():
+            flight = SingleFlight(self.executor)
+            futures = [flight.run("a", job, "a") for _ in range(5)]
+            release.set()
+            results = await asyncio.gather(*(flight.wait(future, 1) for future in futures))
+            return flight, results
+
+        flight, results = asyncio.run(main())
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(results, ["a"] * 5)
+        self.assertEqual(flight.stats(), {"inflight": 0, "started": 1, "coalesced": 4, "rejected": 0, "failed": 0, "timeouts": 0})
+
+    def test_timeout_returns_none_and_job_keeps_running(self):
+        release = threading.Event()
+
+        async def main():
+            flight = SingleFlight(self.executor)
+            future = flight.run("a", lambda: release.wait(1) and "done")
+            first = await flight.wait(future, 0.01)
+            # A later request for the same key joins the job that is still running
+            again = flight.run("a", lambda: "other")
+            release.set()
+            second = await flight.wait(again, 1)
+            return flight, first, second
+
+        flight, first, second = asyncio.run(main())
+        self.assertIsNone(first)
+        self.assertEqual(second, "done")
+        self.assertEqual(flight.counters["timeouts"], 1)
+
+    def test_rejects_beyond_max_pending(self):
+        release = threading.Event()
+
+        async def main():
+            flight = SingleFlight(self.executor, max_pending=1)
+            first = flight.run("a", release.wait, 1)
+            second = flight.run("b", release.wait, 1)
+            release.set()
+            await first
+            return flight, second
+
+        flight, second = asyncio.run(main())
+        self.assertIsNone(second)
+        self.assertEqual(flight.counters["rejected"], 1)
+
+    def test_failure_returns_none(self):
+        def job():
+            raise ValueError("broken image")
+
+        async def main():
+            flight = SingleFlight(self.executor)
+            result = await flight.wait(flight.run("a", job), 1)
+            return flight, result
+
+        flight, result = asyncio.run(main())
+        self.assertIsNone(result)
+        self.assertEqual(flight.counters["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
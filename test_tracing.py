@@ -0,0 +1,191 @@
+import asyncio
+import filecmp
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "Server"))
+sys.path.insert(0, os.path.join(ROOT, "trace_collector"))
+
+from tracing import (
+    NOOP_SPAN, FileExporter, MemoryExporter, SpanContext, TraceContextFilter, Tracer, TracingMiddleware,
+    current_span, extract, inject, parse_traceparent,
+)
+from collector import format_trace, group_traces, root_name
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class TestTraceContext(unittest.TestCase):
+
+    def test_copies_match(self):
+        for service in ("Frontend", "image_resizer"):
+            self.assertTrue(
+                filecmp.cmp(os.path.join(ROOT, "Server", "tracing.py"), os.path.join(ROOT, service, "tracing.py"), shallow=False),
+                f"{service}/tracing.py differs from Server/tracing.py",
+            )
+
+    def test_traceparent_round_trip(self):
+        header = f"00-{TRACE_ID}-{PARENT_ID}-01"
+        context = parse_traceparent(header)
+        self.assertEqual(context, SpanContext(TRACE_ID, PARENT_ID, True))
+        self.assertEqual(context.traceparent(), header)
+        # AMQP header values may arrive as bytes
+        self.assertEqual(parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00".encode()).sampled, False)
+
+    def test_malformed_traceparent_is_ignored(self):
+        for value in (None, "", "garbage", f"01-{TRACE_ID}-{PARENT_ID}-01", f"00-{'0' * 32}-{PARENT_ID}-01",
+                      f"00-{TRACE_ID}-{'0' * 16}-01", f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01"):
+            self.assertIsNone(parse_traceparent(value), value)
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = MemoryExporter()
+        self.tracer = Tracer("api", self.exporter)
+
+    def test_nested_spans_share_the_trace(self):
+        with self.tracer.span("request", kind="server") as outer:
+            with self.tracer.span("query") as inner:
+                self.assertIs(current_span(), inner)
+            self.assertIs(current_span(), outer)
+        self.assertIsNone(current_span())
+
+        query, request = self.exporter.drain()
+        self.assertEqual(query["trace_id"], request["trace_id"])
+        self.assertEqual(query["parent_id"], request["span_id"])
+        self.assertIsNone(request["parent_id"])
+        self.assertEqual((request["service"], request["kind"], request["status"]), ("api", "server", "ok"))
+
+    def test_errors_are_recorded_and_raised(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("resize"):
+                raise ValueError("bad image")
+        span, = self.exporter.drain()
+        self.assertEqual((span["status"], span["error"]), ("error", "ValueError: bad image"))
+
+    def test_concurrent_tasks_keep_their_own_span(self):
+        async def child(name):
+            with self.tracer.span(name):
+                await asyncio.sleep(0.01)
+                return current_span().parent_id
+
+        async def main():
+            with self.tracer.span("request") as request:
+                parents = await asyncio.gather(child("a"), child("b"))
+            return request.context.span_id, parents
+
+        request_id, parents = asyncio.run(main())
+        self.assertEqual(parents, [request_id, request_id])
+
+    def test_propagated_context_continues_the_trace(self):
+        with self.tracer.span("process", kind="consumer", parent=extract({"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})) as span:
+            headers = inject({"x-enqueued-at": "1"})
+        self.assertEqual(headers["traceparent"], f"00-{TRACE_ID}-{span.context.span_id}-01")
+        exported, = self.exporter.drain()
+        self.assertEqual((exported["trace_id"], exported["parent_id"]), (TRACE_ID, PARENT_ID))
+
+    def test_unsampled_traces_propagate_but_are_not_exported(self):
+        with self.tracer.span("process", parent=parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")):
+            self.assertTrue(inject({})["traceparent"].endswith("-00"))
+        self.tracer.sample_rate = 0
+        with self.tracer.span("request"):
+            pass
+        self.assertEqual(self.exporter.drain(), [])
+
+    def test_explicit_start_and_end_times(self):
+        self.tracer.start_span("queued", start_time=100.0).end(100.25)
+        span, = self.exporter.drain()
+        self.assertEqual((span["start"], span["duration_ms"]), (100.0, 250.0))
+
+    def test_disabled_tracer_does_nothing(self):
+        tracer = Tracer("api")
+        with tracer.span("request") as span:
+            self.assertIs(span, NOOP_SPAN)
+            self.assertIsNone(current_span())
+            self.assertEqual(inject({}), {})
+
+    def test_log_records_carry_the_trace(self):
+        record = logging.LogRecord("api", logging.INFO, __file__, 1, "hello", (), None)
+        with self.tracer.span("request") as span:
+            TraceContextFilter().filter(record)
+        self.assertEqual((record.trace_id, record.span_id), (span.context.trace_id, span.context.span_id))
+
+
+class TestExportAndMiddleware(unittest.TestCase):
+
+    def test_file_exporter_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces", "spans.jsonl")
+            exporter = FileExporter(path, interval=0.05)
+            exporter.start()
+            tracer = Tracer("frontend", exporter)
+            for name in ("a", "b"):
+                with tracer.span(name):
+                    pass
+            exporter.shutdown()
+            with open(path) as f:
+                self.assertEqual([json.loads(line)["name"] for line in f], ["a", "b"])
+            self.assertEqual((exporter.exported, exporter.dropped), (2, 0))
+
+    def test_middleware_continues_incoming_trace_and_names_by_route(self):
+        exporter = MemoryExporter()
+        tracer = Tracer("api", exporter)
+
+        class Route:
+            path = "/api/v1/post/{post_id}"
+
+        async def app(scope, receive, send):
+            scope["route"] = Route()
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        middleware = TracingMiddleware(app, tracer)
+        scope = {"type": "http", "method": "GET", "path": "/api/v1/post/7",
+                 "headers": [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01".encode())]}
+        asyncio.run(middleware(scope, None, send))
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": "/metrics", "headers": []}, None, send))
+
+        span, = exporter.drain()
+        self.assertEqual(span["name"], "GET /api/v1/post/{post_id}")
+        self.assertEqual((span["trace_id"], span["parent_id"], span["kind"]), (TRACE_ID, PARENT_ID, "server"))
+        self.assertEqual(span["attributes"]["http.status_code"], 404)
+
+
+class TestCollector(unittest.TestCase):
+
+    def test_waterfall_spans_services(self):
+        spans = [
+            {"trace_id": "t", "span_id": "1", "parent_id": None, "service": "frontend", "name": "POST /submit",
+             "start": 10.0, "duration_ms": 100.0},
+            {"trace_id": "t", "span_id": "2", "parent_id": "1", "service": "api", "name": "POST /api/v1/image/stream",
+             "start": 10.01, "duration_ms": 50.0},
+            {"trace_id": "t", "span_id": "3", "parent_id": "2", "service": "image-resizer", "name": "process image_resize",
+             "start": 10.2, "duration_ms": 300.0, "error": "OSError: disk full"},
+            {"trace_id": "u", "span_id": "4", "parent_id": "gone", "service": "api", "name": "GET /", "start": 0,
+             "duration_ms": 1.0},
+        ]
+        traces = group_traces(spans)
+        self.assertEqual(sorted(traces), ["t", "u"])
+        self.assertEqual(root_name(traces["t"]), "POST /submit")
+        self.assertEqual(root_name(traces["u"]), "GET /")
+
+        lines = format_trace(traces["t"]).splitlines()
+        # The resize ends 500ms after the upload started, after the HTTP response
+        self.assertTrue(lines[0].startswith("trace t  500.0 ms  3 spans"))
+        self.assertTrue(lines[1].endswith("frontend: POST /submit"))
+        self.assertTrue(lines[2].endswith("  api: POST /api/v1/image/stream"))
+        self.assertTrue(lines[3].endswith("    image-resizer: process image_resize  ! OSError: disk full"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import unittest
+from urllib.parse import quote
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from uploads import UploadRejected, header_filename, sniff_image_type, store_stream
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestStoreStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def store(self, *chunks, max_bytes=1024):
+        return asyncio.run(store_stream(stream(*chunks), self.tmp.name, max_bytes))
+
+    def test_chunks_are_written_and_hashed(self):
+        data = PNG + os.urandom(500)
+        stored = self.store(data[:3], data[3:200], data[200:])
+        with open(stored.path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(stored.size, len(data))
+        self.assertEqual(stored.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(stored.content_type, "image/png")
+
+    def test_oversized_upload_is_rejected_and_removed(self):
+        with self.assertRaises(UploadRejected) as raised:
+            self.store(PNG, b"\x00" * 2000)
+        self.assertEqual(raised.exception.status_code, 413)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_non_image_is_rejected_before_the_rest_is_read(self):
+        consumed = []
+
+        async def chunks():
+            for chunk in [b"#!/bin/sh\necho hi\n", b"more", b"more"]:
+                consumed.append(chunk)
+                yield chunk
+
+        with self.assertRaises(UploadRejected) as raised:
+            asyncio.run(store_stream(chunks(), self.tmp.name, 1024))
+        self.assertEqual(raised.exception.status_code, 415)
+        self.assertEqual(len(consumed), 1)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_tiny_non_image_is_rejected(self):
+        with self.assertRaises(UploadRejected):
+            self.store(b"GIF")
+
+    def test_sniffing(self):
+        self.assertEqual(sniff_image_type(b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01"), "image/jpeg")
+        self.assertEqual(sniff_image_type(b"RIFF\x24\x00\x00\x00WEBPVP8 "), "image/webp")
+        self.assertIsNone(sniff_image_type(b"<svg xmlns="))
+
+
+class TestFilenameHeader(unittest.TestCase):
+
+    def test_non_ascii_filename_round_trips(self):
+        # Accents, CJK and the narrow no-break space in macOS screenshot names
+        name = "Screenshot 2024-05-01 at 9.41\u202fAM café 写真.png"
+        with self.assertRaises(UnicodeEncodeError):
+            httpx.Request("POST", "http://api/api/v1/image/stream", headers={"X-Filename": name})
+        # As the frontend sends it
+        request = httpx.Request("POST", "http://api/api/v1/image/stream", headers={"X-Filename": quote(name, safe="")})
+        self.assertEqual(header_filename(request.headers["x-filename"]), name)
+        self.assertIsNone(header_filename(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import unittest
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Server"))
+
+from schemas.user_schema import UserCreate
+from services.user_service import UserService
+
+
+class FakeHasher:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def hash_async(self, password):
+        # Hashing must not hold a pooled connection
+        assert self.pool.checked_out == 0
+        return f"hash:{password}"
+
+
+class FakeCursor:
+    """INSERT ... ON CONFLICT DO NOTHING over a users table with unique usernames and emails."""
+
+    def __init__(self, table):
+        self.table = table
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params):
+        self.rows = []
+        for username, email, _ in zip(*params):
+            if any(username == row[1] or email == row[2] for row in self.table):
+                continue
+            row = (len(self.table) + 1, username, email)
+            self.table.append(row)
+            self.rows.append(row)
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, table):
+        self.table = table
+
+    def cursor(self):
+        return FakeCursor(self.table)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, table):
+        self.table = table
+        self.checked_out = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        self.checked_out += 1
+        try:
+            yield FakeConnection(self.table)
+        finally:
+            self.checked_out -= 1
+
+
+def user(username, email):
+    return UserCreate(username=username, email=email, password="secret")
+
+
+class TestAddUsers(unittest.TestCase):
+
+    def test_created_rows_are_reported_at_their_own_index(self):
+        pool = FakePool([(1, "alice", "taken@example.com")])
+        users = [
+            user("bob", "taken@example.com"),  # conflicts on email
+            user("bob", "bob@example.com"),  # same username, inserted
+            user("carol", "carol@example.com"),
+            user("carol", "carol@example.com"),  # repeated within the batch
+        ]
+        created, errors = asyncio.run(UserService.add_users(pool, FakeHasher(pool), users))
+        self.assertEqual(created, [{"index": 1, "id": 2}, {"index": 2, "id": 3}])
+        self.assertEqual([error["index"] for error in errors], [0, 3])
+        self.assertEqual(pool.checked_out, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
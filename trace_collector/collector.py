@@ -0,0 +1,138 @@
+"""
+Local stand-in for a tracing backend: accepts spans from the services and shows
+traces as text waterfalls.
+
+    python collector.py serve --port 4318 --file traces.jsonl
+    python collector.py show traces.jsonl --slowest 5 --root "POST /submit"
+    python collector.py show traces.jsonl --trace <trace id>
+
+The services POST JSON arrays of spans to /v1/spans (TRACE_EXPORTER=http), or
+write the same JSON lines to a file themselves (TRACE_EXPORTER=file); `show`
+reads either. A trace's duration runs from its first span's start to its last
+span's end, so for an upload it covers the resize that finishes after the
+HTTP response.
+"""
+import argparse
+import json
+import sys
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List
+
+
+def load(path: str) -> List[dict]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    pass  # a line cut short by a crash
+    return spans
+
+
+def group_traces(spans: Iterable[dict]) -> Dict[str, List[dict]]:
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+    return dict(traces)
+
+
+def trace_bounds(spans: List[dict]):
+    start = min(span["start"] for span in spans)
+    end = max(span["start"] + span["duration_ms"] / 1000 for span in spans)
+    return start, end
+
+
+def root_name(spans: List[dict]) -> str:
+    ids = {span["span_id"] for span in spans}
+    roots = [span for span in spans if span.get("parent_id") not in ids]
+    return min(roots, key=lambda span: span["start"])["name"] if roots else ""
+
+
+def format_trace(spans: List[dict], width: int = 40) -> str:
+    """The spans of one trace as an indented tree with offsets, durations and a bar per span."""
+    start, end = trace_bounds(spans)
+    total = max(end - start, 1e-9)
+    ids = {span["span_id"] for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        # Spans whose parent was not exported (sampled out, or still running) show at the top level
+        children[span.get("parent_id") if span.get("parent_id") in ids else None].append(span)
+
+    lines = [f"trace {spans[0]['trace_id']}  {total * 1000:.1f} ms  {len(spans)} spans"]
+
+    def walk(parent_id, depth):
+        for span in sorted(children[parent_id], key=lambda s: s["start"]):
+            offset = span["start"] - start
+            bar_start = int(offset / total * width)
+            bar_length = max(1, int(span["duration_ms"] / 1000 / total * width))
+            bar = (" " * bar_start + "#" * bar_length)[:width].ljust(width)
+            error = f"  ! {span['error']}" if span.get("error") else ""
+            lines.append(
+                f"  |{bar}| {offset * 1000:8.1f} ms {span['duration_ms']:9.1f} ms  "
+                f"{'  ' * depth}{span['service']}: {span['name']}{error}"
+            )
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def show(args):
+    traces = group_traces(load(args.file))
+    if args.trace:
+        selected = [traces[args.trace]] if args.trace in traces else []
+    else:
+        selected = [spans for spans in traces.values() if not args.root or root_name(spans) == args.root]
+        selected.sort(key=lambda spans: trace_bounds(spans)[1] - trace_bounds(spans)[0], reverse=True)
+        selected = selected[:args.slowest]
+    if not selected:
+        sys.exit("No matching traces")
+    print("\n\n".join(format_trace(spans) for spans in selected))
+
+
+def serve(args):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/spans":
+                self.send_error(404)
+                return
+            try:
+                spans = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except ValueError:
+                self.send_error(400, "Expected a JSON array of spans")
+                return
+            with lock, open(args.file, "a") as f:
+                f.write("".join(json.dumps(span) + "\n" for span in spans))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", args.port), Handler)
+    print(f"Collecting spans on :{args.port}/v1/spans into {args.file}", file=sys.stderr)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="receive spans over HTTP")
+    serve_parser.add_argument("--port", type=int, default=4318)
+    serve_parser.add_argument("--file", default="traces.jsonl")
+    serve_parser.set_defaults(run=serve)
+    show_parser = commands.add_parser("show", help="print traces from a spans file")
+    show_parser.add_argument("file")
+    show_parser.add_argument("--trace", help="one trace id")
+    show_parser.add_argument("--root", help='only traces started by this span, e.g. "POST /submit"')
+    show_parser.add_argument("--slowest", type=int, default=10)
+    show_parser.set_defaults(run=show)
+    args = parser.parse_args()
+    args.run(args)